@@ -1,20 +1,24 @@
 import os
 from libs.find_sources import get_query_sources, get_reference, generate_ref_links
-from libs.common import project_path, load_project_env
+from libs.common import project_path, get_project_env, project_environ, generate_text_fingerprint
+from libs.project_cache import ProjectCache, dataframes_size
+from libs.admission import ProjectLimiter, SearchOverloaded
+from libs.answer_cache import AnswerCache, AnswerLookup, answer_key
+from libs.single_flight import SingleFlight
+from libs.sse import AnswerStream
 from graphrag.query.llm.get_client import get_llm, get_text_embedder
 from fastapi import FastAPI, Header, HTTPException
 from fastapi.responses import StreamingResponse, JSONResponse, HTMLResponse
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 import libs.config as config
-from graphrag.cli.query import run_local_search, run_global_search, run_drift_search
 from dotenv import load_dotenv
 import asyncio
-from openai.types.chat import ChatCompletion, ChatCompletionMessage, ChatCompletionChunk
+from openai.types.chat import ChatCompletion, ChatCompletionMessage
 import functools
+import hmac
 import uuid
 import time
-from openai.types.chat.chat_completion_chunk import Choice, ChoiceDelta
 from graphrag.query.structured_search.local_search.search import LocalSearch
 from graphrag.query.structured_search.basic_search.search import BasicSearch
 from graphrag.query.structured_search.drift_search.search import DRIFTSearch
@@ -61,6 +65,39 @@ local_search: LocalSearch
 global_search: GlobalSearch
 drift_search: DRIFTSearch
 
+# engines only reference the shared snapshot, so the memory budget is enforced on snapshots
+engine_cache = ProjectCache(
+    name="search engine",
+    max_bytes=config.settings.engine_cache_max_mb * 1024 * 1024,
+    max_entries=config.settings.engine_cache_max_entries,
+)
+snapshot_cache = ProjectCache(
+    name="knowledge snapshot",
+    max_bytes=config.settings.engine_cache_max_mb * 1024 * 1024,
+    on_evict=engine_cache.invalidate,
+)
+search_limiter = ProjectLimiter(
+    max_concurrency=config.settings.search_max_concurrency,
+    max_queue=config.settings.search_max_queue,
+    queue_timeout=config.settings.search_queue_timeout,
+)
+answer_cache = AnswerCache(
+    max_entries=config.settings.answer_cache_max_entries,
+    max_bytes=config.settings.answer_cache_max_mb * 1024 * 1024,
+    ttl=config.settings.answer_cache_ttl,
+    semantic_threshold=config.settings.answer_cache_semantic_threshold,
+)
+# query embedders for the semantic answer cache, rebuilt when a project's settings change
+embedder_cache = ProjectCache(
+    name="text embedder",
+    max_bytes=0,
+    max_entries=config.settings.engine_cache_max_entries,
+)
+question_gen_error = "Error in question generation"
+# concurrent identical requests share one search and one LLM call
+completion_flight = SingleFlight("chat completion")
+search_flight = SingleFlight("search")
+
 class Item(BaseModel):
     query: str
     project_name: str
@@ -71,25 +108,62 @@ class Item(BaseModel):
 
 
 def check_api_key(project_name: str, api_key: str):
-    load_project_env(project_name)
-    if os.getenv("API_KEY") and os.getenv("API_KEY") != api_key:
+    # read from the cached .env, so requests for other projects never see this project's key
+    expected = get_project_env(project_name, "API_KEY")
+    if expected and not hmac.compare_digest(expected.encode("utf-8"), api_key.encode("utf-8")):
         raise Exception("Invalid api-key")
 
-async def init_search_engine(request: ChatCompletionRequest):
-    root = project_path(request.project_name)
-    data_dir=None
-    config, data = await search.load_context(root, data_dir)
-    system_prompt = request.system_prompt
-    if request.model == consts.INDEX_LOCAL:
-        search_engine = await search.load_local_search_engine(config, data, system_prompt)
-    elif request.model == consts.INDEX_GLOBAL:
-        search_engine = await search.load_global_search_engine(config, data)
-    elif request.model == consts.INDEX_DRIFT:
-        search_engine = await search.load_drift_search_engine(config, data)
-    else:
-        search_engine = await search.load_basic_search_engine(config, data)
+async def get_snapshot(project_name: str) -> search.KnowledgeSnapshot:
+    root = project_path(project_name)
+
+    async def build():
+        data_dir=None
+        # settings.yaml is expanded with this project's .env, not whichever project was loaded last
+        with project_environ(project_name):
+            project_config = search.load_project_config(root, data_dir)
+        snapshot = search.KnowledgeSnapshot(project_config.config, prompts=project_config.prompts)
+        # tables are loaded by the engine factories, see update_size in init_search_engine
+        return snapshot, 0
+
+    return await snapshot_cache.get_or_build((project_name,), project_name, root, build)
+
+async def get_search_engine(project_name: str, model: str, community_level: int, system_prompt: str | None = None,
+                            dynamic_community_selection: bool = config.settings.dynamic_community_selection):
+    root = project_path(project_name)
+    key = (
+        project_name,
+        model,
+        generate_text_fingerprint(system_prompt or ""),
+        community_level,
+        dynamic_community_selection,
+    )
+
+    async def build():
+        snapshot = await get_snapshot(project_name)
+        if model == consts.INDEX_LOCAL:
+            search_engine = await search.load_local_search_engine(snapshot, system_prompt, community_level)
+        elif model == consts.INDEX_GLOBAL:
+            search_engine = await search.load_global_search_engine(
+                snapshot, community_level, dynamic_community_selection
+            )
+        elif model == consts.INDEX_DRIFT:
+            # DRIFTSearch keeps the state of the question it answered, so only its parts are cached
+            search_engine = await search.load_drift_search_parts(snapshot, community_level)
+        else:
+            search_engine = await search.load_basic_search_engine(snapshot)
+        snapshot_cache.update_size((project_name,), dataframes_size(snapshot.data))
+        return search_engine, 0
+
+    search_engine = await engine_cache.get_or_build(key, project_name, root, build)
+    if isinstance(search_engine, search.DriftSearchParts):
+        return search_engine.new_search()
     return search_engine
 
+async def init_search_engine(request: ChatCompletionRequest):
+    return await get_search_engine(
+        request.project_name, request.model, request.community_level, request.system_prompt
+    )
+
 def guess_file_type(file_name: str) -> str:
     if file_name.endswith(".pdf"):
         return "pdf"
@@ -107,9 +181,7 @@ def guess_file_type(file_name: str) -> str:
         raise Exception(f"Unsupported file type: {file_name}")
     
 async def local_question_gen(request, context_data: dict):
-    root = project_path(request.project_name)
-    data_dir=None
-    config, data = await search.load_context(root, data_dir)
+    config = (await get_snapshot(request.project_name)).config
     llm = get_llm(config)
     token_encoder = tiktoken.get_encoding(config.encoding_model)
     question_gen = LocalQuestionGen(llm=llm, token_encoder=token_encoder, context_builder=None, context_builder_params=None)
@@ -130,9 +202,20 @@ async def attach_question_gen(base_response: dict, request, context_data: dict)
             base_response['question_gen'] = question_gen
         except Exception as e:
             logger.error(f"Error in question generation: {e}")
-            base_response['question_gen'] = "Error in question generation"
+            base_response['question_gen'] = question_gen_error
     return base_response
 
+@app.get("/v1/engines/metrics")
+async def engines_metrics():
+    return {
+        "engines": engine_cache.stats(),
+        "snapshots": snapshot_cache.stats(),
+        "search_slots": search_limiter.stats(),
+        "configs": search.config_cache.stats(),
+        "answers": answer_cache.stats(),
+        "single_flight": {"completions": completion_flight.stats(), "searches": search_flight.stats()},
+    }
+
 def handle_reference(request:ChatCompletionRequest, response: str) -> str:
     if not request.show_reference:
         # Remove the reference part from the response
@@ -141,37 +224,108 @@ def handle_reference(request:ChatCompletionRequest, response: str) -> str:
     else:
         return response
 
+def normalized_messages(request: ChatCompletionRequest) -> list[dict]:
+    """Messages as compared between requests, with runs of whitespace in their content collapsed."""
+    messages = []
+    for message in request.messages:
+        data = message.model_dump(mode="json")
+        if isinstance(data.get("content"), str):
+            data["content"] = " ".join(data["content"].split())
+        messages.append(data)
+    return messages
+
+def answer_cache_keys(request: ChatCompletionRequest) -> tuple[str, str]:
+    """The exact key of a request, and the scope a semantic match must share: the same key without the last message."""
+    options = {
+        "project_name": request.project_name,
+        "model": request.model,
+        "system_prompt": request.system_prompt or "",
+        "community_level": request.community_level,
+        "temperature": request.temperature,
+        "generate_question": bool(request.generate_question) and request.model == consts.INDEX_LOCAL,
+        "generate_question_count": request.generate_question_count,
+    }
+    messages = normalized_messages(request)
+    return answer_key({**options, "messages": messages}), answer_key({**options, "history": messages[:-1]})
+
+async def query_embedding(project_name: str, text: str) -> list[float]:
+    root = project_path(project_name)
+
+    async def build():
+        snapshot = await get_snapshot(project_name)
+        return get_text_embedder(snapshot.config), 0
+
+    embedder = await embedder_cache.get_or_build((project_name,), project_name, root, build)
+    return await embedder.aembed(text)
+
+async def find_answer(request: ChatCompletionRequest) -> AnswerLookup | None:
+    if not config.settings.answer_cache_enabled:
+        return None
+    key, scope = answer_cache_keys(request)
+    lookup = await answer_cache.lookup(request.project_name, project_path(request.project_name), key, scope)
+    if lookup.answer is None and answer_cache.semantic_threshold > 0:
+        try:
+            answer_cache.match(lookup, await query_embedding(request.project_name, request.messages[-1].content))
+        except Exception as e:
+            logger.warning(f"answer cache embedding failed: {e}")
+    if lookup.answer is None:
+        answer_cache.record_miss()
+    else:
+        logger.info(f"answer cache {lookup.tier} hit for {request.project_name} ({lookup.similarity:.3f})")
+    return lookup
+
+async def remember_answer(lookup: AnswerLookup | None, response: str, prompt_tokens: int, final_response: dict):
+    if lookup is None or final_response.get('question_gen') == question_gen_error:
+        return
+    try:
+        await answer_cache.store(lookup, response, prompt_tokens, final_response.get('question_gen'))
+    except Exception as e:
+        logger.warning(f"answer cache store failed: {e}")
+
+def answer_headers(lookup: AnswerLookup | None, shared: bool = False) -> dict:
+    headers = {}
+    if lookup is not None:
+        headers["X-Answer-Cache"] = lookup.tier or "miss"
+    if shared:
+        headers["X-Single-Flight"] = "shared"
+    return headers
+
 @app.post("/v1/chat/completions")
 async def chat_completions(request: ChatCompletionRequest, api_key: str = Header(...)):
     
     try:
         check_api_key(request.project_name, api_key)
+
+        lookup = await find_answer(request)
+        if lookup is not None and lookup.answer is not None:
+            if not request.stream:
+                return cached_sync_response(request, lookup)
+            else:
+                return cached_stream_response(request, lookup)
+
         history = request.messages[:-1]
         conversation_history = ConversationHistory.from_list([message.model_dump() for message in history])
 
         search_engine = await init_search_engine(request)
 
+        flight_key = (lookup.key if lookup is not None else answer_cache_keys(request)[0], bool(request.stream))
         if not request.stream:
-            return await handle_sync_response(request, search_engine, conversation_history)
+            final_response, shared = await completion_flight.do(
+                flight_key, lambda: sync_completion(request, search_engine, conversation_history, lookup)
+            )
+            if shared:
+                final_response = {**final_response, "id": f"chatcmpl-{uuid.uuid4().hex}"}
+            return JSONResponse(content=jsonable_encoder(final_response), headers=answer_headers(lookup, shared))
         else:
-            return await handle_stream_response(request, search_engine, conversation_history)
+            events, shared = completion_flight.stream(
+                flight_key, lambda: stream_completion(request, search_engine, conversation_history, lookup)
+            )
+            return StreamingResponse(events, media_type="text/event-stream", headers=answer_headers(lookup, shared))
     except Exception as e:
         logger.error(msg=f"chat_completions error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
-    
-async def handle_sync_response(request, search, conversation_history):
-    result = await search.asearch(request.messages[-1].content, conversation_history=conversation_history)
-
-    # print context_data
-    # context_data = reformat_context_data(result.context_data)  # type: ignore
-    # logger.debug(f"context_data: {context_data}")
-
-    if isinstance(search, DRIFTSearch):
-        response = result.response
-        response = response["nodes"][0]["answer"]
-    else:
-        response = result.response
 
+def completion_response(request, response: str, prompt_tokens: int) -> dict:
     response = handle_reference(request, response) 
     # TODO: add reference and modify format
     # reference = get_reference(response)
@@ -195,70 +349,139 @@ async def handle_sync_response(request, search, conversation_history):
         ],
         usage=CompletionUsage(
             completion_tokens=-1,
-            prompt_tokens=result.prompt_tokens,
+            prompt_tokens=prompt_tokens,
             total_tokens=-1
         )
     )
+    return completion.to_dict()
 
-    base_response = completion.to_dict()
+async def sync_completion(request, search, conversation_history, lookup: AnswerLookup | None = None) -> dict:
+    result = await search.asearch(request.messages[-1].content, conversation_history=conversation_history)
+
+    # print context_data
+    # context_data = reformat_context_data(result.context_data)  # type: ignore
+    # logger.debug(f"context_data: {context_data}")
+
+    if isinstance(search, DRIFTSearch):
+        response = result.response
+        response = response["nodes"][0]["answer"]
+    else:
+        response = result.response
+
+    base_response = completion_response(request, response, result.prompt_tokens)
     final_response = await attach_question_gen(base_response, request, result.context_data)
-    return JSONResponse(content=jsonable_encoder(final_response))
+    await remember_answer(lookup, response, result.prompt_tokens, final_response)
+    return final_response
+
+def cached_sync_response(request, lookup: AnswerLookup):
+    answer = lookup.answer
+    final_response = completion_response(request, answer.response, answer.prompt_tokens)
+    if answer.question_gen is not None:
+        final_response['question_gen'] = answer.question_gen
+    return JSONResponse(content=jsonable_encoder(final_response), headers=answer_headers(lookup))
+
+def answer_stream(request) -> AnswerStream:
+    # TODO: add reference and modify format
+    # reference = get_reference(full_response)
+    # if reference:
+    #     content = f"\n{generate_ref_links(reference, request.model)}"
+    return AnswerStream(
+        f"chatcmpl-{uuid.uuid4().hex}",
+        request.model,
+        strip_references=not request.show_reference,
+        frame_seconds=config.settings.sse_frame_ms / 1000,
+    )
+
+async def stream_completion(request, search, conversation_history, lookup: AnswerLookup | None = None):
+    """The SSE events of one streamed answer; subscribers of the same in-flight request share them."""
+    stream = answer_stream(request)
+    context_data = None
 
-async def handle_stream_response(request, search, conversation_history):
-    async def wrapper_astream_search():
-        chat_id = f"chatcmpl-{uuid.uuid4().hex}"
-        context_data = None
-        tokens = []
+    async def answer_tokens():
+        nonlocal context_data
         async for token in search.astream_search(request.messages[-1].content, conversation_history):  # 调用原始的生成器
             if context_data is None:
                 context_data = token  # capture context info on the first token
                 continue
-            tokens.append(token)
-            chunk = create_chunk(chat_id, tokens, request.model)
-            yield f"data: {chunk.model_dump_json()}\n\n"
-
-        # TODO: add reference and modify format
-        # reference = get_reference(full_response)
-        # if reference:
-        #     content = f"\n{generate_ref_links(reference, request.model)}"
-        finish_reason = 'stop'
-        chunk = create_chunk(chat_id, tokens, request.model)
-        chunk.choices[0].finish_reason = finish_reason
-        chunk.choices[0].delta.content = handle_reference(request, "".join(tokens))
-        chunk.choices[0].index = len(tokens)
-        base_response = chunk.to_dict()  # Build a final response dict if necessary
-        final_response = await attach_question_gen(base_response, request, context_data)
+            yield token
+
+    async for event in stream.events(answer_tokens()):
+        yield event
+
+    final_response = await attach_question_gen(stream.final(), request, context_data)
+    yield f"data: {json.dumps(final_response)}\n\n"
+    await remember_answer(lookup, stream.raw_text, 0, final_response)
+    yield f"data: [DONE]\n\n"
+
+def replay_tokens(text: str) -> list[str]:
+    """A cached answer cut into word-sized pieces that join back to it exactly; long runs without spaces are cut every 16 characters."""
+    return re.findall(r"\s*\S{1,16}|\s+$", text) or [""]
+
+def cached_stream_response(request, lookup: AnswerLookup):
+    answer = lookup.answer
+
+    async def replay():
+        stream = answer_stream(request)
+
+        async def answer_tokens():
+            for token in replay_tokens(answer.response):
+                yield token
+
+        async for event in stream.events(answer_tokens()):
+            yield event
+
+        final_response = stream.final()
+        if answer.question_gen is not None:
+            final_response['question_gen'] = answer.question_gen
         yield f"data: {json.dumps(final_response)}\n\n"
         yield f"data: [DONE]\n\n"
 
-    return StreamingResponse(wrapper_astream_search(), media_type="text/event-stream")
+    return StreamingResponse(replay(), media_type="text/event-stream", headers=answer_headers(lookup))
 
-def create_chunk(chat_id, tokens, model):
-    # Minimal helper to form a ChatCompletionChunk from tokens.
-    assert tokens, "Expected at least one token in the tokens list"
-    return ChatCompletionChunk(
-        id=chat_id,
-        created=int(time.time()),
-        model=model,
-        object="chat.completion.chunk",
-        choices=[Choice(index=len(tokens)-1, finish_reason=None, delta=ChoiceDelta(role="assistant", content=tokens[-1]))]
+async def run_search(item: Item, model: str) -> tuple[str, dict]:
+    """Run one search, or join the identical one already running."""
+    key = (
+        model,
+        item.project_name,
+        " ".join(item.query.split()),
+        int(item.community_level),
+        bool(item.dynamic_community_selection),
     )
+    (response, context_data), _ = await search_flight.do(key, lambda: search_once(item, model))
+    return response, context_data
+
+async def search_once(item: Item, model: str) -> tuple[str, dict]:
+    """Run one search on the cached engine, holding one of the project's search slots."""
+    async with search_limiter.slot(item.project_name):
+        search_engine = await get_search_engine(
+            item.project_name,
+            model,
+            int(item.community_level),
+            dynamic_community_selection=bool(item.dynamic_community_selection),
+        )
+        result = await search_engine.asearch(item.query)
+
+    if isinstance(search_engine, DRIFTSearch):
+        response = result.response
+        response = response["nodes"][0]["answer"] if isinstance(response, dict) else response
+        context_data = {key: reformat_context_data(value) for key, value in result.context_data.items()}
+    else:
+        response = result.response
+        context_data = reformat_context_data(result.context_data)  # type: ignore
+    return response, context_data
+
+
+def overloaded_exception(e: SearchOverloaded) -> HTTPException:
+    return HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
 
 # -----------------------------------------------------------------
 @app.post("/api/local_search")
-def local_search(item: Item, api_key: str = Header(...)):
+async def local_search(item: Item, api_key: str = Header(...)):
     try:
         check_api_key(item.project_name, api_key)
 
-        (response, context_data) = run_local_search(
-            root_dir=project_path(item.project_name),
-            query=item.query,
-            community_level=int(item.community_level),
-            response_type="Multiple Paragraphs",
-            streaming=False,
-            config_filepath=None,
-            data_dir=None,
-        )
+        (response, context_data) = await run_search(item, consts.INDEX_LOCAL)
 
         result = {
             "message": "ok",
@@ -267,12 +490,14 @@ def local_search(item: Item, api_key: str = Header(...)):
         }
 
         if item.query_source:
-            result["sources"] = get_query_sources(item.project_name, context_data)
+            result["sources"] = await asyncio.to_thread(get_query_sources, item.project_name, context_data)
 
         if item.context_data:
             result["context_data"] = context_data
 
         return result
+    except SearchOverloaded as e:
+        raise overloaded_exception(e)
     except Exception as e:
         return {
             "error": str(e),
@@ -281,20 +506,11 @@ def local_search(item: Item, api_key: str = Header(...)):
 
 # -----------------------------------------------------------------
 @app.post("/api/global_search")
-def global_search(item: Item, api_key: str = Header(...)):
+async def global_search(item: Item, api_key: str = Header(...)):
     try:
         check_api_key(item.project_name, api_key)
 
-        (response, context_data) = run_global_search(
-            root_dir=project_path(item.project_name),
-            query=item.query,
-            community_level=int(item.community_level),
-            response_type="Multiple Paragraphs",
-            dynamic_community_selection=bool(item.dynamic_community_selection),
-            streaming=False,
-            config_filepath=None,
-            data_dir=None,
-        )
+        (response, context_data) = await run_search(item, consts.INDEX_GLOBAL)
 
         result = {
             "message": "ok",
@@ -306,6 +522,8 @@ def global_search(item: Item, api_key: str = Header(...)):
             result["context_data"] = context_data
 
         return result
+    except SearchOverloaded as e:
+        raise overloaded_exception(e)
     except Exception as e:
         return {
             "error": str(e),
@@ -313,18 +531,11 @@ def global_search(item: Item, api_key: str = Header(...)):
 
 
 @app.post("/api/drift_search")
-def drift_search(item: Item, api_key: str = Header(...)):
+async def drift_search(item: Item, api_key: str = Header(...)):
     try:
         check_api_key(item.project_name, api_key)
 
-        (response, context_data) = run_drift_search(
-            root_dir=project_path(item.project_name),
-            query=item.query,
-            community_level=int(item.community_level),
-            streaming=False,
-            config_filepath=None,
-            data_dir=None,
-        )
+        (response, context_data) = await run_search(item, consts.INDEX_DRIFT)
 
         result = {
             "message": "ok",
@@ -336,6 +547,8 @@ def drift_search(item: Item, api_key: str = Header(...)):
             result["context_data"] = context_data
 
         return result
+    except SearchOverloaded as e:
+        raise overloaded_exception(e)
     except Exception as e:
         return {
             "error": str(e),
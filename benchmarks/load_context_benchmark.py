@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Compare the full-table parquet loader with the projected, memory-mapped loader
+used by libs.search on a synthetic project.
+
+    python benchmarks/load_context_benchmark.py --text-units 1000000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import resource
+import string
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def random_text(size: int) -> str:
+    return "".join(random.choices(string.ascii_letters + " ", k=size))
+
+
+def generate_project(output_dir: Path, text_units: int):
+    """Write graphrag-shaped output tables, scaled from the number of text units."""
+    entities = max(text_units // 4, 10)
+    relationships = entities * 2
+    reports = max(entities // 20, 5)
+    texts = [random_text(64) for _ in range(1000)]
+    vector = np.random.rand(1536).astype("float32")
+
+    pd.DataFrame({
+        "id": [f"tu-{i}" for i in range(text_units)],
+        "human_readable_id": range(text_units),
+        "text": [texts[i % 1000] * 20 for i in range(text_units)],
+        "n_tokens": 300,
+        "document_ids": [["doc-1"]] * text_units,
+        "entity_ids": [[f"e-{i % entities}"] for i in range(text_units)],
+        "relationship_ids": [[f"r-{i % relationships}"] for i in range(text_units)],
+    }).to_parquet(output_dir / "create_final_text_units.parquet")
+
+    pd.DataFrame({
+        "id": [f"e-{i}" for i in range(entities)],
+        "human_readable_id": range(entities),
+        "title": [f"ENTITY {i}" for i in range(entities)],
+        "type": "ORGANIZATION",
+        "description": [texts[i % 1000] * 4 for i in range(entities)],
+        "text_unit_ids": [[f"tu-{i}"] for i in range(entities)],
+    }).to_parquet(output_dir / "create_final_entities.parquet")
+
+    pd.DataFrame({
+        "id": [f"e-{i}" for i in range(entities)],
+        "human_readable_id": range(entities),
+        "title": [f"ENTITY {i}" for i in range(entities)],
+        "community": [i % reports for i in range(entities)],
+        "level": 0,
+        "degree": 3,
+        "x": 0.0,
+        "y": 0.0,
+    }).to_parquet(output_dir / "create_final_nodes.parquet")
+
+    pd.DataFrame({
+        "id": [f"r-{i}" for i in range(relationships)],
+        "human_readable_id": range(relationships),
+        "source": [f"ENTITY {i % entities}" for i in range(relationships)],
+        "target": [f"ENTITY {(i + 1) % entities}" for i in range(relationships)],
+        "description": [texts[i % 1000] for i in range(relationships)],
+        "weight": 1.0,
+        "combined_degree": 6,
+        "text_unit_ids": [[f"tu-{i}"] for i in range(relationships)],
+    }).to_parquet(output_dir / "create_final_relationships.parquet")
+
+    pd.DataFrame({
+        "id": [f"c-{i}" for i in range(reports)],
+        "human_readable_id": range(reports),
+        "community": range(reports),
+        "parent": -1,
+        "level": 0,
+        "title": [f"Community {i}" for i in range(reports)],
+        "summary": [texts[i % 1000] * 4 for i in range(reports)],
+        "full_content": [texts[i % 1000] * 40 for i in range(reports)],
+        "rank": 5.0,
+        "rank_explanation": [texts[i % 1000] * 4 for i in range(reports)],
+        "findings": [[{"summary": texts[i % 1000], "explanation": texts[i % 1000] * 10}] for i in range(reports)],
+        "full_content_json": [texts[i % 1000] * 50 for i in range(reports)],
+        "full_content_embedding": [vector] * reports,
+        "period": "2025-01-01",
+        "size": 10,
+    }).to_parquet(output_dir / "create_final_community_reports.parquet")
+
+    pd.DataFrame({
+        "id": [f"c-{i}" for i in range(reports)],
+        "human_readable_id": range(reports),
+        "community": range(reports),
+        "parent": -1,
+        "level": 0,
+        "title": [f"Community {i}" for i in range(reports)],
+        "entity_ids": [[f"e-{i}"] for i in range(reports)],
+        "relationship_ids": [[f"r-{i}"] for i in range(reports)],
+        "text_unit_ids": [[f"tu-{i}"] for i in range(reports)],
+        "period": "2025-01-01",
+        "size": 10,
+    }).to_parquet(output_dir / "create_final_communities.parquet")
+
+
+def run_full(output_dir: str, tables: list[str]):
+    from graphrag.storage.file_pipeline_storage import FilePipelineStorage
+    from graphrag.utils.storage import load_table_from_storage
+
+    storage = FilePipelineStorage(root_dir=output_dir)
+    started = time.perf_counter()
+
+    async def load():
+        return {name: await load_table_from_storage(name=name, storage=storage) for name in tables}
+
+    data = asyncio.run(load())
+    return measure(started, data)
+
+
+def run_projected(output_dir: str, tables: list[str]):
+    from libs.search import TABLE_COLUMNS, read_parquet_table
+
+    started = time.perf_counter()
+    data = {
+        name: read_parquet_table(Path(output_dir) / f"{name}.parquet", TABLE_COLUMNS.get(name))
+        for name in tables
+    }
+    return measure(started, data)
+
+
+def measure(started: float, data: dict) -> dict:
+    elapsed = time.perf_counter() - started
+    return {
+        "seconds": round(elapsed, 3),
+        "frame_mb": round(sum(int(df.memory_usage(deep=True).sum()) for df in data.values()) / 1024 / 1024, 1),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    from libs.search import MODE_TABLES, OPTIONAL_TABLES
+
+    parser = argparse.ArgumentParser(description="load_context benchmark")
+    parser.add_argument("--text-units", type=int, default=200_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        print(f"generating synthetic project with {args.text_units} text units ...")
+        generate_project(Path(output_dir), args.text_units)
+
+        all_tables = sorted({name for names in MODE_TABLES.values() for name in names} - set(OPTIONAL_TABLES))
+        runs = [("all", "full", run_full, all_tables)]
+        for mode, tables in MODE_TABLES.items():
+            runs.append((mode, "projected", run_projected, [name for name in tables if name not in OPTIONAL_TABLES]))
+
+        for mode, label, runner, tables in runs:
+            # a fresh process per run so max RSS is not shared between loaders
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                result = executor.submit(runner, output_dir, tables).result()
+            print(f"{mode:>6} {label:>9}: {result}")
+
+
+if __name__ == "__main__":
+    main()
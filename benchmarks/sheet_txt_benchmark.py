@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Compare the row-by-row iterrows converter that generate_data used with the
+streaming converter in libs.sheet_txt on a generated sheet.
+
+    python benchmarks/sheet_txt_benchmark.py --rows 1000000 --format csv
+
+The row-by-row converter is only timed on the first --legacy-rows rows and
+extrapolated, since it takes many minutes on a million rows.
+"""
+
+import argparse
+import os
+import random
+import resource
+import string
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import openpyxl
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+columns = ["id", "name", "category", "price", "stock", "updated_at", "description"]
+
+
+def random_text(size: int) -> str:
+    return "".join(random.choices(string.ascii_letters + " ", k=size))
+
+
+def generate_rows(rows: int):
+    names = [random_text(12) for _ in range(1000)]
+    descriptions = [random_text(80) for _ in range(1000)]
+    for i in range(rows):
+        yield [
+            i,
+            names[i % 1000],
+            f"category-{i % 37}",
+            round(random.random() * 1000, 2),
+            None if i % 11 == 0 else i % 500,
+            f"2025-01-{i % 28 + 1:02d}",
+            None if i % 7 == 0 else descriptions[i % 1000],
+        ]
+
+
+def generate_sheet(file_path: str, rows: int):
+    if file_path.endswith(".csv"):
+        pd.DataFrame(generate_rows(rows), columns=columns).to_csv(file_path, index=False)
+        return
+
+    workbook = openpyxl.Workbook(write_only=True)
+    worksheet = workbook.create_sheet("Sheet1")
+    worksheet.append(columns)
+    for row in generate_rows(rows):
+        worksheet.append(row)
+    workbook.save(file_path)
+
+
+def legacy_excel_to_txt(file_path: str, txt_path: str, rows: int):
+    """The converter generate_data used, limited to the first rows."""
+    with open(txt_path, "w", encoding="utf-8") as f:
+        if file_path.endswith(".csv"):
+            df = pd.read_csv(file_path, encoding="utf-8", nrows=rows)
+            for column in df.columns:
+                f.write(f"{column}\n\n")
+            write_rows(f, df)
+            return
+        excel_data = pd.ExcelFile(file_path, engine="openpyxl")
+        for sheet_name in excel_data.sheet_names:
+            f.write(f"{sheet_name}\n\n")
+            write_rows(f, excel_data.parse(sheet_name, nrows=rows))
+
+
+def write_rows(f, df: pd.DataFrame):
+    for index, row in df.iterrows():
+        for column in df.columns:
+            if pd.notna(row[column]):
+                f.write(f"【{column}】: {row[column]} ")
+        f.write(f"\n\n")
+
+
+def run_legacy(file_path: str, txt_path: str, rows: int) -> dict:
+    started = time.perf_counter()
+    legacy_excel_to_txt(file_path, txt_path, rows)
+    return measure(started, txt_path, rows)
+
+
+def run_streaming(file_path: str, txt_path: str, rows: int) -> dict:
+    from libs.sheet_txt import sheet_to_txt
+
+    started = time.perf_counter()
+    sheet_to_txt(file_path, txt_path)
+    return measure(started, txt_path, rows)
+
+
+def measure(started: float, txt_path: str, rows: int) -> dict:
+    elapsed = time.perf_counter() - started
+    return {
+        "rows": rows,
+        "seconds": round(elapsed, 2),
+        "rows_per_second": int(rows / elapsed) if elapsed else 0,
+        "output_mb": round(os.path.getsize(txt_path) / 1024 / 1024, 1),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="excel/csv to txt benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--legacy-rows", type=int, default=50_000)
+    parser.add_argument("--format", choices=["csv", "xlsx"], default="csv")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        file_path = os.path.join(work_dir, f"sheet.{args.format}")
+        print(f"generating {args.rows} rows as {args.format} ...")
+        generate_sheet(file_path, args.rows)
+
+        runs = [
+            ("iterrows", run_legacy, min(args.legacy_rows, args.rows)),
+            ("streaming", run_streaming, args.rows),
+        ]
+        results = {}
+        for label, runner, rows in runs:
+            # a fresh process per run so max RSS is not shared between converters
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                result = executor.submit(runner, file_path, os.path.join(work_dir, f"{label}.txt"), rows).result()
+            results[label] = result
+            print(f"{label:>9}: {result}")
+
+        legacy, streaming = results["iterrows"], results["streaming"]
+        if legacy["rows_per_second"]:
+            estimated = args.rows / legacy["rows_per_second"]
+            print(
+                f"iterrows estimated at {estimated:.0f}s for {args.rows} rows, "
+                f"{estimated / streaming['seconds']:.1f}x the streaming converter"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Compare the per-token cost of the SSE path chat completions used, a
+ChatCompletionChunk built and serialized per token and references stripped
+from the joined answer at the end, with libs.sse, which splices each token
+into a pre-rendered chunk and strips references as the tokens pass.
+
+    python benchmarks/sse_benchmark.py --tokens 2000 --repeat 50
+
+--frame-ms also reports how many events the framed stream sends for tokens
+arriving every --token-interval-ms.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import re
+import string
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai.types.chat import ChatCompletionChunk
+from openai.types.chat.chat_completion_chunk import Choice, ChoiceDelta
+
+
+def generate_tokens(count: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    tokens = []
+    for i in range(count):
+        if i % 40 == 39:
+            # references arrive split over several tokens, as the model writes them
+            tokens.extend(["[Data", ": Entities (", f"{rng.randint(1, 999)}, {rng.randint(1, 999)})", "]"])
+        else:
+            word = "".join(rng.choices(string.ascii_letters, k=rng.randint(1, 8)))
+            tokens.append(rng.choice([" ", "", "\n"]) + word)
+    return tokens
+
+
+def legacy_stream(tokens: list[str], model: str) -> int:
+    """The path chat completions used: one pydantic chunk per token, regex over the joined answer."""
+    chat_id = "chatcmpl-benchmark"
+    seen = []
+    size = 0
+    for token in tokens:
+        seen.append(token)
+        chunk = ChatCompletionChunk(
+            id=chat_id,
+            created=int(time.time()),
+            model=model,
+            object="chat.completion.chunk",
+            choices=[Choice(index=len(seen) - 1, finish_reason=None, delta=ChoiceDelta(role="assistant", content=seen[-1]))],
+        )
+        size += len(f"data: {chunk.model_dump_json()}\n\n")
+    final = re.sub(r"\[Data: [^\]]+\]", "", "".join(seen)).strip()
+    return size + len(final)
+
+
+def writer_stream(tokens: list[str], model: str) -> int:
+    from libs.sse import ChunkWriter, ReferenceStripper
+
+    writer = ChunkWriter("chatcmpl-benchmark", model)
+    stripper = ReferenceStripper()
+    size = 0
+    for token in tokens:
+        text = stripper.feed(token)
+        if text:
+            size += len(writer.chunk(text))
+    text = stripper.flush()
+    if text:
+        size += len(writer.chunk(text))
+    return size + len(stripper.text().strip())
+
+
+def time_per_token(runner, tokens: list[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        runner(tokens, "local")
+        best = min(best, time.perf_counter() - started)
+    return best / len(tokens) * 1_000_000
+
+
+async def count_frames(tokens: list[str], frame_ms: int, token_interval_ms: float) -> int:
+    from libs.sse import AnswerStream
+
+    async def arriving():
+        for token in tokens:
+            await asyncio.sleep(token_interval_ms / 1000)
+            yield token
+
+    stream = AnswerStream("chatcmpl-benchmark", "local", frame_seconds=frame_ms / 1000)
+    return len([event async for event in stream.events(arriving())])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="sse streaming benchmark")
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--frame-ms", type=int, default=20)
+    parser.add_argument("--token-interval-ms", type=float, default=2.0)
+    parser.add_argument("--frame-tokens", type=int, default=500)
+    args = parser.parse_args()
+
+    tokens = generate_tokens(args.tokens)
+    legacy = time_per_token(legacy_stream, tokens, args.repeat)
+    writer = time_per_token(writer_stream, tokens, args.repeat)
+    print(f"{len(tokens)} tokens, best of {args.repeat}")
+    print(f"  pydantic chunk per token: {legacy:.2f} us/token")
+    print(f"  libs.sse writer:          {writer:.2f} us/token ({legacy / writer:.1f}x)")
+
+    if args.frame_ms:
+        sample = tokens[:args.frame_tokens]
+        events = asyncio.run(count_frames(sample, args.frame_ms, args.token_interval_ms))
+        print(
+            f"  {len(sample)} tokens every {args.token_interval_ms} ms in {args.frame_ms} ms frames: "
+            f"{events} events"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Compare recall and query latency of the NumPy vector store, as float32, int8
+and with IVF lists, against exact search on generated clustered vectors, and
+against LanceDB when it is installed.
+
+    python benchmarks/vector_store_benchmark.py --rows 200000 --dim 1536 --queries 200
+
+Recall@k is the share of the exact top k each store returns.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def generate_vectors(rows: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=rows)
+    vectors = centers[labels] + 0.5 * rng.standard_normal((rows, dim)).astype(np.float32)
+    return vectors
+
+
+def exact_topk(vectors: np.ndarray, queries: np.ndarray, k: int) -> list[set[int]]:
+    from libs.numpy_vector_store import normalize
+
+    matrix = normalize(vectors)
+    scores = normalize(queries) @ matrix.T
+    return [set(np.argpartition(-row, k)[:k].tolist()) for row in scores]
+
+
+def measure(search, queries: np.ndarray, truth: list[set[int]], k: int) -> dict:
+    latencies = []
+    recall = 0.0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        found = search(query, k)
+        latencies.append(time.perf_counter() - started)
+        recall += len(expected & set(found)) / k
+    return {
+        "recall": round(recall / len(queries), 3),
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 2),
+    }
+
+
+def numpy_store(work_dir: str, vectors: np.ndarray, quantize: str | None, ann_threshold: int, nprobe: int):
+    from libs.numpy_vector_store import NumpyVectorStore, write_vector_files
+
+    name = f"bench_{quantize or 'f32'}_{'ivf' if ann_threshold < len(vectors) else 'flat'}"
+    started = time.perf_counter()
+    write_vector_files(
+        work_dir, name, [str(i) for i in range(len(vectors))], [None] * len(vectors),
+        ["{}"] * len(vectors), vectors, quantize, ann_threshold,
+    )
+    build_seconds = time.perf_counter() - started
+    store = NumpyVectorStore(collection_name=name)
+    store.connect(db_uri=work_dir, nprobe=nprobe)
+
+    def search(query: np.ndarray, k: int) -> list[int]:
+        return [row for row, _ in store.search_batch(query[None, :], k)[0]]
+
+    return search, build_seconds
+
+
+def lancedb_store(work_dir: str, vectors: np.ndarray):
+    import lancedb
+    import pyarrow as pa
+
+    started = time.perf_counter()
+    db = lancedb.connect(os.path.join(work_dir, "lancedb"))
+    table = db.create_table("bench", data=pa.table({
+        "id": pa.array(range(len(vectors)), pa.int64()),
+        "vector": pa.FixedSizeListArray.from_arrays(pa.array(vectors.reshape(-1)), vectors.shape[1]),
+    }))
+    build_seconds = time.perf_counter() - started
+
+    def search(query: np.ndarray, k: int) -> list[int]:
+        return table.search(query).metric("cosine").limit(k).to_arrow().column("id").to_pylist()
+
+    return search, build_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="vector store benchmark")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"generating {args.rows} vectors of {args.dim} dimensions ...")
+    vectors = generate_vectors(args.rows, args.dim, args.clusters, args.seed)
+    queries = generate_vectors(args.queries, args.dim, args.clusters, args.seed + 1)
+    truth = exact_topk(vectors, queries, args.k)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        runs = [
+            ("float32", lambda: numpy_store(work_dir, vectors, None, args.rows, args.nprobe)),
+            ("int8", lambda: numpy_store(work_dir, vectors, "int8", args.rows, args.nprobe)),
+            ("float32 ivf", lambda: numpy_store(work_dir, vectors, None, 0, args.nprobe)),
+            ("int8 ivf", lambda: numpy_store(work_dir, vectors, "int8", 0, args.nprobe)),
+            ("lancedb", lambda: lancedb_store(work_dir, vectors)),
+        ]
+        for label, build in runs:
+            try:
+                search, build_seconds = build()
+            except ImportError as e:
+                print(f"{label:>12}: skipped, {e}")
+                continue
+            result = measure(search, queries, truth, args.k)
+            print(f"{label:>12}: {result}, build {build_seconds:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import os
 import sys
 import asyncio
 from pathlib import Path
@@ -15,6 +16,8 @@ from cli.prompt_tuning import prompt_tuning
 from cli.build_index import build_index, update_index
 from cli.create_project import init_graphrag_project
 from cli.upload_file import upload_files
+from cli.scheduler import ProjectScheduler, list_projects
+from cli.stage_cache import StageFingerprints
 
 import libs.config as config
 
@@ -37,11 +40,23 @@ def process_a_project(config: ArgConfig):
         # step 2: generate data
         generate_data(config.project, config.pdf_vision_option)
         
-        # step 3: prompt tuning
-        asyncio.run(prompt_tuning(config.project))
+        # step 3: prompt tuning, skipped when input and settings did not change
+        fingerprints = StageFingerprints(config.project)
+        decision = fingerprints.decide("prompt_tuning", force=config.force)
+        logger.info(f"prompt tuning: {decision.action} ({decision.reason})")
+        if decision.action == "run":
+            asyncio.run(prompt_tuning(config.project))
+            fingerprints.record(decision)
         
-        # step 4: build index
-        asyncio.run(build_index(config.project))
+        # step 4: build index, or update it when input files were only added
+        decision = fingerprints.decide("build_index", force=config.force)
+        logger.info(f"build index: {decision.action} ({decision.reason})")
+        if decision.action == "run":
+            build_index(config.project)
+            fingerprints.record(decision)
+        elif decision.action == "update":
+            update_index(config.project)
+            fingerprints.record(decision)
         
         # step 5: complete processing
         logger.info(f"project {config.project} processed successfully")
@@ -53,6 +68,45 @@ def process_a_project(config: ArgConfig):
         return False
 
 
+def add_scheduler_arguments(parser):
+    parser.add_argument('--input_root', help='directory with one input directory per project, named after it', required=False)
+    parser.add_argument('--max_projects', help='projects processed at the same time', type=int, default=config.settings.process_max_projects)
+    parser.add_argument('--cpu_slots', help='file conversions running at the same time', type=int, default=config.settings.process_cpu_slots)
+    parser.add_argument('--llm_budget', help='concurrent LLM requests shared by all projects', type=int, default=config.settings.process_llm_budget)
+    parser.add_argument('--restart', help='start a new run instead of resuming an unfinished one', action='store_true')
+    parser.add_argument('--force', help='run prompt tuning and a full build even when their inputs did not change', action='store_true')
+
+
+def process_projects(projects: list[str], args) -> int:
+    """process several projects concurrently, resuming each at its first unfinished stage"""
+    if not projects:
+        logger.error("no projects to process")
+        return 1
+
+    input_dirs = {}
+    if args.input_root:
+        for project in projects:
+            input_dir = os.path.join(args.input_root, project)
+            if os.path.isdir(input_dir):
+                input_dirs[project] = input_dir
+
+    logger.info("=== start automation processing ===")
+    scheduler = ProjectScheduler(
+        args.pdf_vision_option,
+        max_projects=args.max_projects,
+        cpu_slots=args.cpu_slots,
+        llm_budget=args.llm_budget,
+        restart=args.restart,
+        force=args.force,
+    )
+    results = scheduler.run(projects, input_dirs)
+    if all(result.status == "done" for result in results):
+        logger.info("=== automation processing completed ===")
+        return 0
+    logger.error("=== automation processing failed ===")
+    return 1
+
+
 def main():
     try:
         # parse command line arguments
@@ -68,17 +122,26 @@ def main():
 
         # create process subcommand (default command)
         process_parser = subparsers.add_parser('process', help='process specified project or all projects')
-        process_parser.add_argument('--project', help='specify project name', required=True)
-        process_parser.add_argument('--input_dir', help='specify input directory', required=True)
+        process_parser.add_argument('--project', help='specify project name', required=False)
+        process_parser.add_argument('--input_dir', help='specify input directory', required=False)
+        process_parser.add_argument('--projects', help='comma separated project names, processed concurrently', required=False)
+        process_parser.add_argument('--pdf_vision_option', help='specify pdf vision option', required=False, default=config.generate_data_vision)
+        add_scheduler_arguments(process_parser)
+
+        process_parser = subparsers.add_parser('process_all', aliases=['process-all'], help='process all projects concurrently')
         process_parser.add_argument('--pdf_vision_option', help='specify pdf vision option', required=False, default=config.generate_data_vision)
+        add_scheduler_arguments(process_parser)
 
         process_parser = subparsers.add_parser('generate_data', help='generate data for project')
         process_parser.add_argument('--project', help='specify project name', required=True)
-        process_parser.add_argument('--input_dir', help='specify input directory', required=True)
+        process_parser.add_argument('--input_dir', help='specify input directory', required=False)
         process_parser.add_argument('--pdf_vision_option', help='specify pdf vision option', required=False, default=config.generate_data_vision)
+        process_parser.add_argument('--full', help='convert every file again, not only new and changed ones', action='store_true')
+        process_parser.add_argument('--dry_run', help='only report what would be converted', action='store_true')
 
         process_parser = subparsers.add_parser('prompt_tuning', help='prompt tuning')
         process_parser.add_argument('--project', help='specify project name', required=True)
+        process_parser.add_argument('--sample_chunks', help='chunks sampled from large inputs, 0 to load the whole input', type=int, required=False)
 
         process_parser = subparsers.add_parser('build_index', help='build index')
         process_parser.add_argument('--project', help='specify project name', required=True)
@@ -103,10 +166,17 @@ def main():
             else:
                 logger.error(f"project {args.project} initialization failed")
                 return 1
+        elif args.command == 'process' and args.projects:
+            projects = [project.strip() for project in args.projects.split(',') if project.strip()]
+            return process_projects(projects, args)
+        elif args.command in ('process_all', 'process-all'):
+            return process_projects(list_projects(), args)
         elif args.command == 'process':
+            if not args.project or not args.input_dir:
+                parser.error('process needs --project and --input_dir, or --projects')
             # process is default command
             logger.info("=== start automation processing ===")
-            process_config = ArgConfig(project=args.project, input_dir=args.input_dir, pdf_vision_option=args.pdf_vision_option)
+            process_config = ArgConfig(project=args.project, input_dir=args.input_dir, pdf_vision_option=args.pdf_vision_option, force=args.force)
             if process_a_project(process_config):
                 logger.info("=== automation processing completed ===")
                 return 0
@@ -115,14 +185,14 @@ def main():
                 return 1
         elif args.command == 'generate_data':
             logger.info("=== start generate data ===")
-            if args.input_dir:
+            if args.input_dir and not args.dry_run:
                 upload_files(args.project, args.input_dir)
-            generate_data(args.project, args.pdf_vision_option)
+            generate_data(args.project, args.pdf_vision_option, full=args.full, dry_run=args.dry_run)
             logger.info("=== generate data completed ===")
             return 0
         elif args.command == 'prompt_tuning':
             logger.info("=== start prompt tuning ===")
-            asyncio.run(prompt_tuning(args.project))
+            asyncio.run(prompt_tuning(args.project, sample_chunks=args.sample_chunks))
             logger.info("=== prompt tuning completed ===")
             return 0
         elif args.command == 'build_index':
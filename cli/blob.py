@@ -1,10 +1,10 @@
 import os
-from azure.storage.blob import BlobServiceClient, generate_blob_sas, BlobSasPermissions, ContentSettings
-from datetime import datetime, timedelta, timezone
-from dotenv import load_dotenv
+from azure.storage.blob import ContentSettings
 
-from cli.common import load_project_env
+from cli.common import projects_dir
 from cli.logger import get_logger
+from libs.blob_pool import BlobClientPool
+from libs.common import get_project_env
 
 logger = get_logger('blob')
 
@@ -15,28 +15,24 @@ def get_container_name(project_name):
     return container_name
 
 
-def upload_file(project_name, file_path):
+blob_pool = BlobClientPool(
+    get_connection_string=lambda project_name: get_project_env(
+        project_name, "DATA_AZURE_CONNECTION_STRING", projects_dir=projects_dir
+    )
+)
 
-    load_project_env(project_name)
-    
-    connection_string = os.getenv("DATA_AZURE_CONNECTION_STRING", "")
 
-    print(f"Uploading file {file_path} to {project_name} {connection_string}")
+def upload_file(project_name, file_path, data: bytes | None = None):
 
-    if not connection_string:
-        return
-        
-    try:
-        container_name = get_container_name(project_name)
-
-        file_name = os.path.basename(file_path)
+    print(f"Uploading file {file_path} to {project_name}")
 
-        blob_service_client = BlobServiceClient.from_connection_string(connection_string)
+    file_name = os.path.basename(file_path)
 
-        container_client = blob_service_client.get_container_client(container_name)
+    try:
+        container_client = blob_pool.container_client(project_name, get_container_name(project_name))
 
-        if not container_client.exists():
-            container_client.create_container()
+        if container_client is None:
+            return
 
         blob_client = container_client.get_blob_client(file_name)
         
@@ -47,10 +43,13 @@ def upload_file(project_name, file_path):
         if file_path.endswith(".pdf"):
             content_settings = ContentSettings(content_type="application/pdf", content_disposition="inline")
         
-        with open(file_path, "rb") as data:
+        if data is not None:
+            # already in memory, e.g. a page rendered by the PDF pipeline
             blob_client.upload_blob(data, overwrite=True, content_settings=content_settings)
-            print(f"Uploaded file url {blob_client.url}")
-            container_client.set_container_access_policy(signed_identifiers={}, public_access="container")
+        else:
+            with open(file_path, "rb") as data:
+                blob_client.upload_blob(data, overwrite=True, content_settings=content_settings)
+        print(f"Uploaded file url {blob_client.url}")
     except Exception as e:
         import traceback
         print(f"Error uploading file {file_name}: {traceback.format_exc()}")
@@ -59,29 +58,8 @@ def upload_file(project_name, file_path):
 
 def get_sas_url(project_name, blob_name):
 
-    load_project_env(project_name)
-    
-    connection_string = os.getenv("DATA_AZURE_CONNECTION_STRING", "")
-
     try:
-        container_name = get_container_name(project_name)
-
-        expiry_time = datetime.now(timezone.utc) + timedelta(hours=1)
-
-        blob_service_client = BlobServiceClient.from_connection_string(connection_string)
-
-        sas_token = generate_blob_sas(
-            connection_string=connection_string,
-            container_name=container_name,
-            account_name=blob_service_client.account_name,
-            blob_name=blob_name,
-            permission=BlobSasPermissions(read=True),
-            expiry=expiry_time,
-            account_key=blob_service_client.credential.account_key
-        )
-        
-        sas_url = f"https://{blob_service_client.account_name}.blob.core.windows.net/{container_name}/{blob_name}?{sas_token}"
-
+        sas_url = blob_pool.sas_url(project_name, get_container_name(project_name), blob_name)
         return sas_url, ""
     except Exception as e:
         print(f"Error generating SAS URL for {blob_name}: {e}")
@@ -15,6 +15,11 @@ import traceback
 
 logger = get_logger('build_index_cli')
 
+def check_exit(e: SystemExit):
+    """graphrag's index commands exit 0 when every workflow succeeded; anything else is a failed build"""
+    if e.code not in (None, 0):
+        raise Exception(f"index workflows failed with exit code {e.code}")
+
 def build_index(project_name: str):
     """
     build index
@@ -64,19 +69,22 @@ def build_index(project_name: str):
             for subdir in ['output', 'logs', 'cache']:
                 os.makedirs(subdir, exist_ok=True)
             
-            # execute index command
-            index_cli(
-                root_dir=Path(target_dir),
-                verbose=True,
-                memprofile=False,
-                cache=True,
-                logger=LoggerType.PRINT,
-                config_filepath=None,
-                skip_validation=False,
-                output_dir=None,
-                dry_run=False,
-                resume=None,
-            )
+            # execute index command, which always ends in sys.exit
+            try:
+                index_cli(
+                    root_dir=Path(target_dir),
+                    verbose=True,
+                    memprofile=False,
+                    cache=True,
+                    logger=LoggerType.PRINT,
+                    config_filepath=None,
+                    skip_validation=False,
+                    output_dir=None,
+                    dry_run=False,
+                    resume=None,
+                )
+            except SystemExit as e:
+                check_exit(e)
             return True
         finally:
             os.chdir(current_dir)
@@ -140,16 +148,19 @@ def update_index(project_name: str):
             for subdir in ['output', 'logs', 'cache']:
                 os.makedirs(subdir, exist_ok=True)
             
-            update_cli(
-                root_dir=Path(target_dir),
-                verbose=True,
-                memprofile=False,
-                cache=True,
-                logger=LoggerType.PRINT,
-                config_filepath=None,
-                skip_validation=False,
-                output_dir=None
-            ) 
+            try:
+                update_cli(
+                    root_dir=Path(target_dir),
+                    verbose=True,
+                    memprofile=False,
+                    cache=True,
+                    logger=LoggerType.PRINT,
+                    config_filepath=None,
+                    skip_validation=False,
+                    output_dir=None
+                )
+            except SystemExit as e:
+                check_exit(e)
             return True
         finally:
             os.chdir(current_dir)
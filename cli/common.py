@@ -1,5 +1,5 @@
-import subprocess
 from cli.logger import get_logger
+from libs.command import run_streaming
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -14,33 +14,26 @@ def load_project_env(project_name: str):
         dotenv_path=f"{root_dir}/projects/{project_name}/.env", override=True)
 
 
+projects_dir = f"{root_dir}/projects"
+
+
 def project_path(project_name: str):
-    return Path(root_dir) / "projects" / project_name
+    return Path(projects_dir) / project_name
 
 
 def load_graphrag_config(project_name: str):
     return load_config(root_dir=project_path(project_name))
 
 def run_command(command: str, output: bool = False):
-    process = subprocess.Popen(
-        command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-    )
-
-    while True:
-        stdout = process.stdout.readline()
-        stderr = process.stderr.readline()
-
-        if output and stderr:
-            logger.error(stderr)
-
-        if stdout == "" and process.poll() is not None:
-            break
-        if stdout:
-            s = stdout.strip()
-            if output:
-                logger.info(s)
-            elif s.startswith("🚀"):
-                logger.info(s)
-
-    rc = process.poll()
-    return rc
\ No newline at end of file
+    def on_line(stream: str, line: str):
+        if stream == "stderr":
+            if output and line:
+                logger.error(line)
+            return
+        s = line.strip()
+        if output:
+            logger.info(s)
+        elif s.startswith("🚀"):
+            logger.info(s)
+
+    return run_streaming(command, on_line)
\ No newline at end of file
@@ -1,51 +1,42 @@
 import time
 import requests
-import html  # 添加html模块导入
 
-import pandas as pd
 import os
 import re
 import zipfile
-from cli.common import run_command, project_path
+from cli.common import project_path
 from theodoretools.url import url_to_name
 import cli.pdf_txt as pdf_txt
+from libs.config import settings
+from libs.downloader import DocDownloader
+from libs.file_copy import clear_dir
+from libs.ingest_manifest import IngestManifest, IngestSteps, generate_from_plan
+from libs.sheet_txt import column_values, sheet_columns, sheet_to_txt
 
 from cli.logger import get_logger
 
 logger = get_logger('generate_data_cli')
 
 
-def generate_data(project_name, pdf_vision_option):
+def generate_data(project_name, pdf_vision_option, full=False, dry_run=False):
     logger.info(f"generate data for project: {project_name}")
 
     project_dir = project_path(project_name)
+    manifest = IngestManifest(project_dir)
+
+    if not manifest.exists:
+        # input was rebuilt from scratch before the manifest existed, so it may hold files no original produced
+        clear_dir(f"{project_dir}/input")
+
+    plan = manifest.plan(pdf_vision_option, full=full)
+    for line in plan.report():
+        logger.info(line)
+    if dry_run:
+        return plan
+
+    generate_from_plan(project_name, pdf_vision_option, manifest, plan, ingest_steps)
+    return plan
 
-    # 1. clear input directory
-    run_command(f"rm -rf {project_dir}/input/*")
-
-    # 2. clear pdf_cache directory
-    run_command(f"rm -rf {project_dir}/pdf_cache/*")
-
-    # 3. copy original files to input
-    for root, dirs, files in os.walk(
-        f"{project_dir}/original"
-    ):
-        for file in files:
-            file_path = os.path.join(root, file)
-            prepare_file(file_path, file, project_name)
-
-    # 4. convert files to txt
-    for root, dirs, files in os.walk(f"{project_dir}/input"):
-        for file in files:
-            file_path = os.path.join(root, file)
-            convert_file(file_path, file,
-                     project_name, pdf_vision_option)
-
-    #  5. make file permissions to another user can write
-    for root, dirs, files in os.walk(f"{project_dir}/input"):
-        for file in files:
-            file_path = os.path.join(root, file)
-            os.chmod(file_path, 0o666)
 
 def create_zip(directory, output_path):
     with zipfile.ZipFile(output_path, "w") as zipf:
@@ -61,166 +52,99 @@ def convert_file(file_path, file, project_name, pdf_vision_option):
 
     if file.endswith(".xlsx") or file.endswith(".csv"):
         logger.info(f"converting `{file}`")
-        excel_to_txt(file_path, project_name)
+        return excel_to_txt(file_path, project_name)
 
     if file.endswith(".pdf"):
         logger.info(f"converting `{file}`")
         pdf_txt.save_pdf_pages_as_images(
             file_path, project_name, pdf_vision_option)
+    return True
 
 
-def excel_to_txt(file_path, project_name):
+def excel_to_txt(file_path, project_name) -> bool:
     file_name = os.path.basename(file_path)
+    txt_path = f"{project_path(project_name)}/input/{file_name}.txt"
+    try:
+        sheet_to_txt(file_path, txt_path, escape=True)
+        return True
+    except Exception as e:
+        logger.error(f"无法处理文件 {file_name}: {str(e)}")
+        # no half written text goes to the index
+        if os.path.exists(txt_path):
+            os.remove(txt_path)
+        return False
+
 
-    # 使用html模块进行转义
-    def escape_text(text):
-        if isinstance(text, (int, float)):
-            return str(text)
-        text = str(text)
-        # 转义花括号为HTML实体
-        text = text.replace("{", "&#123;").replace("}", "&#125;")
-        # HTML转义其他字符
-        return html.escape(text)
-
-    if file_path.endswith(".xlsx"):
-        excel_data = pd.ExcelFile(file_path, engine='openpyxl')
-        with open(
-            f"{project_path(project_name)}/input/{file_name}.txt", "w", encoding="utf-8"
-        ) as f:
-            for sheet_name in excel_data.sheet_names:
-                f.write(f"{escape_text(sheet_name)}\n\n")
-                df = excel_data.parse(sheet_name)
-                for index, row in df.iterrows():
-                    for column in df.columns:
-                        if pd.notna(row[column]):
-                            f.write(f"【{escape_text(column)}】: {escape_text(row[column])} ")
-                    f.write(f"\n\n")
-    elif file_path.endswith(".csv"):
-
-        df = pd.read_csv(file_path, encoding='utf-8')
-        with open(
-            f"{project_path(project_name)}/input/{file_name}.txt", "w", encoding="utf-8"
-        ) as f:
-            for column in df.columns:
-                f.write(f"{escape_text(column)}\n\n")
-            for index, row in df.iterrows():
-                for column in df.columns:
-                    if pd.notna(row[column]):
-                        f.write(f"【{escape_text(column)}】: {escape_text(row[column])} ")
-                f.write(f"\n\n")
-    else:
-
-        try:
-            excel_data = pd.ExcelFile(file_path, engine='openpyxl')
-            with open(
-                f"{project_path(project_name)}/input/{file_name}.txt", "w", encoding="utf-8"
-            ) as f:
-                for sheet_name in excel_data.sheet_names:
-                    f.write(f"{escape_text(sheet_name)}\n\n")
-                    df = excel_data.parse(sheet_name)
-                    for index, row in df.iterrows():
-                        for column in df.columns:
-                            if pd.notna(row[column]):
-                                f.write(f"【{escape_text(column)}】: {escape_text(row[column])} ")
-                        f.write(f"\n\n")
-        except Exception as e:
-            logger.error(f"无法处理文件 {file_name}: {str(e)}")
-
-
-def prepare_file(file_path, file, project_name):
+def prepare_file(file_path, file, project_name, copies: list[tuple[str, str]]) -> list[str]:
+    """
+    The files an original file produces in input. Downloads happen here;
+    plain copies are appended to copies as (source, target) so the caller can
+    run them together.
+    """
+    input_dir = f"{project_path(project_name)}/input"
     if file.endswith(".xlsx") or file.endswith(".csv"):
         if has_download_files(file_path):
-            download_files_from_xlsx_csv(file_path, file, project_name)
-        else:
-            run_command(
-                f"cp -r '{file_path}' {project_path(project_name)}/input/")
-            logger.info(f"copied {file} to input")
-    if file.endswith(".txt"):
-        run_command(f"cp -r '{file_path}' {project_path(project_name)}/input/")
-        logger.info(f"copied {file} to input")
+            return download_files_from_xlsx_csv(file_path, file, project_name)
+        copies.append((file_path, f"{input_dir}/{file}"))
+        return [f"{input_dir}/{file}"]
 
-    if file.endswith(".md"):
-        run_command(
-            f"cp -r '{file_path}' {project_path(project_name)}/input/{file}.txt"
-        )
-        logger.info(f"converted {file} to {file}.txt")
+    if file.endswith(".txt") or file.endswith(".pdf"):
+        copies.append((file_path, f"{input_dir}/{file}"))
+        return [f"{input_dir}/{file}"]
 
-    if file.endswith(".pdf"):
-        run_command(f"cp -r '{file_path}' {project_path(project_name)}/input/")
+    if file.endswith(".md"):
+        copies.append((file_path, f"{input_dir}/{file}.txt"))
+        return [f"{input_dir}/{file}.txt"]
 
     # if file.endswith('.zip'):
     #     deal_zip(file_path, project_name)
+    return []
 
 
 def has_download_files(file_path: str):
     if not file_path.endswith(".xlsx") and not file_path.endswith(".csv"):
         return False
 
+    # only the header is read
+    return "doc_url" in sheet_columns(file_path)
 
-    if file_path.endswith(".xlsx"):
-        df = pd.read_excel(file_path, engine='openpyxl')
-    elif file_path.endswith(".csv"):
-
-        df = pd.read_csv(file_path, encoding='utf-8')
-    else:
-
-        df = pd.read_excel(file_path, engine='openpyxl')
-    
 
-    if 'doc_url' in df.columns:
-        return True
-    
-
-    for index, row in df.iterrows():
-        if "doc_url" in row:
-            return True
-    
-    return False
-
-
-def download_files_from_xlsx_csv(file_path, file, project_name):
+def download_files_from_xlsx_csv(file_path, file, project_name) -> list[str]:
     if not file_path.endswith(".xlsx") and not file_path.endswith(".csv"):
-        return
-
- 
-    if file_path.endswith(".xlsx"):
-        df = pd.read_excel(file_path, engine='openpyxl')
-    elif file_path.endswith(".csv"):
-  
-        df = pd.read_csv(file_path, encoding='utf-8')
-    else:
-
-        df = pd.read_excel(file_path, engine='openpyxl')
-    
-    logger.info(df)
-    df_count = len(df) - 1
-    for index, row in df.iterrows():
-        if "doc_url" in row:
-            doc_url = row["doc_url"]
-            download_file(doc_url, index, df_count, project_name)
-
-
-def download_file(doc_url, index, df_count, project_name):
-    file_name = url_to_name(doc_url)
-    os.makedirs(f"{project_path(project_name)}/input", exist_ok=True)
-    file_path = os.path.join(f"{project_path(project_name)}/input", file_name)
-
-    if os.path.exists(file_path):
-        logger.info(f"[{index}/{df_count}] File already exists: {file_path}")
-        return
-
-    logger.info(f"[{index}/{df_count}] Downloading {doc_url}")
-
-    try:
-        response = requests.get(doc_url, stream=True)
-        response.raise_for_status()
+        return []
+
+    # only the doc_url column is read
+    doc_urls = [
+        doc_url
+        for index, doc_url in column_values(file_path, "doc_url")
+        if isinstance(doc_url, str) and doc_url.strip()
+    ]
+    logger.info(f"{len(doc_urls)} doc_url rows in {file}")
+
+    downloader = DocDownloader(
+        target_dir=f"{project_path(project_name)}/input",
+        manifest_path=f"{project_path(project_name)}/download_manifest.json",
+        name_for_url=url_to_name,
+        max_workers=settings.download_max_workers,
+        per_host=settings.download_per_host,
+        timeout=settings.download_timeout,
+    )
+
+    downloaded = []
+
+    def report(done, total, result):
+        if result.status != "error":
+            downloaded.append(os.path.join(downloader.target_dir, result.file_name))
+        if result.status == "error":
+            logger.info(f"[{done}/{total}] Downloaded Error: {result.url} {result.error}")
+        elif result.status == "downloaded":
+            logger.info(f"[{done}/{total}] Downloaded: {result.file_name}")
+        else:
+            logger.info(f"[{done}/{total}] File already exists: {result.file_name}")
 
-        with open(file_path, "wb") as file:
-            for chunk in response.iter_content(chunk_size=8192):
-                file.write(chunk)
-        logger.info(f"[{index}/{df_count}] Downloaded: {file_path}")
-    except requests.RequestException as e:
-        logger.info(f"[{index}/{df_count}] Downloaded Error: {e}")
+    counts = downloader.download_all(doc_urls, report)
+    logger.info(f"{file}: {counts}")
+    return downloaded
 
 
 def replace_image_tag(match):
@@ -275,3 +199,12 @@ def read_pdf(file_path):
             page = reader.pages[page_num]
             text += page.extract_text()
     return text
+
+
+ingest_steps = IngestSteps(
+    prepare_file=prepare_file,
+    convert_file=convert_file,
+    convert_pdfs=pdf_txt.save_pdfs_pages_as_images,
+    info=logger.info,
+    warning=logger.warning,
+)
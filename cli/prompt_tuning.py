@@ -5,26 +5,51 @@ from graphrag.config.load_config import load_config
 from pathlib import Path
 import asyncio
 import re
+import time
+
+from libs.config import settings
+from libs.prompt_sample import sample_input_for_tuning
 
 from cli.logger import get_logger
 
 logger = get_logger('prompt_tuning_cli')
 
-async def prompt_tuning(project_name: str):
+async def prompt_tuning(project_name: str, sample_chunks: int | None = None):
     base_path = f"{project_path(project_name)}"
     
     logger.info("This operation will overwrite your following files, please proceed with caution: \n\n - prompts/entity_extraction.txt \n\n - prompts/summarize_descriptions.txt \n\n - prompts/community_report.txt")
     
     logger.info(f'Start Tuning {project_name}')
-    
+
+    config = load_config(root_dir=Path(base_path))
+
+    # large inputs are tuned on a stratified sample instead of being loaded whole
+    sample_chunks = settings.prompt_tuning_sample_chunks if sample_chunks is None else sample_chunks
+    if sample_chunks > 0:
+        sample = sample_input_for_tuning(
+            config,
+            base_path,
+            budget=sample_chunks,
+            chunk_chars=settings.prompt_tuning_sample_chunk_chars,
+            seed=settings.prompt_tuning_sample_seed,
+            min_bytes=settings.prompt_tuning_sample_min_mb * 1024 * 1024,
+        )
+        if sample is not None:
+            logger.info(
+                f"{'reused' if sample.cached else 'sampled'} {sample.chunks} chunks from {sample.documents} documents "
+                f"of {sample.input_bytes / 1024 / 1024:.1f} MB input in {sample.seconds:.1f}s"
+            )
+
     # Generate prompts
+    started = time.perf_counter()
     (
         entity_extraction_prompt,
         entity_summarization_prompt,
         community_summarization_prompt,
     ) = await api.generate_indexing_prompts(
-            config=load_config(root_dir=Path(base_path)),
+            config=config,
             root=base_path)
+    logger.info(f"generated prompts in {time.perf_counter() - started:.1f}s")
     
     # Define file paths
     entity_extraction_prompt_path = f"{base_path}/prompts/entity_extraction.txt"
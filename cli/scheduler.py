@@ -0,0 +1,273 @@
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import yaml
+
+from cli.common import project_path, root_dir
+from cli.logger import get_logger
+from cli.stage_cache import StageFingerprints
+from cli.upload_file import upload_files
+from libs.command import run_streaming
+from libs.common import write_json_atomic
+
+logger = get_logger('scheduler_cli')
+
+state_version = 1
+
+# graphrag's default when settings.yaml does not set llm.concurrent_requests
+default_concurrent_requests = 25
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    cpu: bool  # renders and converts files on every core
+    llm: bool  # calls the project's LLM deployment
+
+
+stages = (
+    Stage("upload", cpu=False, llm=False),
+    Stage("generate_data", cpu=True, llm=True),
+    Stage("prompt_tuning", cpu=False, llm=True),
+    Stage("build_index", cpu=False, llm=True),
+)
+
+# stages skipped when their inputs did not change since they last succeeded
+fingerprinted_stages = ("prompt_tuning", "build_index")
+
+
+@dataclass
+class ProjectResult:
+    project: str
+    status: str = "pending"  # done, failed or pending
+    stages: dict[str, dict] = field(default_factory=dict)
+    error: str = ""
+
+
+class StageBudget:
+    """
+    CPU slots and LLM request slots shared by every project. A stage takes
+    what it needs of both at once, so one project's file conversion can run
+    next to other projects' indexing while the LLM stages together stay
+    within the budget.
+    """
+
+    def __init__(self, cpu_slots: int, llm_budget: int):
+        self.cpu_slots = max(1, cpu_slots)
+        self.llm_budget = max(1, llm_budget)
+        self.cpu_free = self.cpu_slots
+        self.llm_free = self.llm_budget
+        self._condition = threading.Condition()
+
+    def acquire(self, cpu: int, llm: int):
+        # a project asking for more than the whole budget runs alone
+        llm = min(llm, self.llm_budget)
+        with self._condition:
+            self._condition.wait_for(lambda: self.cpu_free >= cpu and self.llm_free >= llm)
+            self.cpu_free -= cpu
+            self.llm_free -= llm
+        return cpu, llm
+
+    def release(self, cpu: int, llm: int):
+        with self._condition:
+            self.cpu_free += cpu
+            self.llm_free += llm
+            self._condition.notify_all()
+
+
+def llm_weight(project_name: str) -> int:
+    """The LLM requests a project runs at once, from llm.concurrent_requests in its settings.yaml."""
+    try:
+        with open(project_path(project_name) / "settings.yaml", "r") as f:
+            settings = yaml.safe_load(f) or {}
+        return int((settings.get("llm") or {}).get("concurrent_requests") or default_concurrent_requests)
+    except (OSError, ValueError, yaml.YAMLError):
+        return default_concurrent_requests
+
+
+class ProjectState:
+    """
+    The stages a project finished in its current run, kept in
+    process_state.json. A run that stopped half way resumes at its first
+    unfinished stage; a finished run starts over.
+    """
+
+    def __init__(self, project_name: str, restart: bool = False):
+        self.path = project_path(project_name) / "process_state.json"
+        data = None
+        if not restart and os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                data = None
+        if data is not None and data.get("version") == state_version and not self.finished(data):
+            self.data = data
+            self.resumed = True
+        else:
+            self.data = {
+                "version": state_version,
+                "run_id": uuid.uuid4().hex,
+                "started_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "stages": {},
+            }
+            self.resumed = False
+
+    @staticmethod
+    def finished(data: dict) -> bool:
+        return all(data["stages"].get(stage.name, {}).get("status") in ("done", "skipped") for stage in stages)
+
+    def stage(self, name: str) -> dict:
+        return self.data["stages"].get(name, {})
+
+    def update(self, name: str, **values):
+        self.data["stages"][name] = {**self.stage(name), **values}
+        write_json_atomic(str(self.path), self.data)
+
+
+class ProjectScheduler:
+    """
+    Runs upload, generate_data, prompt_tuning and build_index for several
+    projects, up to max_projects at a time. Stages other than upload run as
+    child cli.py processes, since graphrag changes the working directory
+    and the environment of the process it indexes in.
+    """
+
+    def __init__(
+        self,
+        pdf_vision_option: str,
+        max_projects: int = 4,
+        cpu_slots: int = 1,
+        llm_budget: int = 100,
+        restart: bool = False,
+        force: bool = False,
+    ):
+        self.pdf_vision_option = pdf_vision_option
+        self.max_projects = max(1, max_projects)
+        self.budget = StageBudget(cpu_slots, llm_budget)
+        self.restart = restart
+        self.force = force
+
+    def run(self, projects: list[str], input_dirs: dict[str, str] | None = None) -> list[ProjectResult]:
+        input_dirs = input_dirs or {}
+        logger.info(
+            f"processing {len(projects)} projects, {self.max_projects} at a time, "
+            f"{self.budget.cpu_slots} cpu slots, llm budget {self.budget.llm_budget}"
+        )
+        with ThreadPoolExecutor(max_workers=self.max_projects) as executor:
+            futures = [executor.submit(self.run_project, project, input_dirs.get(project)) for project in projects]
+        results = [future.result() for future in futures]
+        for line in summary(results):
+            logger.info(line)
+        return results
+
+    def run_project(self, project_name: str, input_dir: str | None) -> ProjectResult:
+        state = ProjectState(project_name, restart=self.restart)
+        result = ProjectResult(project_name)
+        if state.resumed:
+            logger.info(f"[{project_name}] resuming run {state.data['run_id']}")
+        weight = llm_weight(project_name)
+        fingerprints = StageFingerprints(project_name)
+
+        for stage in stages:
+            previous = state.stage(stage.name)
+            if previous.get("status") in ("done", "skipped"):
+                result.stages[stage.name] = {**previous, "status": "resumed"}
+                continue
+
+            decision = None
+            command = stage.name
+            if stage.name in fingerprinted_stages:
+                decision = fingerprints.decide(stage.name, force=self.force)
+                logger.info(f"[{project_name}] {stage.name}: {decision.action} ({decision.reason})")
+                if decision.action == "skip":
+                    state.update(stage.name, status="skipped", duration=0, error="", reason=decision.reason)
+                    result.stages[stage.name] = state.stage(stage.name)
+                    continue
+                if decision.action == "update":
+                    command = "update_index"
+
+            cpu, llm = self.budget.acquire(1 if stage.cpu else 0, weight if stage.llm else 0)
+            started = time.monotonic()
+            state.update(stage.name, status="running", command=command, started_at=time.strftime("%Y-%m-%d %H:%M:%S"))
+            try:
+                status = self.run_stage(project_name, stage, input_dir, command)
+                error = ""
+                if decision is not None:
+                    fingerprints.record(decision)
+            except Exception as e:
+                status, error = "failed", str(e)
+            finally:
+                self.budget.release(cpu, llm)
+
+            duration = round(time.monotonic() - started, 1)
+            state.update(stage.name, status=status, duration=duration, error=error)
+            result.stages[stage.name] = state.stage(stage.name)
+            logger.info(f"[{project_name}] {stage.name} {status} in {duration}s")
+            if status == "failed":
+                result.status, result.error = "failed", f"{stage.name}: {error}"
+                logger.error(f"[{project_name}] {result.error}")
+                return result
+
+        result.status = "done"
+        return result
+
+    def run_stage(self, project_name: str, stage: Stage, input_dir: str | None, command: str) -> str:
+        if stage.name == "upload":
+            if not input_dir:
+                return "skipped"
+            upload_files(project_name, input_dir)
+            return "done"
+
+        args = [sys.executable, os.path.join(root_dir, "cli.py"), command, "--project", project_name]
+        if stage.name == "generate_data":
+            args += ["--pdf_vision_option", self.pdf_vision_option]
+
+        tail = deque(maxlen=20)
+
+        def on_line(stream: str, line: str):
+            if line:
+                tail.append(line)
+                logger.info(f"[{project_name}/{stage.name}] {line}")
+
+        rc = run_streaming(args, on_line, cwd=root_dir)
+        if rc != 0:
+            raise RuntimeError(f"exit code {rc}: {tail[-1] if tail else ''}")
+        return "done"
+
+
+def summary(results: list[ProjectResult]) -> list[str]:
+    """One line per project with the duration of every stage."""
+    done = sum(1 for result in results if result.status == "done")
+    lines = [f"{done} of {len(results)} projects processed"]
+    for result in results:
+        parts = []
+        for stage in stages:
+            info = result.stages.get(stage.name)
+            if info is None:
+                parts.append(f"{stage.name} -")
+            elif info["status"] in ("done", "failed"):
+                name = info.get("command", stage.name)
+                parts.append(f"{name} {info['status']} {info.get('duration', 0)}s")
+            else:
+                parts.append(f"{stage.name} {info['status']}")
+        lines.append(f"  {result.project}: {result.status} | " + ", ".join(parts))
+    return lines
+
+
+def list_projects() -> list[str]:
+    """Every initialized project, one with a settings.yaml, under projects/."""
+    projects_dir = os.path.join(root_dir, "projects")
+    if not os.path.isdir(projects_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(projects_dir)
+        if os.path.isfile(os.path.join(projects_dir, name, "settings.yaml"))
+    )
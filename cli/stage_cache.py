@@ -0,0 +1,121 @@
+import json
+import os
+import time
+from dataclasses import dataclass, field
+
+from cli.common import project_path
+from libs.common import write_json_atomic
+from libs.page_store import file_fingerprint
+
+cache_version = 1
+
+prompt_files = ("entity_extraction.txt", "summarize_descriptions.txt", "community_report.txt")
+
+
+@dataclass
+class StageDecision:
+    stage: str
+    action: str  # run, update or skip
+    reason: str
+    fingerprint: dict = field(default_factory=dict)
+
+
+class StageFingerprints:
+    """
+    The inputs prompt_tuning and build_index last succeeded with, kept in
+    stage_fingerprints.json: a hash per input/ text file, of settings.yaml
+    and, for build_index, of the tuned prompts.
+
+    prompt_tuning runs again when settings.yaml changed or an input file
+    changed or went away; new files alone keep the tuned prompts. build_index
+    is skipped when nothing changed and becomes update_index when input files
+    were only added.
+    """
+
+    def __init__(self, project_name: str):
+        self.project_dir = project_path(project_name)
+        self.path = self.project_dir / "stage_fingerprints.json"
+        self.stages: dict[str, dict] = {}
+        # size, mtime_ns and sha256 per input file, so unchanged files are not hashed again
+        self.stats: dict[str, list] = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == cache_version:
+                    self.stages = data["stages"]
+                    self.stats = data["stats"]
+            except (OSError, json.JSONDecodeError, KeyError):
+                pass
+
+    def input_hashes(self) -> dict[str, str]:
+        input_dir = self.project_dir / "input"
+        hashes = {}
+        stats = {}
+        if input_dir.is_dir():
+            for entry in os.scandir(input_dir):
+                if not entry.is_file() or not entry.name.endswith(".txt"):
+                    continue
+                stat = entry.stat()
+                cached = self.stats.get(entry.name)
+                if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+                    sha = cached[2]
+                else:
+                    sha = file_fingerprint(entry.path)
+                stats[entry.name] = [stat.st_size, stat.st_mtime_ns, sha]
+                hashes[entry.name] = sha
+        self.stats = stats
+        return hashes
+
+    def settings_hash(self) -> str:
+        settings_file = self.project_dir / "settings.yaml"
+        return file_fingerprint(str(settings_file)) if settings_file.exists() else ""
+
+    def prompts_hash(self) -> str:
+        parts = []
+        for name in prompt_files:
+            prompt_file = self.project_dir / "prompts" / name
+            parts.append(f"{name}:{file_fingerprint(str(prompt_file)) if prompt_file.exists() else ''}")
+        return ";".join(parts)
+
+    def is_indexed(self) -> bool:
+        output_dir = self.project_dir / "output"
+        return output_dir.is_dir() and any(output_dir.iterdir())
+
+    def decide(self, stage: str, force: bool = False) -> StageDecision:
+        fingerprint = {"inputs": self.input_hashes(), "settings": self.settings_hash()}
+        if stage == "build_index":
+            fingerprint["prompts"] = self.prompts_hash()
+        last = self.stages.get(stage)
+
+        if force:
+            return StageDecision(stage, "run", "forced", fingerprint)
+        if last is None:
+            return StageDecision(stage, "run", "no previous run", fingerprint)
+        if last["settings"] != fingerprint["settings"]:
+            return StageDecision(stage, "run", "settings.yaml changed", fingerprint)
+
+        if stage == "prompt_tuning":
+            if not all((self.project_dir / "prompts" / name).exists() for name in prompt_files):
+                return StageDecision(stage, "run", "prompts missing", fingerprint)
+        else:
+            if last.get("prompts") != fingerprint["prompts"]:
+                return StageDecision(stage, "run", "prompts changed", fingerprint)
+            if not self.is_indexed():
+                return StageDecision(stage, "run", "no index output", fingerprint)
+
+        previous, current = last["inputs"], fingerprint["inputs"]
+        changed = [name for name, sha in previous.items() if current.get(name) != sha]
+        added = [name for name in current if name not in previous]
+        if changed:
+            return StageDecision(stage, "run", f"{len(changed)} input files changed or removed", fingerprint)
+        if added:
+            if stage == "prompt_tuning":
+                return StageDecision(stage, "skip", f"{len(added)} input files added, prompts kept", fingerprint)
+            return StageDecision(stage, "update", f"{len(added)} input files added", fingerprint)
+        return StageDecision(stage, "skip", "inputs unchanged", fingerprint)
+
+    def record(self, decision: StageDecision):
+        """Remember the inputs of a stage that succeeded."""
+        self.stages[decision.stage] = {**decision.fingerprint, "finished_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+        write_json_atomic(str(self.path), {"version": cache_version, "stages": self.stages, "stats": self.stats})
@@ -6,6 +6,7 @@ class ArgConfig(BaseModel):
     project: str
     input_dir: str
     pdf_vision_option: str
+    force: bool = False
 
 class PreviewType(Enum):
     entities = "entities"
@@ -10,24 +10,19 @@ def upload_files(project_name, input_dir):
         parents=True, exist_ok=True)
     Path(f"{os.getcwd()}/projects/{project_name}/input").mkdir(
         parents=True, exist_ok=True)
-    
-    # clear original and input directory
-    for file in os.listdir(f"{os.getcwd()}/projects/{project_name}/original"):
-        os.remove(os.path.join(f"{os.getcwd()}/projects/{project_name}/original", file))
-    for file in os.listdir(f"{os.getcwd()}/projects/{project_name}/input"):
-        os.remove(os.path.join(f"{os.getcwd()}/projects/{project_name}/input", file))
 
-    if os.path.isdir(input_dir):
-        for file in os.listdir(input_dir):
-            # copy file to /app/projects/{project_name}/original
-            shutil.copy(os.path.join(input_dir, file), os.path.join(project_path(project_name), "original", file))
-            shutil.copy(os.path.join(input_dir, file), os.path.join(project_path(project_name), "input", file))
-            # make file permissions to another user can write
-            os.chmod(
-                f"{project_path(project_name)}/original/{file}", 0o666
-            )
-            os.chmod(
-                f"{project_path(project_name)}/input/{file}", 0o666
-            )
+    # mirror input_dir into original; input is rebuilt from original by generate_data,
+    # which converts only the files that are new or changed since its last run
+    original_dir = f"{project_path(project_name)}/original"
+    files = set(os.listdir(input_dir)) if os.path.isdir(input_dir) else set()
+    for file in os.listdir(original_dir):
+        if file not in files:
+            os.remove(os.path.join(original_dir, file))
+
+    for file in sorted(files):
+        # copy2 keeps the mtime, so generate_data does not hash files that did not change
+        shutil.copy2(os.path.join(input_dir, file), os.path.join(original_dir, file))
+        # make file permissions to another user can write
+        os.chmod(f"{original_dir}/{file}", 0o666)
 
     return True
\ No newline at end of file
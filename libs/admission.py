@@ -0,0 +1,88 @@
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+
+class SearchOverloaded(Exception):
+    """Raised when a project cannot take another search request right now."""
+
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+@dataclass
+class _ProjectSlots:
+    semaphore: asyncio.Semaphore
+    waiting: int = 0
+    running: int = 0
+    rejected: int = 0
+    timed_out: int = 0
+
+
+@dataclass
+class ProjectLimiter:
+    """
+    Per-project concurrency limit with queue-depth admission control.
+
+    At most max_concurrency searches run per project. Up to max_queue more may
+    wait for a slot; beyond that requests are rejected with 429, and a request
+    that waited longer than queue_timeout seconds is rejected with 503.
+    """
+
+    max_concurrency: int
+    max_queue: int
+    queue_timeout: float
+    _projects: dict[str, _ProjectSlots] = field(default_factory=dict)
+
+    def _slots(self, project_name: str) -> _ProjectSlots:
+        if project_name not in self._projects:
+            self._projects[project_name] = _ProjectSlots(asyncio.Semaphore(self.max_concurrency))
+        return self._projects[project_name]
+
+    @asynccontextmanager
+    async def slot(self, project_name: str):
+        slots = self._slots(project_name)
+
+        if not slots.semaphore.locked():
+            # a free slot is taken without yielding to the event loop
+            await slots.semaphore.acquire()
+        elif slots.waiting >= self.max_queue:
+            slots.rejected += 1
+            raise SearchOverloaded(
+                f"Too many queued search requests for project {project_name}",
+                status_code=429,
+                retry_after=max(1, int(self.queue_timeout)),
+            )
+        else:
+            slots.waiting += 1
+            try:
+                await asyncio.wait_for(slots.semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                slots.timed_out += 1
+                raise SearchOverloaded(
+                    f"Timed out waiting for a search slot for project {project_name}",
+                    status_code=503,
+                    retry_after=max(1, int(self.queue_timeout)),
+                )
+            finally:
+                slots.waiting -= 1
+
+        slots.running += 1
+        try:
+            yield
+        finally:
+            slots.running -= 1
+            slots.semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            project_name: {
+                "running": slots.running,
+                "waiting": slots.waiting,
+                "rejected": slots.rejected,
+                "timed_out": slots.timed_out,
+            }
+            for project_name, slots in self._projects.items()
+        }
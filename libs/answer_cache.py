@@ -0,0 +1,222 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from libs.common import (
+    delete_cache_json_file,
+    generate_text_fingerprint,
+    get_cache_json_from_file,
+    query_cache_dir,
+    set_cache_json_to_file,
+)
+from libs.project_cache import project_fingerprint
+
+logger = logging.getLogger(__name__)
+
+cache_version = 1
+
+# disk files older than the ttl are swept at most this often
+prune_interval = 3600
+
+
+def answer_key(parts: dict) -> str:
+    """Fingerprint of everything that decides an answer."""
+    return generate_text_fingerprint(json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str))
+
+
+def index_fingerprint(root: Path) -> str:
+    return generate_text_fingerprint(repr(project_fingerprint(root)))
+
+
+@dataclass
+class CachedAnswer:
+    key: str
+    project_name: str
+    index: str  # index_fingerprint of the project when the answer was made
+    response: str
+    prompt_tokens: int = 0
+    question_gen: Any = None
+    created_at: float = field(default_factory=time.time)
+
+    @property
+    def size(self) -> int:
+        return len(self.response.encode("utf-8")) + len(json.dumps(self.question_gen, default=str)) + 256
+
+
+@dataclass
+class AnswerLookup:
+    """One request's view of the cache: its keys and, on a hit, the answer and which tier served it."""
+    project_name: str
+    key: str
+    scope: str  # key of the request without its last message, for the semantic tier
+    index: str
+    answer: CachedAnswer | None = None
+    tier: str = ""  # exact or semantic
+    similarity: float = 0.0
+    embedding: list[float] | None = None
+
+
+class AnswerCache:
+    """
+    Answers of chat completions, kept in memory least-recently-used first up
+    to max_entries and max_bytes, and written through to query_cache/ so they
+    survive a restart and are shared by every API worker. Entries expire
+    after ttl seconds, and an answer made from another build of the
+    project's index is never served.
+
+    With a semantic_threshold above 0, a request that misses exactly is
+    matched against the embeddings of earlier questions asked with the same
+    history, project and options; the nearest one at or above the
+    threshold is served. Embeddings live in memory only.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float, semantic_threshold: float = 0.0):
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.semantic_threshold = semantic_threshold
+        self._entries: OrderedDict[str, CachedAnswer] = OrderedDict()
+        self._size = 0
+        # scope -> key -> normalized question embedding
+        self._vectors: dict[str, dict[str, np.ndarray]] = {}
+        self._scopes: dict[str, str] = {}
+        self._last_prune = 0.0
+        self.hits = {"exact": 0, "semantic": 0, "disk": 0}
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def expired(self, answer: CachedAnswer) -> bool:
+        return time.time() - answer.created_at > self.ttl
+
+    async def lookup(self, project_name: str, root: Path, key: str, scope: str) -> AnswerLookup:
+        """The exact tier: memory first, then the file written by any worker."""
+        lookup = AnswerLookup(project_name, key, scope, index_fingerprint(root))
+        answer = self._entries.get(key)
+        hit = "exact"
+        if answer is None:
+            data = await asyncio.to_thread(get_cache_json_from_file, key)
+            if data is not None and data.get("version") == cache_version:
+                answer = CachedAnswer(**data["answer"])
+                if answer.index == lookup.index and not self.expired(answer):
+                    hit = "disk"
+                    self._add(answer)
+        if answer is not None and (answer.index != lookup.index or self.expired(answer)):
+            self._remove(key)
+            self.invalidations += 1
+            await asyncio.to_thread(delete_cache_json_file, key)
+            answer = None
+        if answer is not None:
+            self._entries.move_to_end(key)
+            # exact counts answers found in memory, disk those read back from another worker or a restart
+            self.hits[hit] += 1
+            lookup.answer, lookup.tier = answer, "exact"
+        return lookup
+
+    def match(self, lookup: AnswerLookup, embedding: list[float]) -> AnswerLookup:
+        """The semantic tier: the nearest question with the same scope, if similar enough."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        lookup.embedding = embedding
+        vectors = self._vectors.get(lookup.scope)
+        if norm == 0 or not vectors:
+            return lookup
+        vector /= norm
+        keys = list(vectors.keys())
+        scores = np.stack([vectors[key] for key in keys]) @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.semantic_threshold:
+            return lookup
+        answer = self._entries.get(keys[best])
+        if answer is None or answer.index != lookup.index or self.expired(answer):
+            return lookup
+        self._entries.move_to_end(answer.key)
+        self.hits["semantic"] += 1
+        lookup.answer, lookup.tier, lookup.similarity = answer, "semantic", float(scores[best])
+        return lookup
+
+    async def store(self, lookup: AnswerLookup, response: str, prompt_tokens: int = 0, question_gen: Any = None):
+        answer = CachedAnswer(lookup.key, lookup.project_name, lookup.index, response, prompt_tokens or 0, question_gen)
+        self._add(answer)
+        if lookup.embedding is not None:
+            vector = np.asarray(lookup.embedding, dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            if norm:
+                self._vectors.setdefault(lookup.scope, {})[answer.key] = vector / norm
+                self._scopes[answer.key] = lookup.scope
+        self.stores += 1
+        await asyncio.to_thread(set_cache_json_to_file, answer.key, {"version": cache_version, "answer": asdict(answer)})
+        if time.time() - self._last_prune > prune_interval:
+            self._last_prune = time.time()
+            await asyncio.to_thread(self.prune_disk)
+
+    def record_miss(self):
+        self.misses += 1
+
+    def _add(self, answer: CachedAnswer):
+        if answer.key in self._entries:
+            self._remove(answer.key)
+        self._entries[answer.key] = answer
+        self._size += answer.size
+        # always keep the newest answer, even if it alone exceeds the budget
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        answer = self._entries.pop(key, None)
+        if answer is not None:
+            self._size -= answer.size
+        scope = self._scopes.pop(key, None)
+        if scope is not None:
+            vectors = self._vectors.get(scope, {})
+            vectors.pop(key, None)
+            if not vectors:
+                self._vectors.pop(scope, None)
+
+    def invalidate(self, project_name: str | None = None):
+        """Forget the answers held in memory for project_name, or all of them; files expire on their own."""
+        for key, answer in list(self._entries.items()):
+            if project_name is None or answer.project_name == project_name:
+                self._remove(key)
+                self.invalidations += 1
+
+    def prune_disk(self):
+        """Delete answer files older than the ttl."""
+        if not os.path.isdir(query_cache_dir):
+            return
+        cutoff = time.time() - self.ttl
+        removed = 0
+        for entry in os.scandir(query_cache_dir):
+            try:
+                if entry.name.endswith(".json") and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        if removed:
+            logger.info(f"pruned {removed} expired answers from {query_cache_dir}")
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "entries": len(self._entries),
+            "size_bytes": self._size,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "semantic_questions": len(self._scopes),
+            "semantic_threshold": self.semantic_threshold,
+        }
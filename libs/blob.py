@@ -1,9 +1,9 @@
 import os
-from azure.storage.blob import BlobServiceClient, generate_blob_sas, BlobSasPermissions, ContentSettings
-from datetime import datetime, timedelta, timezone
+from azure.storage.blob import ContentSettings
 import streamlit as st
-from dotenv import load_dotenv
-from libs.common import load_project_env
+from libs.blob_pool import BlobClientPool
+from libs.common import get_project_env
+
 
 def get_container_name(project_name):
     container_name = "graphrag" + project_name + "cache"
@@ -12,26 +12,20 @@ def get_container_name(project_name):
     return container_name
 
 
-def upload_file(project_name, file_path):
+blob_pool = BlobClientPool(
+    get_connection_string=lambda project_name: get_project_env(project_name, "DATA_AZURE_CONNECTION_STRING")
+)
 
-    load_project_env(project_name)
-    
-    connection_string = os.getenv("DATA_AZURE_CONNECTION_STRING", "")
-    
-    if not connection_string:
-        return
-        
-    try:
-        container_name = get_container_name(project_name)
 
-        file_name = os.path.basename(file_path)
+def upload_file(project_name, file_path, data: bytes | None = None):
 
-        blob_service_client = BlobServiceClient.from_connection_string(connection_string)
+    file_name = os.path.basename(file_path)
 
-        container_client = blob_service_client.get_container_client(container_name)
+    try:
+        container_client = blob_pool.container_client(project_name, get_container_name(project_name))
 
-        if not container_client.exists():
-            container_client.create_container()
+        if container_client is None:
+            return
 
         blob_client = container_client.get_blob_client(file_name)
         
@@ -42,9 +36,12 @@ def upload_file(project_name, file_path):
         if file_path.endswith(".pdf"):
             content_settings = ContentSettings(content_type="application/pdf", content_disposition="inline")
         
-        with open(file_path, "rb") as data:
+        if data is not None:
+            # already in memory, e.g. a page rendered by the PDF pipeline
             blob_client.upload_blob(data, overwrite=True, content_settings=content_settings)
-            container_client.set_container_access_policy(signed_identifiers={}, public_access="container")
+        else:
+            with open(file_path, "rb") as data:
+                blob_client.upload_blob(data, overwrite=True, content_settings=content_settings)
     except Exception as e:
         st.error(f"Error uploading file {file_name}: {e}")
         raise e
@@ -52,29 +49,8 @@ def upload_file(project_name, file_path):
 
 def get_sas_url(project_name, blob_name):
 
-    load_project_env(project_name)
-    
-    connection_string = os.getenv("DATA_AZURE_CONNECTION_STRING", "")
-
     try:
-        container_name = get_container_name(project_name)
-
-        expiry_time = datetime.now(timezone.utc) + timedelta(hours=1)
-
-        blob_service_client = BlobServiceClient.from_connection_string(connection_string)
-
-        sas_token = generate_blob_sas(
-            connection_string=connection_string,
-            container_name=container_name,
-            account_name=blob_service_client.account_name,
-            blob_name=blob_name,
-            permission=BlobSasPermissions(read=True),
-            expiry=expiry_time,
-            account_key=blob_service_client.credential.account_key
-        )
-        
-        sas_url = f"https://{blob_service_client.account_name}.blob.core.windows.net/{container_name}/{blob_name}?{sas_token}"
-
+        sas_url = blob_pool.sas_url(project_name, get_container_name(project_name), blob_name)
         return sas_url, ""
     except Exception as e:
         print(f"Error generating SAS URL for {blob_name}: {e}")
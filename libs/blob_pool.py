@@ -0,0 +1,97 @@
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from azure.storage.blob import BlobServiceClient, generate_blob_sas, BlobSasPermissions
+
+
+class BlobClientPool:
+    """
+    Per-project BlobServiceClient pool and SAS URL cache.
+
+    Clients are built once per connection string and shared across threads (the
+    Azure SDK clients are thread safe). A SAS URL is handed out again until it
+    is within sas_refresh_margin of expiring. client_factory and clock can be
+    replaced with fakes, or pointed at Azurite through the connection string.
+    """
+
+    def __init__(
+        self,
+        get_connection_string: Callable[[str], str],
+        client_factory: Callable[[str], BlobServiceClient] = BlobServiceClient.from_connection_string,
+        sas_lifetime: timedelta = timedelta(hours=1),
+        sas_refresh_margin: timedelta = timedelta(minutes=10),
+        clock: Callable[[], datetime] = lambda: datetime.now(timezone.utc),
+    ):
+        self.get_connection_string = get_connection_string
+        self.client_factory = client_factory
+        self.sas_lifetime = sas_lifetime
+        self.sas_refresh_margin = sas_refresh_margin
+        self.clock = clock
+        self._clients: dict[str, tuple[str, BlobServiceClient]] = {}
+        self._prepared_containers: set[tuple[str, str]] = set()
+        self._sas_urls: dict[tuple[str, str, str], tuple[str, datetime]] = {}
+        self._lock = threading.Lock()
+
+    def service_client(self, project_name: str) -> BlobServiceClient | None:
+        """The project's client, or None when it has no connection string."""
+        connection_string = self.get_connection_string(project_name)
+        if not connection_string:
+            return None
+
+        with self._lock:
+            cached = self._clients.get(project_name)
+            if cached is not None and cached[0] == connection_string:
+                return cached[1]
+
+        client = self.client_factory(connection_string)
+        with self._lock:
+            self._clients[project_name] = (connection_string, client)
+            # the account may have changed, so nothing issued for the old one is valid
+            self._prepared_containers = {key for key in self._prepared_containers if key[0] != project_name}
+            self._sas_urls = {key: value for key, value in self._sas_urls.items() if key[0] != project_name}
+        return client
+
+    def container_client(self, project_name: str, container_name: str):
+        """The container client, creating the container and making it public on first use."""
+        client = self.service_client(project_name)
+        if client is None:
+            return None
+
+        container_client = client.get_container_client(container_name)
+        key = (project_name, container_name)
+        if key not in self._prepared_containers:
+            if not container_client.exists():
+                container_client.create_container()
+            container_client.set_container_access_policy(signed_identifiers={}, public_access="container")
+            with self._lock:
+                self._prepared_containers.add(key)
+        return container_client
+
+    def sas_url(self, project_name: str, container_name: str, blob_name: str) -> str:
+        # resolved first so a changed connection string drops the URLs of the old account
+        client = self.service_client(project_name)
+        if client is None:
+            raise ValueError("DATA_AZURE_CONNECTION_STRING is not set")
+
+        key = (project_name, container_name, blob_name)
+        now = self.clock()
+        with self._lock:
+            cached = self._sas_urls.get(key)
+        if cached is not None and cached[1] - now > self.sas_refresh_margin:
+            return cached[0]
+
+        expiry_time = now + self.sas_lifetime
+        sas_token = generate_blob_sas(
+            container_name=container_name,
+            account_name=client.account_name,
+            blob_name=blob_name,
+            permission=BlobSasPermissions(read=True),
+            expiry=expiry_time,
+            account_key=client.credential.account_key,
+        )
+        sas_url = f"{client.url.rstrip('/')}/{container_name}/{blob_name}?{sas_token}"
+
+        with self._lock:
+            self._sas_urls[key] = (sas_url, expiry_time)
+        return sas_url
@@ -0,0 +1,50 @@
+import os
+import selectors
+import subprocess
+from typing import Callable
+
+
+def run_streaming(command: str | list[str], on_line: Callable[[str, str], None], cwd: str | None = None) -> int:
+    """
+    Run command and call on_line(stream, line) from the calling thread for
+    every line it prints, stream being "stdout" or "stderr". Returns the exit
+    code.
+
+    Both pipes are read as data arrives, so a process writing a lot to one of
+    them never blocks waiting for the other to be read. A string command runs
+    through the shell, a list runs directly.
+    """
+    process = subprocess.Popen(
+        command,
+        shell=isinstance(command, str),
+        cwd=cwd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+    selector = selectors.DefaultSelector()
+    selector.register(process.stdout, selectors.EVENT_READ, "stdout")
+    selector.register(process.stderr, selectors.EVENT_READ, "stderr")
+    pending = {"stdout": b"", "stderr": b""}
+
+    try:
+        while selector.get_map():
+            for key, _ in selector.select():
+                stream = key.data
+                data = os.read(key.fd, 64 * 1024)
+                if not data:
+                    selector.unregister(key.fileobj)
+                    if pending[stream]:
+                        on_line(stream, pending[stream].decode("utf-8", errors="replace"))
+                        pending[stream] = b""
+                    continue
+                *lines, pending[stream] = (pending[stream] + data).split(b"\n")
+                for line in lines:
+                    on_line(stream, line.decode("utf-8", errors="replace").rstrip("\r"))
+    finally:
+        selector.close()
+        process.stdout.close()
+        process.stderr.close()
+
+    return process.wait()
@@ -1,8 +1,8 @@
 import json
 import re
 import os
-import subprocess
 import streamlit as st
+from libs.command import run_streaming
 from theodoretools.fs import list_subdirectories
 import libs.config as config
 from graphrag.config.load_config import load_config
@@ -10,13 +10,74 @@ from pathlib import Path
 import sys
 import signal
 import hashlib
-from dotenv import load_dotenv
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv, dotenv_values
 
 
 def load_project_env(project_name: str):
     load_dotenv(dotenv_path=f"/app/projects/{project_name}/.env", override=True)
 
 
+_project_envs: dict[str, tuple[int, dict]] = {}
+_environ_lock = threading.RLock()
+
+
+def project_env_values(project_name: str, projects_dir: str = "/app/projects") -> dict:
+    """
+    The values of a project's .env, parsed once and re-parsed when its mtime
+    changes. os.environ is left alone.
+    """
+    env_file = f"{projects_dir}/{project_name}/.env"
+    try:
+        mtime_ns = os.stat(env_file).st_mtime_ns
+    except FileNotFoundError:
+        mtime_ns = 0
+    cached = _project_envs.get(env_file)
+    if cached is None or cached[0] != mtime_ns:
+        cached = (mtime_ns, dotenv_values(env_file) if mtime_ns else {})
+        _project_envs[env_file] = cached
+    return cached[1]
+
+
+def get_project_env(project_name: str, key: str, default: str = "", projects_dir: str = "/app/projects"):
+    """
+    Read one value of a project's .env without touching os.environ. Keys
+    missing from it fall back to the process environment, as with
+    load_project_env.
+    """
+    value = project_env_values(project_name, projects_dir).get(key)
+    return value if value is not None else os.getenv(key, default)
+
+
+@contextmanager
+def project_environ(project_name: str):
+    """
+    Overlay a project's .env on os.environ for the duration of the block and
+    restore it afterwards, for graphrag's config loader, which reads .env
+    files, GRAPHRAG_* fallbacks and ${VAR} tokens from the process
+    environment only.
+
+    os.environ is process wide: any other thread reads the overlay while the
+    block runs. The lock only keeps project_environ blocks from interleaving,
+    so keep the block short and synchronous and read project values with
+    get_project_env everywhere else.
+    """
+    with _environ_lock:
+        previous = {}
+        for key, value in project_env_values(project_name).items():
+            previous[key] = os.environ.get(key)
+            os.environ[key] = value or ""
+        try:
+            yield
+        finally:
+            for key, value in previous.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+
+
 def project_path(project_name: str):
     return Path("/app/projects") / project_name
 
@@ -196,28 +257,18 @@ def get_project_names():
 
 
 def run_command(command: str, output: bool = False):
-    process = subprocess.Popen(
-        command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-    )
-
-    while True:
-        stdout = process.stdout.readline()
-        stderr = process.stderr.readline()
+    def on_line(stream: str, line: str):
+        if stream == "stderr":
+            if output and line:
+                st.error(line)
+            return
+        s = line.strip()
+        if output:
+            st.write(s)
+        elif s.startswith("🚀"):
+            st.write(s)
 
-        if output and stderr:
-            st.error(stderr)
-
-        if stdout == "" and process.poll() is not None:
-            break
-        if stdout:
-            s = stdout.strip()
-            if output:
-                st.write(s)
-            elif s.startswith("🚀"):
-                st.write(s)
-
-    rc = process.poll()
-    return rc
+    return run_streaming(command, on_line)
 
 
 def generate_text_fingerprint(text, algorithm="sha256"):
@@ -226,19 +277,39 @@ def generate_text_fingerprint(text, algorithm="sha256"):
     return hash_object.hexdigest()
 
 
+query_cache_dir = "/app/cache/query_cache"
+
+
+def write_json_atomic(file_path: str, data: dict, indent: int | None = None):
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+    os.replace(tmp_path, file_path)
+
+
+def cache_json_file(cache_key: str) -> str:
+    return f"{query_cache_dir}/{cache_key}.json"
+
+
 def get_cache_json_from_file(cache_key: str):
-    cache_file = f"/app/cache/query_cache/{cache_key}.json"
+    cache_file = cache_json_file(cache_key)
     if os.path.exists(cache_file):
-        with open(cache_file, "r") as file:
-            return json.load(file)
+        try:
+            with open(cache_file, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, json.JSONDecodeError):
+            return None
     return None
 
 
 def set_cache_json_to_file(cache_key: str, data: dict):
-    cache_file = f"/app/cache/query_cache/{cache_key}.json"
-    cache_file_dir = os.path.dirname(cache_file)
-    if not os.path.exists(cache_file_dir):
-        os.makedirs(cache_file_dir, exist_ok=True)
+    # written whole and renamed, so a concurrent reader never sees half a file
+    write_json_atomic(cache_json_file(cache_key), data)
+
 
-    with open(cache_file, "w") as file:
-        json.dump(data, file, ensure_ascii=False, indent=4)
+def delete_cache_json_file(cache_key: str):
+    try:
+        os.remove(cache_json_file(cache_key))
+    except FileNotFoundError:
+        pass
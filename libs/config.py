@@ -94,6 +94,37 @@ class Settings(BaseSettings):
     community_level: int = 2
     dynamic_community_selection: bool = False
     response_type: str = "Multiple Paragraphs"
+    engine_cache_max_mb: int = 4096
+    engine_cache_max_entries: int = 64
+    parquet_projection: bool = True
+    search_max_concurrency: int = 4
+    search_max_queue: int = 16
+    search_queue_timeout: float = 30.0
+    pdf_vision_concurrency: int = 8
+    pdf_vision_max_attempts: int = 6
+    pdf_render_workers: int = 0  # 0 uses every core
+    pdf_native_text_gate: bool = True
+    pdf_native_text_min_chars: int = 200
+    pdf_native_text_max_image_coverage: float = 0.15
+    pdf_native_text_max_vector_items: int = 50
+    download_max_workers: int = 16
+    download_per_host: int = 4
+    download_timeout: float = 60.0
+    ingest_copy_workers: int = 8
+    ingest_hardlink: bool = False  # input shares the original file, so in-place rewrites of it show up in input
+    process_max_projects: int = 4
+    process_cpu_slots: int = 1
+    process_llm_budget: int = 100
+    prompt_tuning_sample_min_mb: int = 64  # inputs at least this large are sampled for prompt tuning
+    prompt_tuning_sample_chunks: int = 300
+    prompt_tuning_sample_chunk_chars: int = 1200
+    prompt_tuning_sample_seed: int = 0
+    answer_cache_enabled: bool = True
+    answer_cache_ttl: int = 24 * 3600
+    answer_cache_max_entries: int = 10000
+    answer_cache_max_mb: int = 256
+    answer_cache_semantic_threshold: float = 0.0  # 0 turns the semantic tier off; 0.97 matches rephrasings
+    sse_frame_ms: int = 0  # 0 sends every token as it arrives; 20 joins the tokens of each 20 ms into one event
 
     @property
     def website_address(self) -> str:
@@ -0,0 +1,174 @@
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from libs.common import write_json_atomic
+
+manifest_version = 1
+
+
+@dataclass
+class DownloadResult:
+    url: str
+    file_name: str
+    status: str  # downloaded, not_modified, skipped or error
+    size: int = 0
+    error: str = ""
+
+
+def pooled_session(max_connections: int, retries: int = 3) -> requests.Session:
+    """A session keeping max_connections alive per host, retrying connection errors and 5xx with backoff."""
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class DocDownloader:
+    """
+    Downloads doc_url files into target_dir, several at a time but at most
+    per_host at once from one host.
+
+    Every finished URL is recorded in a JSON manifest with its ETag and
+    Last-Modified. A re-run skips files the manifest already has, revalidating
+    them with a conditional request when the server gave validators, so only
+    missing or changed files are fetched. Files are written to a temporary
+    name and renamed into place, so a file in target_dir is always complete.
+    """
+
+    def __init__(
+        self,
+        target_dir: str,
+        manifest_path: str,
+        name_for_url: Callable[[str], str],
+        max_workers: int = 16,
+        per_host: int = 4,
+        timeout: float = 60.0,
+        session: requests.Session | None = None,
+    ):
+        self.target_dir = target_dir
+        self.manifest_path = manifest_path
+        self.name_for_url = name_for_url
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.session = session or pooled_session(max_workers)
+        self.manifest = self.load_manifest()
+        self._hosts: dict[str, threading.Semaphore] = {}
+        self._lock = threading.Lock()
+
+    def load_manifest(self) -> dict:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        if manifest.get("version") != manifest_version:
+            return {}
+        return manifest.get("files", {})
+
+    def save_manifest(self):
+        with self._lock:
+            data = {"version": manifest_version, "files": dict(self.manifest)}
+        write_json_atomic(self.manifest_path, data, indent=2)
+
+    def host_slot(self, url: str) -> threading.Semaphore:
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = threading.Semaphore(self.per_host)
+            return self._hosts[host]
+
+    def download(self, url: str) -> DownloadResult:
+        file_name = self.name_for_url(url)
+        file_path = os.path.join(self.target_dir, file_name)
+        with self._lock:
+            entry = self.manifest.get(url)
+
+        headers = {}
+        if entry is not None and os.path.exists(file_path):
+            if not entry.get("etag") and not entry.get("last_modified"):
+                return DownloadResult(url, file_name, "skipped", entry.get("size", 0))
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        elif entry is None and os.path.exists(file_path):
+            # downloaded before the manifest existed
+            self.record(url, file_name, os.path.getsize(file_path), None)
+            return DownloadResult(url, file_name, "skipped", os.path.getsize(file_path))
+
+        tmp_path = f"{file_path}.{uuid.uuid4().hex}.part"
+        try:
+            with self.host_slot(url):
+                with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                    if response.status_code == 304:
+                        return DownloadResult(url, file_name, "not_modified", entry.get("size", 0))
+                    response.raise_for_status()
+                    size = 0
+                    with open(tmp_path, "wb") as f:
+                        for chunk in response.iter_content(chunk_size=1024 * 1024):
+                            f.write(chunk)
+                            size += len(chunk)
+            os.replace(tmp_path, file_path)
+            self.record(url, file_name, size, response)
+            return DownloadResult(url, file_name, "downloaded", size)
+        except (requests.RequestException, OSError) as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return DownloadResult(url, file_name, "error", error=str(e))
+
+    def record(self, url: str, file_name: str, size: int, response: requests.Response | None):
+        with self._lock:
+            self.manifest[url] = {
+                "file": file_name,
+                "size": size,
+                "etag": response.headers.get("ETag") if response is not None else None,
+                "last_modified": response.headers.get("Last-Modified") if response is not None else None,
+                "downloaded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+
+    def download_all(self, urls: list[str], on_result: Callable[[int, int, DownloadResult], None] | None = None) -> dict:
+        """
+        Download every URL, calling on_result(done, total, result) from the
+        calling thread as each one finishes. Returns the count per status.
+        """
+        os.makedirs(self.target_dir, exist_ok=True)
+        urls = list(dict.fromkeys(urls))
+        counts = {"downloaded": 0, "not_modified": 0, "skipped": 0, "error": 0}
+        last_saved = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self.download, url) for url in urls]
+            try:
+                for done, future in enumerate(as_completed(futures), start=1):
+                    result = future.result()
+                    counts[result.status] += 1
+                    if on_result is not None:
+                        on_result(done, len(urls), result)
+                    # progress survives an interrupted run
+                    if result.status == "downloaded" and time.monotonic() - last_saved > 5:
+                        self.save_manifest()
+                        last_saved = time.monotonic()
+            finally:
+                self.save_manifest()
+
+        return counts
@@ -0,0 +1,107 @@
+import errno
+import fcntl
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# linux ioctl sharing the source extents with the destination (btrfs, xfs, overlayfs on those)
+FICLONE = 0x40049409
+
+# errors meaning the filesystem cannot do this kind of copy, so the next method is tried
+unsupported_errors = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTTY, errno.EPERM, errno.EBADF}
+
+
+def reflink(src_fd: int, dst_fd: int) -> bool:
+    try:
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+        return True
+    except OSError as e:
+        if e.errno in unsupported_errors:
+            return False
+        raise
+
+
+def copy_range(src_fd: int, dst_fd: int, size: int) -> bool:
+    """Copy inside the kernel with copy_file_range, which can also offload to the filesystem."""
+    if not hasattr(os, "copy_file_range"):
+        return False
+    copied = 0
+    try:
+        while copied < size:
+            sent = os.copy_file_range(src_fd, dst_fd, size - copied)
+            if sent == 0:
+                break
+            copied += sent
+        return True
+    except OSError as e:
+        if e.errno in unsupported_errors and copied == 0:
+            return False
+        raise
+
+
+def copy_file(src: str, dst: str, hardlink: bool = False) -> str:
+    """
+    Copy src to dst without spawning a process, returning the method used:
+    hardlink, reflink, copy_file_range or copy.
+
+    hardlink is opt-in: the two names then share one file, so rewriting the
+    original in place would change the copy as well. dst is written under a
+    temporary name and renamed into place, so it is never left half written.
+    """
+    # unique per process and thread, so concurrent copies to one dst never share a temporary file
+    tmp_path = f"{dst}.{os.getpid()}.{threading.get_ident()}.part"
+    if hardlink:
+        try:
+            os.link(src, tmp_path)
+            os.replace(tmp_path, dst)
+            return "hardlink"
+        except OSError as e:
+            if e.errno not in unsupported_errors and e.errno != errno.EMLINK:
+                raise
+
+    try:
+        with open(src, "rb") as fsrc, open(tmp_path, "wb") as fdst:
+            size = os.fstat(fsrc.fileno()).st_size
+            if reflink(fsrc.fileno(), fdst.fileno()):
+                method = "reflink"
+            elif copy_range(fsrc.fileno(), fdst.fileno(), size):
+                method = "copy_file_range"
+            else:
+                shutil.copyfileobj(fsrc, fdst, 1024 * 1024)
+                method = "copy"
+        os.replace(tmp_path, dst)
+        return method
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def copy_files(pairs: list[tuple[str, str]], max_workers: int = 8, hardlink: bool = False) -> dict[str, int]:
+    """
+    Copy every (src, dst) pair on a thread pool, since the copies spend their
+    time in system calls. Returns the count per method; the first failure is
+    raised once every copy has finished.
+    """
+    counts: dict[str, int] = {}
+    if not pairs:
+        return counts
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pairs)))) as executor:
+        futures = [executor.submit(copy_file, src, dst, hardlink) for src, dst in pairs]
+    for future in futures:
+        method = future.result()
+        counts[method] = counts.get(method, 0) + 1
+    return counts
+
+
+def clear_dir(path: str):
+    """Remove everything inside path, keeping path itself, like `rm -rf path/*`."""
+    if not os.path.isdir(path):
+        return
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
+            else:
+                os.remove(entry.path)
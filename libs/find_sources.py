@@ -4,6 +4,7 @@ import streamlit as st
 from collections import defaultdict
 
 from libs.blob import get_sas_url
+from libs.source_index import get_source_locator
 from typing import Dict, Set
 from libs.config import settings
 
@@ -36,38 +37,32 @@ def get_query_sources(project_name: str, context_data: any):
     if len(context_data['sources']) == 0:
         return sources
     
-    source_cache = {}
     screenshot_sas_url_cache = {}
-    
-    for source in context_data['sources']:
-        if source['text'] in source_cache:
-            continue
-        
-        for txt_file in os.listdir(txt_files_path):
-            try:
-                file_path = os.path.join(txt_files_path, txt_file)
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-                    if source['text'] in content:
-                        pdf_file, screenshot_file, page_number = parse_file_info(txt_file)
-                        if screenshot_file in screenshot_sas_url_cache:
-                            continue
-                        pdf_sas_url, pdf_sas_url_error = get_sas_url(project_name, pdf_file)
-                        screenshot_sas_url, screenshot_sas_url_error = get_sas_url(project_name, screenshot_file)
-                        sources.append({
-                            "pdf_file": pdf_file,
-                            "screenshot_file": screenshot_file,
-                            "page_number": page_number,
-                            "pdf_sas_url": pdf_sas_url,
-                            "pdf_sas_url_error": pdf_sas_url_error,
-                            "screenshot_sas_url": screenshot_sas_url,
-                            "screenshot_sas_url_error": screenshot_sas_url_error
-                        })
-                        screenshot_sas_url_cache[screenshot_file] = screenshot_sas_url
-            except Exception as e:
-                st.error(f"Error parsing file info: {e}")
-                
-        source_cache[source['text']] = True
+
+    texts = list(dict.fromkeys(source['text'] for source in context_data['sources']))
+    try:
+        located = get_source_locator(txt_files_path).locate(texts)
+    except Exception as e:
+        st.error(f"Error locating sources: {e}")
+        return sources
+
+    for text in texts:
+        for pdf_file, page_number in located.get(text, []):
+            screenshot_file = f"{pdf_file}_page_{page_number}.png"
+            if screenshot_file in screenshot_sas_url_cache:
+                continue
+            pdf_sas_url, pdf_sas_url_error = get_sas_url(project_name, pdf_file)
+            screenshot_sas_url, screenshot_sas_url_error = get_sas_url(project_name, screenshot_file)
+            sources.append({
+                "pdf_file": pdf_file,
+                "screenshot_file": screenshot_file,
+                "page_number": page_number,
+                "pdf_sas_url": pdf_sas_url,
+                "pdf_sas_url_error": pdf_sas_url_error,
+                "screenshot_sas_url": screenshot_sas_url,
+                "screenshot_sas_url_error": screenshot_sas_url_error
+            })
+            screenshot_sas_url_cache[screenshot_file] = screenshot_sas_url
                 
     return sources
 
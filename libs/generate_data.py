@@ -1,13 +1,11 @@
 import time
 import requests
 
-import pandas as pd
 import streamlit as st
 import os
 import re
 import zipfile
 from libs import config
-from libs.common import run_command
 from libs.config import (
     generate_data_vision,
     generate_data_vision_txt,
@@ -20,6 +18,11 @@ import libs.pdf_txt as pdf_txt
 from theodoretools.fs import get_directory_size
 
 from libs.save_settings import list_and_download_files
+from libs.config import settings
+from libs.downloader import DocDownloader
+from libs.file_copy import clear_dir
+from libs.ingest_manifest import IngestManifest, IngestSteps, generate_from_plan
+from libs.sheet_txt import column_values, sheet_columns, sheet_to_txt
 
 
 def create_zip(directory, output_path):
@@ -55,32 +58,24 @@ def generate_data(project_name: str):
         options=options,
     )
 
+    full_regenerate = st.checkbox(
+        "Regenerate all files, not only new and changed ones",
+        key=f"full_regenerate_{project_name}",
+    )
+
+    if st.button("Preview plan", key=f"generate_plan_btn_{project_name}", icon="📋"):
+        plan = IngestManifest(f"/app/projects/{project_name}").plan(pdf_vision_option, full=full_regenerate)
+        st.code("\n".join(plan.report()))
+
     if st.button("Start Generate", key=f"generate_btn_{project_name}", icon="🚀"):
         with st.container(
             border=True, key=f"generate_container_{project_name}", height=400
         ):
             with st.spinner(f"Processing ..."):
-
-                # 1. copy original files to input
-                for root, dirs, files in os.walk(
-                    f"/app/projects/{project_name}/original"
-                ):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        prepare_file(file_path, file, project_name)
-
-                # 2. convert files to txt
-                for root, dirs, files in os.walk(f"/app/projects/{project_name}/input"):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        convert_file(file_path, file, project_name, pdf_vision_option)
-
-                #  3. make file permissions to another user can write
-                for root, dirs, files in os.walk(f"/app/projects/{project_name}/input"):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        os.chmod(file_path, 0o666)
-
+                manifest = IngestManifest(f"/app/projects/{project_name}")
+                plan = manifest.plan(pdf_vision_option, full=full_regenerate)
+                st.code("\n".join(plan.report()))
+                generate_from_plan(project_name, pdf_vision_option, manifest, plan, ingest_steps)
                 st.success("Data generated successfully.")
 
     pdf_cache_size_mb = get_directory_size(f"/app/projects/{project_name}/pdf_cache")
@@ -90,7 +85,7 @@ def generate_data(project_name: str):
             key=f"delete_all_cached_files_{project_name}",
             icon="🗑️",
         ):
-            run_command(f"rm -rf /app/projects/{project_name}/pdf_cache/*")
+            clear_dir(f"/app/projects/{project_name}/pdf_cache")
             time.sleep(3)
             st.success("All files deleted.")
 
@@ -132,7 +127,7 @@ def generate_data(project_name: str):
             key=f"delete_all_input_files_{project_name}",
             icon="🗑️",
         ):
-            run_command(f"rm -rf /app/projects/{project_name}/input/*")
+            clear_dir(f"/app/projects/{project_name}/input")
             time.sleep(3)
             st.success("All files deleted.")
 
@@ -143,155 +138,99 @@ def convert_file(file_path, file, project_name, pdf_vision_option):
 
     if file.endswith(".xlsx") or file.endswith(".csv"):
         st.write(f"converting `{file}`")
-        excel_to_txt(file_path, project_name)
+        return excel_to_txt(file_path, project_name)
 
     if file.endswith(".pdf"):
         st.write(f"converting `{file}`")
         pdf_txt.save_pdf_pages_as_images(file_path, project_name, pdf_vision_option)
+    return True
 
 
-def excel_to_txt(file_path, project_name):
+def excel_to_txt(file_path, project_name) -> bool:
     file_name = os.path.basename(file_path)
-    # 根据文件扩展名选择适当的引擎
-    if file_path.endswith(".xlsx"):
-        excel_data = pd.ExcelFile(file_path, engine='openpyxl')
-        with open(
-            f"/app/projects/{project_name}/input/{file_name}.txt", "w", encoding="utf-8"
-        ) as f:
-            for sheet_name in excel_data.sheet_names:
-                f.write(f"{sheet_name}\n\n")
-                df = excel_data.parse(sheet_name)
-                for index, row in df.iterrows():
-                    for column in df.columns:
-                        if pd.notna(row[column]):
-                            f.write(f"【{column}】: {row[column]} ")
-                    f.write(f"\n\n")
-    elif file_path.endswith(".csv"):
-        # 对于CSV文件，直接读取为DataFrame
-        df = pd.read_csv(file_path, encoding='utf-8')
-        with open(
-            f"/app/projects/{project_name}/input/{file_name}.txt", "w", encoding="utf-8"
-        ) as f:
-            for column in df.columns:
-                f.write(f"{column}\n\n")
-            for index, row in df.iterrows():
-                for column in df.columns:
-                    if pd.notna(row[column]):
-                        f.write(f"【{column}】: {row[column]} ")
-                f.write(f"\n\n")
-    else:
-        # 如果是其他格式，尝试使用openpyxl
-        try:
-            excel_data = pd.ExcelFile(file_path, engine='openpyxl')
-            with open(
-                f"/app/projects/{project_name}/input/{file_name}.txt", "w", encoding="utf-8"
-            ) as f:
-                for sheet_name in excel_data.sheet_names:
-                    f.write(f"{sheet_name}\n\n")
-                    df = excel_data.parse(sheet_name)
-                    for index, row in df.iterrows():
-                        for column in df.columns:
-                            if pd.notna(row[column]):
-                                f.write(f"【{column}】: {row[column]} ")
-                        f.write(f"\n\n")
-        except Exception as e:
-            st.error(f"无法处理文件 {file_name}: {str(e)}")
-
-
-def prepare_file(file_path, file, project_name):
+    txt_path = f"/app/projects/{project_name}/input/{file_name}.txt"
+    try:
+        sheet_to_txt(file_path, txt_path)
+        return True
+    except Exception as e:
+        st.error(f"无法处理文件 {file_name}: {str(e)}")
+        # no half written text goes to the index
+        if os.path.exists(txt_path):
+            os.remove(txt_path)
+        return False
+
+
+def prepare_file(file_path, file, project_name, copies: list[tuple[str, str]]) -> list[str]:
+    """
+    The files an original file produces in input. Downloads happen here;
+    plain copies are appended to copies as (source, target) so the caller can
+    run them together.
+    """
+    input_dir = f"/app/projects/{project_name}/input"
     if file.endswith(".xlsx") or file.endswith(".csv"):
         if has_download_files(file_path):
-            download_files_from_xlsx_csv(file_path, file, project_name)
-        else:
-            run_command(f"cp -r '{file_path}' /app/projects/{project_name}/input/")
-            st.write(f"copied {file} to input")
-    if file.endswith(".txt"):
-        run_command(f"cp -r '{file_path}' /app/projects/{project_name}/input/")
-        st.write(f"copied {file} to input")
+            return download_files_from_xlsx_csv(file_path, file, project_name)
+        copies.append((file_path, f"{input_dir}/{file}"))
+        return [f"{input_dir}/{file}"]
 
-    if file.endswith(".md"):
-        run_command(
-            f"cp -r '{file_path}' /app/projects/{project_name}/input/{file}.txt"
-        )
-        st.write(f"converted {file} to {file}.txt")
+    if file.endswith(".txt") or file.endswith(".pdf"):
+        copies.append((file_path, f"{input_dir}/{file}"))
+        return [f"{input_dir}/{file}"]
 
-    if file.endswith(".pdf"):
-        run_command(f"cp -r '{file_path}' /app/projects/{project_name}/input/")
+    if file.endswith(".md"):
+        copies.append((file_path, f"{input_dir}/{file}.txt"))
+        return [f"{input_dir}/{file}.txt"]
 
     # if file.endswith('.zip'):
     #     deal_zip(file_path, project_name)
+    return []
 
 
 def has_download_files(file_path: str):
     if not file_path.endswith(".xlsx") and not file_path.endswith(".csv"):
         return False
 
-    # 根据文件扩展名选择适当的引擎
-    if file_path.endswith(".xlsx"):
-        df = pd.read_excel(file_path, engine='openpyxl')
-    elif file_path.endswith(".csv"):
-        # 对于CSV文件，应该使用pd.read_csv而不是pd.read_excel
-        df = pd.read_csv(file_path, encoding='utf-8')
-    else:
-        # 如果无法确定，尝试使用openpyxl
-        df = pd.read_excel(file_path, engine='openpyxl')
-    
-    # 检查是否有doc_url列
-    if 'doc_url' in df.columns:
-        return True
-    
-    # 检查每一行是否有doc_url键
-    for index, row in df.iterrows():
-        if "doc_url" in row:
-            return True
-    
-    return False
+    # only the header is read
+    return "doc_url" in sheet_columns(file_path)
 
 
-def download_files_from_xlsx_csv(file_path, file, project_name):
+def download_files_from_xlsx_csv(file_path, file, project_name) -> list[str]:
     if not file_path.endswith(".xlsx") and not file_path.endswith(".csv"):
-        return
-
-    # 根据文件扩展名选择适当的引擎
-    if file_path.endswith(".xlsx"):
-        df = pd.read_excel(file_path, engine='openpyxl')
-    elif file_path.endswith(".csv"):
-        # 对于CSV文件，使用pd.read_csv
-        df = pd.read_csv(file_path, encoding='utf-8')
-    else:
-        # 如果无法确定，尝试使用openpyxl
-        df = pd.read_excel(file_path, engine='openpyxl')
-    
-    st.write(df)
-    df_count = len(df) - 1
-    with st.spinner(f"Processing ..."):
-        for index, row in df.iterrows():
-            if "doc_url" in row:
-                doc_url = row["doc_url"]
-                download_file(doc_url, index, df_count, project_name)
-
-
-def download_file(doc_url, index, df_count, project_name):
-    file_name = url_to_name(doc_url)
-    os.makedirs(f"/app/projects/{project_name}/input", exist_ok=True)
-    file_path = os.path.join(f"/app/projects/{project_name}/input", file_name)
+        return []
 
-    if os.path.exists(file_path):
-        st.write(f"[{index}/{df_count}] File already exists: {file_path}")
-        return
+    # only the doc_url column is read
+    doc_urls = [
+        doc_url
+        for index, doc_url in column_values(file_path, "doc_url")
+        if isinstance(doc_url, str) and doc_url.strip()
+    ]
+    st.write(f"{len(doc_urls)} doc_url rows in {file}")
+
+    downloader = DocDownloader(
+        target_dir=f"/app/projects/{project_name}/input",
+        manifest_path=f"/app/projects/{project_name}/download_manifest.json",
+        name_for_url=url_to_name,
+        max_workers=settings.download_max_workers,
+        per_host=settings.download_per_host,
+        timeout=settings.download_timeout,
+    )
 
-    st.write(f"[{index}/{df_count}] Downloading {doc_url}")
+    downloaded = []
 
-    try:
-        response = requests.get(doc_url, stream=True)
-        response.raise_for_status()
+    def report(done, total, result):
+        if result.status != "error":
+            downloaded.append(os.path.join(downloader.target_dir, result.file_name))
+        if result.status == "error":
+            st.write(f"[{done}/{total}] Downloaded Error: {result.url} {result.error}")
+        elif result.status == "downloaded":
+            st.write(f"[{done}/{total}] Downloaded: {result.file_name}")
+        else:
+            st.write(f"[{done}/{total}] File already exists: {result.file_name}")
 
-        with open(file_path, "wb") as file:
-            for chunk in response.iter_content(chunk_size=8192):
-                file.write(chunk)
-        st.write(f"[{index}/{df_count}] Downloaded: {file_path}")
-    except requests.RequestException as e:
-        st.write(f"[{index}/{df_count}] Downloaded Error: {e}")
+    with st.spinner(f"Processing ..."):
+        counts = downloader.download_all(doc_urls, report)
+    st.write(f"{file}: {counts}")
+    return downloaded
 
 
 def replace_image_tag(match):
@@ -346,3 +285,12 @@ def read_pdf(file_path):
             page = reader.pages[page_num]
             text += page.extract_text()
     return text
+
+
+ingest_steps = IngestSteps(
+    prepare_file=prepare_file,
+    convert_file=convert_file,
+    convert_pdfs=pdf_txt.save_pdfs_pages_as_images,
+    info=st.write,
+    warning=st.warning,
+)
@@ -0,0 +1,238 @@
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Callable
+
+from libs.common import write_json_atomic
+from libs.config import settings
+from libs.file_copy import copy_files
+from libs.page_store import file_fingerprint
+from libs.source_index import build_source_index
+
+manifest_version = 1
+
+# page files the PDF conversion leaves in pdf_cache: {pdf}_page_{n}.png and {pdf}_page_{n}.png.{option}.txt
+page_file_pattern = re.compile(r"(.*?\.pdf)_page_\d+\.png(\..+\.txt)?$")
+
+
+@dataclass
+class IngestPlan:
+    """What generate_data will do, by path relative to original/."""
+
+    new: list[str] = field(default_factory=list)
+    changed: list[str] = field(default_factory=list)
+    unchanged: list[str] = field(default_factory=list)
+    deleted: list[str] = field(default_factory=list)
+    # size, mtime_ns and sha256 of every file still in original/
+    files: dict[str, dict] = field(default_factory=dict)
+    reasons: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def todo(self) -> list[str]:
+        return self.new + self.changed
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.new)} new, {len(self.changed)} changed, "
+            f"{len(self.deleted)} deleted, {len(self.unchanged)} unchanged"
+        )
+
+    def report(self, limit: int = 20) -> list[str]:
+        lines = [self.summary()]
+        for label, paths in (("new", self.new), ("changed", self.changed), ("deleted", self.deleted)):
+            for path in paths[:limit]:
+                reason = f" ({self.reasons[path]})" if path in self.reasons else ""
+                lines.append(f"  {label}: {path}{reason}")
+            if len(paths) > limit:
+                lines.append(f"  ... and {len(paths) - limit} more {label}")
+        return lines
+
+
+class IngestManifest:
+    """
+    What generate_data produced from each file in original/: its size, mtime,
+    content hash and conversion option, and every output it wrote, relative
+    to the project directory. A file is converted again only when its content
+    or option changed or one of its outputs is gone; the outputs of deleted
+    files are removed.
+    """
+
+    def __init__(self, project_dir: str):
+        self.project_dir = str(project_dir)
+        self.original_dir = os.path.join(self.project_dir, "original")
+        self.path = os.path.join(self.project_dir, "ingest_manifest.json")
+        self.files: dict[str, dict] = {}
+        self.exists = os.path.exists(self.path)
+        if self.exists:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == manifest_version:
+                self.files = data["files"]
+
+    def save(self):
+        write_json_atomic(self.path, {"version": manifest_version, "files": self.files}, indent=2)
+
+    def plan(self, pdf_vision_option: str, full: bool = False) -> IngestPlan:
+        """Compare original/ with the manifest; full converts every file again."""
+        plan = IngestPlan()
+        seen = set()
+
+        for root, dirs, files in os.walk(self.original_dir):
+            for file in sorted(files):
+                file_path = os.path.join(root, file)
+                rel_path = os.path.relpath(file_path, self.original_dir)
+                seen.add(rel_path)
+                stat = os.stat(file_path)
+                entry = self.files.get(rel_path)
+
+                if entry is None:
+                    plan.files[rel_path] = self.file_info(file_path, stat)
+                    plan.new.append(rel_path)
+                    continue
+
+                if entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                    info = {"size": entry["size"], "mtime_ns": entry["mtime_ns"], "sha256": entry["sha256"]}
+                else:
+                    # only hashed when the stat changed; a touched but identical file is not converted
+                    info = self.file_info(file_path, stat)
+                plan.files[rel_path] = info
+
+                if full:
+                    plan.reasons[rel_path] = "full regeneration"
+                elif info["sha256"] != entry["sha256"]:
+                    plan.reasons[rel_path] = "content"
+                elif entry.get("option") is not None and entry["option"] != pdf_vision_option:
+                    plan.reasons[rel_path] = "pdf vision option"
+                elif any(not os.path.exists(os.path.join(self.project_dir, output)) for output in entry["outputs"]):
+                    plan.reasons[rel_path] = "missing outputs"
+
+                if rel_path in plan.reasons:
+                    plan.changed.append(rel_path)
+                else:
+                    plan.unchanged.append(rel_path)
+
+        plan.deleted = sorted(rel_path for rel_path in self.files if rel_path not in seen)
+        return plan
+
+    @staticmethod
+    def file_info(file_path: str, stat: os.stat_result) -> dict:
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": file_fingerprint(file_path)}
+
+    def remove_outputs(self, rel_path: str) -> int:
+        entry = self.files.get(rel_path)
+        if entry is None:
+            return 0
+        removed = 0
+        for output in entry["outputs"]:
+            output_path = os.path.join(self.project_dir, output)
+            if os.path.isfile(output_path):
+                os.remove(output_path)
+                removed += 1
+        return removed
+
+    def forget(self, rel_path: str):
+        self.files.pop(rel_path, None)
+
+    def record(self, rel_path: str, info: dict, outputs: list[str], option: str | None):
+        """option is the PDF vision option when the outputs depend on it, otherwise None."""
+        self.files[rel_path] = {
+            **info,
+            "option": option,
+            "outputs": sorted({os.path.relpath(str(output), self.project_dir) for output in outputs}),
+        }
+
+
+def pdf_cache_page_files(pdf_cache_dir: str) -> dict[str, list[str]]:
+    """The page files in pdf_cache per PDF name, listed once for the whole project."""
+    page_files: dict[str, list[str]] = {}
+    if not os.path.exists(pdf_cache_dir):
+        return page_files
+    for file in os.listdir(pdf_cache_dir):
+        match = page_file_pattern.match(file)
+        if match:
+            page_files.setdefault(match.group(1), []).append(os.path.join(pdf_cache_dir, file))
+    return page_files
+
+
+@dataclass
+class IngestSteps:
+    """The parts of generate_data that differ between the web UI and the CLI."""
+
+    # (file_path, file, project_name, copies) -> files placed in input, plain copies queued on copies
+    prepare_file: Callable[[str, str, str, list], list[str]]
+    # (file_path, file, project_name, pdf_vision_option) -> False when the file could not be converted
+    convert_file: Callable[[str, str, str, str], bool]
+    # (pdf_paths, project_name, pdf_vision_option)
+    convert_pdfs: Callable[[list[str], str, str], None]
+    info: Callable[[str], None]
+    warning: Callable[[str], None]
+
+
+def generate_from_plan(project_name: str, pdf_vision_option: str, manifest: IngestManifest, plan: IngestPlan, steps: IngestSteps):
+    """Carry out a plan: convert new and changed files, drop the outputs of deleted ones and save the manifest."""
+    project_dir = manifest.project_dir
+
+    # 1. remove the outputs of deleted and changed files
+    for rel_path in plan.deleted + plan.changed:
+        manifest.remove_outputs(rel_path)
+    for rel_path in plan.deleted:
+        manifest.forget(rel_path)
+
+    # 2. copy new and changed original files to input
+    produced = {}
+    copies = []
+    for rel_path in plan.todo:
+        file_path = os.path.join(manifest.original_dir, rel_path)
+        produced[rel_path] = steps.prepare_file(file_path, os.path.basename(file_path), project_name, copies)
+    if copies:
+        methods = copy_files(copies, max_workers=settings.ingest_copy_workers, hardlink=settings.ingest_hardlink)
+        steps.info(f"copied {len(copies)} files to input ({', '.join(f'{k}: {v}' for k, v in methods.items())})")
+
+    # 3. convert what they produced to txt
+    outputs = {rel_path: list(paths) for rel_path, paths in produced.items()}
+    failed = set()
+    pdf_paths = []
+    for rel_path, paths in produced.items():
+        for file_path in paths:
+            file = os.path.basename(file_path)
+            if file.endswith(".pdf"):
+                # all PDFs of the project share one rate-limited page pipeline
+                pdf_paths.append(file_path)
+                outputs[rel_path].append(f"{file_path}.{pdf_vision_option.replace(' ', '')}.txt")
+                continue
+            if not steps.convert_file(file_path, file, project_name, pdf_vision_option):
+                failed.add(rel_path)
+            if file.endswith(".xlsx") or file.endswith(".csv"):
+                outputs[rel_path].append(f"{project_dir}/input/{file}.txt")
+    if failed:
+        steps.warning(f"{len(failed)} files could not be converted, they are tried again on the next run")
+    if pdf_paths:
+        steps.info(f"converting {len(pdf_paths)} pdf files")
+        steps.convert_pdfs(pdf_paths, project_name, pdf_vision_option)
+
+    #  4. make file permissions to another user can write
+    for paths in outputs.values():
+        for file_path in paths:
+            if os.path.exists(file_path):
+                os.chmod(file_path, 0o666)
+
+    # 5. record what every file produced, including its PDF page files
+    page_files = pdf_cache_page_files(f"{project_dir}/pdf_cache")
+    for rel_path, paths in outputs.items():
+        if rel_path in failed:
+            # left out of the manifest, so the next run converts it again
+            continue
+        pdf_names = [os.path.basename(file_path) for file_path in produced[rel_path] if file_path.endswith(".pdf")]
+        for pdf_name in pdf_names:
+            paths.extend(page_files.get(pdf_name, []))
+        manifest.record(
+            rel_path,
+            plan.files[rel_path],
+            [file_path for file_path in paths if os.path.exists(file_path)],
+            pdf_vision_option if pdf_names else None,
+        )
+    manifest.save()
+
+    # 6. index page texts for query sources
+    build_source_index(f"{project_dir}/pdf_cache")
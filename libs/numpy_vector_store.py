@@ -0,0 +1,404 @@
+"""An in-process vector store answering similarity queries from a NumPy matrix."""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from graphrag.utils.embeddings import create_collection_name
+from graphrag.model.types import TextEmbedder
+from graphrag.vector_stores.base import (
+    BaseVectorStore,
+    VectorStoreDocument,
+    VectorStoreSearchResult,
+)
+
+logger = logging.getLogger(__name__)
+
+format_version = 1
+
+# rows scored per matrix multiply, which bounds the temporary score and dequantized blocks
+block_rows = 65_536
+
+# output table and column holding the text of each embedding, for the snapshot source
+embedding_text_columns = {
+    "text_unit.text": ("create_final_text_units", "text"),
+    "entity.description": ("create_final_entities", "description"),
+    "entity.title": ("create_final_entities", "title"),
+    "relationship.description": ("create_final_relationships", "description"),
+    "document.text": ("create_final_documents", "text"),
+    "community.title": ("create_final_community_reports", "title"),
+    "community.summary": ("create_final_community_reports", "summary"),
+    "community.full_content": ("create_final_community_reports", "full_content"),
+}
+
+_build_locks: dict[str, threading.Lock] = {}
+_build_locks_lock = threading.Lock()
+
+
+def list_to_matrix(column: pa.ChunkedArray) -> np.ndarray:
+    """A list<float> column of equal-length rows as a float32 matrix, without going through Python lists."""
+    array = column.combine_chunks()
+    if len(array) == 0:
+        return np.zeros((0, 0), dtype=np.float32)
+    values = array.flatten().to_numpy(zero_copy_only=False).astype(np.float32, copy=False)
+    return values.reshape(len(array), -1)
+
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+def quantize_int8(matrix: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantization; a row is approximately codes * scale."""
+    scale = np.abs(matrix).max(axis=1) / 127
+    scale[scale == 0] = 1
+    codes = np.rint(matrix / scale[:, None]).astype(np.int8)
+    return codes, scale.astype(np.float32)
+
+
+def train_ivf(matrix: np.ndarray, nlist: int, iterations: int = 8, seed: int = 0) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Spherical k-means over normalized rows. Returns the centroids and the rows
+    grouped by list: order holds row numbers, list i being
+    order[offsets[i]:offsets[i + 1]].
+    """
+    rng = np.random.default_rng(seed)
+    n = len(matrix)
+    training = matrix[rng.choice(n, size=min(n, max(nlist * 64, 10_000)), replace=False)]
+    centroids = training[rng.choice(len(training), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        labels = np.argmax(training @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, training)
+        empty = np.bincount(labels, minlength=nlist) == 0
+        # an empty list takes a random training row, so every list stays in use
+        sums[empty] = training[rng.choice(len(training), size=int(empty.sum()))]
+        centroids = normalize(sums)
+
+    labels = np.empty(n, dtype=np.int32)
+    for start in range(0, n, block_rows):
+        labels[start:start + block_rows] = np.argmax(np.asarray(matrix[start:start + block_rows]) @ centroids.T, axis=1)
+    order = np.argsort(labels, kind="stable").astype(np.int64)
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=nlist))]).astype(np.int64)
+    return centroids, order, offsets
+
+
+def save_array(path: str, array: np.ndarray):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def write_vector_files(
+    directory: str,
+    collection_name: str,
+    ids: list[str],
+    texts: list[str | None],
+    attributes: list[str],
+    vectors: np.ndarray,
+    quantize: str | None = None,
+    ann_threshold: int = 100_000,
+    source: dict | None = None,
+):
+    """Write the matrix, documents and optional IVF lists of one collection, then its meta file last."""
+    os.makedirs(directory, exist_ok=True)
+    prefix = os.path.join(directory, collection_name)
+    matrix = normalize(np.asarray(vectors, dtype=np.float32)) if len(vectors) else np.zeros((0, 0), np.float32)
+
+    if quantize == "int8":
+        codes, scale = quantize_int8(matrix)
+        save_array(f"{prefix}.int8.npy", codes)
+        save_array(f"{prefix}.scale.npy", scale)
+    else:
+        save_array(f"{prefix}.f32.npy", matrix)
+
+    docs = pa.table({
+        "id": pa.array([str(i) for i in ids], pa.string()),
+        "text": pa.array(texts, pa.string()),
+        "attributes": pa.array(attributes, pa.string()),
+    })
+    pq.write_table(docs, f"{prefix}.docs.parquet.tmp")
+    os.replace(f"{prefix}.docs.parquet.tmp", f"{prefix}.docs.parquet")
+
+    ivf = len(matrix) > ann_threshold
+    if ivf:
+        centroids, order, offsets = train_ivf(matrix, nlist=int(np.sqrt(len(matrix))))
+        save_array(f"{prefix}.centroids.npy", centroids)
+        save_array(f"{prefix}.order.npy", order)
+        save_array(f"{prefix}.offsets.npy", offsets)
+
+    meta = {
+        "version": format_version,
+        "count": int(len(matrix)),
+        "dim": int(matrix.shape[1]) if len(matrix) else 0,
+        "quantize": quantize,
+        "ivf": ivf,
+        "source": source or {},
+    }
+    with open(f"{prefix}.json.tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(f"{prefix}.json.tmp", f"{prefix}.json")
+
+
+class NumpyVectorStore(BaseVectorStore):
+    """
+    Vectors held as one row-normalized float32 matrix, or int8 codes with a
+    scale per row, memory-mapped from files under db_uri. Queries are scored
+    with blocked matrix multiplies, several queries at a time; collections
+    larger than ann_threshold rows also carry IVF lists, and a query then
+    scores only the rows of its nprobe nearest lists.
+    """
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+
+    def connect(self, **kwargs: Any) -> Any:
+        self.db_uri = str(kwargs["db_uri"])
+        self.quantize = kwargs.get("quantize")
+        self.ann_threshold = int(kwargs.get("ann_threshold", 100_000))
+        self.nprobe = int(kwargs.get("nprobe", 8))
+        self.prefix = os.path.join(self.db_uri, self.collection_name)
+        self.meta: dict = {}
+        self.matrix = None
+        self.scale = None
+        self.centroids = None
+        if os.path.exists(f"{self.prefix}.json"):
+            self.open()
+
+    def open(self):
+        with open(f"{self.prefix}.json", "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("quantize") == "int8":
+            self.matrix = np.load(f"{self.prefix}.int8.npy", mmap_mode="r")
+            self.scale = np.load(f"{self.prefix}.scale.npy")
+        else:
+            self.matrix = np.load(f"{self.prefix}.f32.npy", mmap_mode="r")
+            self.scale = None
+        if self.meta.get("ivf"):
+            self.centroids = np.load(f"{self.prefix}.centroids.npy")
+            self.order = np.load(f"{self.prefix}.order.npy", mmap_mode="r")
+            self.offsets = np.load(f"{self.prefix}.offsets.npy")
+        else:
+            self.centroids = None
+        docs = pq.read_table(f"{self.prefix}.docs.parquet")
+        self.ids = docs.column("id").to_pylist()
+        self.texts = docs.column("text").to_pylist()
+        self.attributes = docs.column("attributes").to_pylist()
+        self.positions = {doc_id: i for i, doc_id in enumerate(self.ids)}
+        self.allowed = None
+
+    def load_documents(self, documents: list[VectorStoreDocument], overwrite: bool = True) -> None:
+        documents = [doc for doc in documents if doc.vector is not None]
+        ids = [str(doc.id) for doc in documents]
+        texts = [doc.text for doc in documents]
+        attributes = [json.dumps(doc.attributes) for doc in documents]
+        vectors = np.asarray([doc.vector for doc in documents], dtype=np.float32)
+        if not overwrite and self.matrix is not None and len(self.ids):
+            ids = self.ids + ids
+            texts = self.texts + texts
+            attributes = self.attributes + attributes
+            vectors = np.concatenate([self.rows(np.arange(len(self.ids))), vectors.reshape(len(documents), -1)])
+        write_vector_files(self.db_uri, self.collection_name, ids, texts, attributes, vectors, self.quantize, self.ann_threshold)
+        self.open()
+
+    def filter_by_id(self, include_ids: list[str] | list[int]) -> Any:
+        if len(include_ids) == 0:
+            self.query_filter = None
+            self.allowed = None
+        else:
+            self.query_filter = [str(i) for i in include_ids]
+            self.allowed = np.array(
+                sorted(self.positions[i] for i in self.query_filter if i in self.positions), dtype=np.int64
+            )
+        return self.query_filter
+
+    def rows(self, positions: np.ndarray) -> np.ndarray:
+        """Float32 rows at positions, dequantized when stored as int8."""
+        block = np.asarray(self.matrix[positions], dtype=np.float32)
+        if self.scale is not None:
+            block *= self.scale[positions][:, None]
+        return block
+
+    def candidates(self, queries: np.ndarray) -> list[np.ndarray] | None:
+        """Rows to score per query from its nprobe nearest IVF lists, or None to score every row."""
+        if self.centroids is None:
+            return None
+        nearest = np.argsort(-(queries @ self.centroids.T), axis=1)[:, : self.nprobe]
+        return [
+            np.sort(np.concatenate([self.order[self.offsets[i]:self.offsets[i + 1]] for i in lists]))
+            for lists in nearest
+        ]
+
+    def search_batch(self, queries: np.ndarray, k: int = 10) -> list[list[tuple[int, float]]]:
+        """The top k (row, cosine similarity) of every query, best first."""
+        if self.matrix is None or len(self.ids) == 0:
+            return [[] for _ in range(len(queries))]
+        queries = normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+
+        if self.allowed is not None:
+            # filtered ids are few, so they are all scored rather than looked up through the IVF lists
+            return self.score_rows(self.allowed, queries, k)
+        candidate_sets = self.candidates(queries)
+        if candidate_sets is not None:
+            return [self.score_rows(positions, query[None, :], k)[0] for positions, query in zip(candidate_sets, queries)]
+
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(self.ids), block_rows):
+            block = np.asarray(self.matrix[start:start + block_rows], dtype=np.float32)
+            scores = queries @ block.T
+            if self.scale is not None:
+                scores *= self.scale[start:start + block_rows]
+            best_scores, best_rows = merge_topk(
+                best_scores, best_rows, scores, np.arange(start, start + len(block)), k
+            )
+        return [list(zip(rows.tolist(), scores.tolist())) for rows, scores in zip(best_rows, best_scores)]
+
+    def score_rows(self, positions: np.ndarray, queries: np.ndarray, k: int) -> list[list[tuple[int, float]]]:
+        if len(positions) == 0:
+            return [[] for _ in range(len(queries))]
+        scores = queries @ self.rows(positions).T
+        _, best = merge_topk(
+            np.full((len(queries), 0), -np.inf, dtype=np.float32), np.zeros((len(queries), 0), dtype=np.int64),
+            scores, np.arange(len(positions)), k,
+        )
+        return [
+            [(int(positions[j]), float(scores[q, j])) for j in best[q]]
+            for q in range(len(queries))
+        ]
+
+    def result(self, row: int, score: float) -> VectorStoreSearchResult:
+        return VectorStoreSearchResult(document=self.document(row), score=score)
+
+    def document(self, row: int) -> VectorStoreDocument:
+        return VectorStoreDocument(
+            id=self.ids[row],
+            text=self.texts[row],
+            vector=self.rows(np.array([row]))[0].tolist(),
+            attributes=json.loads(self.attributes[row]) if self.attributes[row] else {},
+        )
+
+    def similarity_search_by_vector(
+        self, query_embedding: list[float], k: int = 10, **kwargs: Any
+    ) -> list[VectorStoreSearchResult]:
+        return [self.result(row, score) for row, score in self.search_batch(np.asarray([query_embedding]), k)[0]]
+
+    def similarity_search_by_text(
+        self, text: str, text_embedder: TextEmbedder, k: int = 10, **kwargs: Any
+    ) -> list[VectorStoreSearchResult]:
+        query_embedding = text_embedder(text)
+        if query_embedding:
+            return self.similarity_search_by_vector(query_embedding, k)
+        return []
+
+    def search_by_id(self, id: str) -> VectorStoreDocument:
+        row = self.positions.get(str(id))
+        if row is None:
+            return VectorStoreDocument(id=id, text=None, vector=None)
+        return self.document(row)
+
+
+def merge_topk(best_scores: np.ndarray, best_rows: np.ndarray, scores: np.ndarray, rows: np.ndarray, k: int):
+    """Merge a (queries, n) score block into the running top k per query, kept sorted best first."""
+    all_scores = np.concatenate([best_scores, scores], axis=1)
+    all_rows = np.concatenate([best_rows, np.broadcast_to(rows, scores.shape)], axis=1)
+    if all_scores.shape[1] > k:
+        keep = np.argpartition(-all_scores, k - 1, axis=1)[:, :k]
+        all_scores = np.take_along_axis(all_scores, keep, axis=1)
+        all_rows = np.take_along_axis(all_rows, keep, axis=1)
+    order = np.argsort(-all_scores, axis=1)
+    return np.take_along_axis(all_scores, order, axis=1), np.take_along_axis(all_rows, order, axis=1)
+
+
+def build_source(output_dir: Path, vector_store_args: dict, embedding_name: str, collection_name: str) -> dict | None:
+    """Where the vectors of a collection come from: the embeddings snapshot, else the LanceDB table."""
+    snapshot = output_dir / f"embeddings.{embedding_name}.parquet"
+    if snapshot.exists():
+        return {"type": "snapshot", "path": str(snapshot), "mtime_ns": snapshot.stat().st_mtime_ns}
+    if vector_store_args.get("type") == "lancedb" and vector_store_args.get("db_uri"):
+        table_dir = Path(vector_store_args["db_uri"]) / f"{collection_name}.lance"
+        if table_dir.exists():
+            return {"type": "lancedb", "path": str(table_dir), "mtime_ns": table_dir.stat().st_mtime_ns}
+    return None
+
+
+def read_source(source: dict, output_dir: Path, vector_store_args: dict, embedding_name: str, collection_name: str):
+    if source["type"] == "lancedb":
+        import lancedb
+
+        table = lancedb.connect(vector_store_args["db_uri"]).open_table(collection_name).to_arrow()
+        return (
+            table.column("id").to_pylist(),
+            table.column("text").to_pylist(),
+            table.column("attributes").to_pylist(),
+            list_to_matrix(table.column("vector")),
+        )
+
+    table = pq.read_table(source["path"], columns=["id", "embedding"])
+    ids = [str(i) for i in table.column("id").to_pylist()]
+    texts: list[str | None] = [None] * len(ids)
+    text_table, text_column = embedding_text_columns.get(embedding_name, (None, None))
+    if text_table and (output_dir / f"{text_table}.parquet").exists():
+        text_df = pq.read_table(output_dir / f"{text_table}.parquet", columns=["id", text_column]).to_pandas()
+        lookup = pd.Series(text_df[text_column].values, index=text_df["id"].astype(str))
+        texts = lookup.reindex(ids).where(lambda s: s.notna(), None).tolist()
+    return ids, texts, ["{}"] * len(ids), list_to_matrix(table.column("embedding"))
+
+
+def open_numpy_store(output_dir: Path, vector_store_args: dict, embedding_name: str) -> NumpyVectorStore:
+    """
+    The NumPy store of one embedding, writing its files under output/vectors
+    from the indexing output the first time, and again whenever the source
+    changed since.
+    """
+    collection_name = create_collection_name(vector_store_args.get("container_name", "default"), embedding_name)
+    directory = output_dir / "vectors"
+    kwargs = {
+        "db_uri": str(directory),
+        "quantize": vector_store_args.get("quantize"),
+        "ann_threshold": vector_store_args.get("ann_threshold", 100_000),
+        "nprobe": vector_store_args.get("nprobe", 8),
+    }
+
+    source = build_source(output_dir, vector_store_args, embedding_name, collection_name)
+    if source is None and not (directory / f"{collection_name}.json").exists():
+        msg = (
+            f"no vectors for {embedding_name}: set snapshots.embeddings to true in settings.yaml "
+            f"and index again, or use a lancedb vector_store"
+        )
+        raise ValueError(msg)
+
+    meta_path = directory / f"{collection_name}.json"
+    with _build_locks_lock:
+        lock = _build_locks.setdefault(str(meta_path), threading.Lock())
+    with lock:
+        meta = {}
+        if meta_path.exists():
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        stale = (
+            meta.get("version") != format_version
+            or meta.get("quantize") != kwargs["quantize"]
+            or (source is not None and meta.get("source") != source)
+        )
+        if stale and source is not None:
+            ids, texts, attributes, vectors = read_source(source, output_dir, vector_store_args, embedding_name, collection_name)
+            write_vector_files(
+                str(directory), collection_name, ids, texts, attributes, vectors,
+                kwargs["quantize"], int(kwargs["ann_threshold"]), source,
+            )
+            logger.info(f"wrote {len(ids)} {embedding_name} vectors to {directory}")
+
+    store = NumpyVectorStore(collection_name=collection_name)
+    store.connect(**kwargs)
+    return store
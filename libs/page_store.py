@@ -0,0 +1,75 @@
+import hashlib
+import json
+import os
+
+from libs.common import write_json_atomic
+
+manifest_version = 1
+
+
+def page_key(image_data: bytes, page_txt: str, prompt: str, model: str) -> str:
+    """
+    Content address of a page conversion: what the model sees and which model
+    sees it. The PDF name and page number are deliberately not part of it.
+    """
+    hash_object = hashlib.sha256()
+    for part in (image_data, page_txt.encode("utf-8"), prompt.encode("utf-8"), model.encode("utf-8")):
+        # length-prefixed, so two different splits of the same bytes never collide
+        hash_object.update(len(part).to_bytes(8, "little"))
+        hash_object.update(part)
+    return hash_object.hexdigest()
+
+
+def text_fingerprint(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def file_fingerprint(file_path: str, algorithm="sha256") -> str:
+    hash_object = hashlib.new(algorithm)
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hash_object.update(chunk)
+    return hash_object.hexdigest()
+
+
+class PageStore:
+    """
+    Content-addressed store of converted pages, sharded by the first two hex
+    characters of the key: {root}/ab/ab12....json. Entries are written once
+    and never change, so concurrent writers of the same key are harmless.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> dict | None:
+        try:
+            with open(self.path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, key: str, entry: dict):
+        write_json_atomic(self.path(key), entry)
+
+
+def read_manifest(manifest_path: str) -> dict | None:
+    """
+    The manifest of a converted PDF: its fingerprint, the model and prompt
+    template used, and the store key of every page.
+    """
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if manifest.get("version") != manifest_version:
+        return None
+    return manifest
+
+
+def write_manifest(manifest_path: str, manifest: dict):
+    write_json_atomic(manifest_path, {"version": manifest_version, **manifest})
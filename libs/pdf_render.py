@@ -0,0 +1,91 @@
+import multiprocessing
+import os
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import fitz
+
+render_dpi = 150
+
+# per worker process: document handles are opened once and reused for the following pages
+max_open_documents = 8
+_documents: dict[str, fitz.Document] = {}
+
+
+def open_document(pdf_path: str) -> fitz.Document:
+    doc = _documents.get(pdf_path)
+    if doc is None:
+        if len(_documents) >= max_open_documents:
+            _documents.pop(next(iter(_documents))).close()
+        doc = _documents[pdf_path] = fitz.open(pdf_path)
+    return doc
+
+
+def page_count(pdf_path: str) -> int:
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
+
+
+def page_layout(page: fitz.Page, page_txt: str) -> dict:
+    """What the native text of a page is worth: how much of it there is and what else is on the page."""
+    page_area = page.rect.get_area() or 1.0
+    image_area = sum((fitz.Rect(info["bbox"]) & page.rect).get_area() for info in page.get_image_info())
+    chars = [c for c in page_txt if not c.isspace()]
+    garbled = sum(1 for c in chars if c == "\ufffd" or unicodedata.category(c) in ("Cc", "Co"))
+    return {
+        "chars": len(chars),
+        "image_coverage": min(1.0, image_area / page_area),
+        # tables, charts and diagrams are drawn as vector paths
+        "vector_items": len(page.get_drawings()),
+        "garbled_ratio": garbled / len(chars) if chars else 0.0,
+    }
+
+
+def render_page(pdf_path: str, page_num: int, dpi: int = render_dpi) -> tuple[bytes, str, dict]:
+    """The page as PNG bytes, its native text and its layout, run inside a render_pool worker."""
+    page = open_document(pdf_path).load_page(page_num)
+    page_txt = page.get_text("text")
+    return page.get_pixmap(dpi=dpi).tobytes("png"), page_txt, page_layout(page, page_txt)
+
+
+@dataclass(frozen=True)
+class NativeTextGate:
+    """
+    Decides from page_layout whether the native text of a page can be used as
+    is: enough text, little of the page covered by images, few vector drawings
+    (tables and figures), and no broken font encoding.
+    """
+
+    min_chars: int = 200
+    max_image_coverage: float = 0.15
+    max_vector_items: int = 50
+    max_garbled_ratio: float = 0.02
+
+    @property
+    def model(self) -> str:
+        # part of the page key, so changing a threshold re-evaluates every page
+        return (
+            f"native-text/{self.min_chars}/{self.max_image_coverage}"
+            f"/{self.max_vector_items}/{self.max_garbled_ratio}"
+        )
+
+    def accepts(self, layout: dict) -> bool:
+        return (
+            layout["chars"] >= self.min_chars
+            and layout["image_coverage"] <= self.max_image_coverage
+            and layout["vector_items"] <= self.max_vector_items
+            and layout["garbled_ratio"] <= self.max_garbled_ratio
+        )
+
+
+def render_pool(max_workers: int = 0) -> ProcessPoolExecutor:
+    """
+    A process pool for page rendering, one worker per core by default. Workers
+    are spawned rather than forked, since the web and CLI processes already
+    run threads and an event loop.
+    """
+    return ProcessPoolExecutor(
+        max_workers=max_workers or os.cpu_count(),
+        mp_context=multiprocessing.get_context("spawn"),
+    )
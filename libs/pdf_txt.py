@@ -1,320 +1,386 @@
-import fitz
-from openai import AzureOpenAI
+import asyncio
+from openai import AsyncAzureOpenAI
 import os
 import base64
 import streamlit as st
 from libs.blob import upload_file
 from libs.save_settings import get_setting_file
 import libs.config as config
-import concurrent.futures
+from libs.config import settings
+from libs.page_store import PageStore, file_fingerprint, page_key, read_manifest, text_fingerprint, write_manifest
+from libs.pdf_render import NativeTextGate, page_count, render_page, render_pool
+from libs.rate_limit import VisionScheduler
+import threading
 from azure.core.credentials import AzureKeyCredential
 from azure.ai.formrecognizer import DocumentAnalysisClient
 from libs.common import load_project_env, load_graphrag_config
 import json
 
+# a 150 dpi page is scaled into 2x2 high detail tiles: 4 * 170 + 85 tokens
+page_image_tokens = 765
 
-def image_to_base64(image_path: str):
-    with open(image_path, "rb") as image_file:
-        base64_encoded = base64.b64encode(image_file.read()).decode("utf-8")
-    return base64_encoded
+
+def bytes_to_base64(data: bytes):
+    return base64.b64encode(data).decode("utf-8")
+
+
+def estimate_tokens(prompt: str, page_txt: str) -> int:
+    # a character per token is pessimistic for English and about right for Chinese;
+    # the scheduler settles the difference once the real usage is known
+    return len(prompt) + page_image_tokens + max(len(page_txt), 500)
+
+
+class PdfJob:
+    """A PDF conversion job: the config and clients shared by every page it converts."""
+
+    def __init__(self, project_name: str, pdf_vision_option: str):
+        self.project_name = project_name
+        self.pdf_vision_option = pdf_vision_option
+        self.graphrag_config = load_graphrag_config(project_name)
+        self.pdf_cache_dir = f"/app/projects/{project_name}/pdf_cache"
+        self.store = PageStore(f"{self.pdf_cache_dir}/pages")
+        self.prompt_template = self.load_prompt_template()
+        self.prompt_fingerprint = text_fingerprint(self.prompt_template)
+        if pdf_vision_option == config.generate_data_vision_di:
+            self.model = "document-intelligence/prebuilt-read"
+        else:
+            llm = self.graphrag_config.llm
+            self.model = f"{llm.model}/{llm.deployment_name}"
+        self.text_gate = None
+        if settings.pdf_native_text_gate:
+            self.text_gate = NativeTextGate(
+                min_chars=settings.pdf_native_text_min_chars,
+                max_image_coverage=settings.pdf_native_text_max_image_coverage,
+                max_vector_items=settings.pdf_native_text_max_vector_items,
+            )
+        self.pages = {"native": 0, "vision": 0, "cached": 0}
+        # the async client and scheduler belong to the event loop of a run, see run()
+        self.client = None
+        self.scheduler = None
+        self.render_pool = None
+        self._di_client = None
+        self._lock = threading.Lock()
+
+    def load_prompt_template(self) -> str:
+        if self.pdf_vision_option == config.generate_data_vision_di:
+            return ""
+        if self.pdf_vision_option == config.generate_data_vision_azure:
+            return config.pdf_gpt_vision_prompt_azure
+
+        prompts = {
+            config.generate_data_vision: ("pdf_gpt_vision_prompt.txt", config.pdf_gpt_vision_prompt),
+            config.generate_data_vision_txt: ("pdf_gpt_vision_prompt_by_text.txt", config.pdf_gpt_vision_prompt_by_text),
+            config.generate_data_vision_image: ("pdf_gpt_vision_prompt_by_image.txt", config.pdf_gpt_vision_prompt_by_image),
+        }
+        file_name, default_prompt = prompts[self.pdf_vision_option]
+        settings_file = f"/app/projects/{self.project_name}/prompts/{file_name}"
+        return get_setting_file(settings_file, default_prompt)
+
+    def vision_prompt(self, page_txt: str) -> str:
+        if not self.prompt_template:
+            return ""
+        return self.prompt_template.format(page_txt=page_txt)
+
+    @property
+    def text_gate_model(self) -> str:
+        return self.text_gate.model if self.text_gate is not None else ""
+
+    def manifest_path(self, pdf_path: str) -> str:
+        option_format = self.pdf_vision_option.replace(" ", "")
+        return f"{self.pdf_cache_dir}/manifests/{os.path.basename(pdf_path)}.{option_format}.json"
+
+    def di_client(self):
+        """The Document Intelligence client, or None when it is not configured."""
+        with self._lock:
+            if self._di_client is None:
+                load_project_env(self.project_name)
+                endpoint = os.getenv("DOCUMENT_INTELLIGENCE_URL", "")
+                key = os.getenv("DOCUMENT_INTELLIGENCE_KEY", "")
+                if endpoint and key:
+                    self._di_client = DocumentAnalysisClient(
+                        endpoint=endpoint, credential=AzureKeyCredential(key)
+                    )
+            return self._di_client
+
+    def run(self, pdf_paths: list[str]):
+        asyncio.run(self.convert(pdf_paths))
+
+    async def convert(self, pdf_paths: list[str]):
+        """Convert the pages of all PDFs through one scheduler bound to the deployment's limits."""
+        llm = self.graphrag_config.llm
+        max_concurrency = max(1, llm.concurrent_requests)
+        self.scheduler = VisionScheduler(
+            tokens_per_minute=llm.tokens_per_minute,
+            requests_per_minute=llm.requests_per_minute,
+            initial_concurrency=min(settings.pdf_vision_concurrency, max_concurrency),
+            max_concurrency=max_concurrency,
+            max_attempts=settings.pdf_vision_max_attempts,
+        )
+        # retries are left to the scheduler, which also adapts concurrency on 429
+        self.client = AsyncAzureOpenAI(
+            api_version=llm.api_version,
+            azure_endpoint=llm.api_base,
+            azure_deployment=llm.deployment_name,
+            api_key=llm.api_key,
+            max_retries=0,
+        )
+        # enough pages in flight to keep every slot busy without rendering the whole project ahead
+        pages = asyncio.Semaphore(max_concurrency * 2)
+        # rendering and text extraction are CPU bound, so they run in worker processes
+        self.render_pool = render_pool(settings.pdf_render_workers)
+        try:
+            await asyncio.gather(*(convert_pdf(self, pdf_path, pages) for pdf_path in pdf_paths))
+        finally:
+            await self.client.close()
+            self.render_pool.shutdown(cancel_futures=True)
+        st.write(f"pages: {self.pages}, vision calls: {self.scheduler.stats()}")
 
 
 class PageTask:
 
-    def __init__(self, doc, pdf_path, project_name, pdf_vision_option, page_num):
-        self.doc = doc
+    def __init__(self, job: PdfJob, pdf_path, page_num, page_count):
+        project_name = job.project_name
+        pdf_vision_option = job.pdf_vision_option
+        self.job = job
+        self.pdf_path = pdf_path
+        self.page_count = page_count
         self.pdf_name = os.path.basename(pdf_path)
         self.project_name = project_name
         self.pdf_vision_option = pdf_vision_option
         self.pdf_vision_option_format = pdf_vision_option.replace(" ", "")
-        self.base_name = f"/app/projects/{project_name}/pdf_cache"
+        self.base_name = job.pdf_cache_dir
         self.img_path = f"{self.base_name}/{self.pdf_name}_page_{page_num + 1}.png"
         self.txt_path = f"{self.base_name}/{self.pdf_name}_page_{page_num + 1}.png.txt"
-        self.cache_path = f"{self.base_name}/{self.pdf_name}_page_{page_num + 1}.cache.json"
         self.ai_txt_path = f"{self.base_name}/{self.pdf_name}_page_{page_num + 1}.png.{self.pdf_vision_option_format}.txt"
         self.page_num = page_num
-        self.graphrag_config = load_graphrag_config(project_name)
-        self.client = AzureOpenAI(
-            api_version=self.graphrag_config.llm.api_version,
-            azure_endpoint=self.graphrag_config.llm.api_base,
-            azure_deployment=self.graphrag_config.llm.deployment_name,
-            api_key=self.graphrag_config.llm.api_key,
-        )
-
-    def page_to_image(self):
-        page = self.doc.load_page(self.page_num)
-        pix = page.get_pixmap(dpi=150)
-        pix.save(self.img_path)
-        upload_file(self.project_name, self.img_path)
-
-    def page_to_txt(self):
-        page_txt = self.doc[self.page_num].get_text("text")
-        # with open(self.txt_path, "w") as txt_file:
-        #     txt_file.write(page_txt)
-        #     st.write(f"[{self.page_num}/{self.doc.page_count}] {self.txt_path}")
-        return page_txt
-
-    def get_ai_txt(self):
-        # use cache if exists
-        if os.path.exists(self.ai_txt_path):
-            with open(self.ai_txt_path, "r") as f:
-                return "", f.read()
-
-        self.page_to_image()
-
+        self.graphrag_config = job.graphrag_config
+        self.key = None
+        self.done = False
+
+    async def render(self) -> tuple[bytes, str, dict]:
+        """The page as PNG bytes, its native text and layout, rendered in the job's worker processes."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.job.render_pool, render_page, self.pdf_path, self.page_num)
+
+    def save_image(self, image_data: bytes):
+        # the PNG is still kept and uploaded, as the screenshot of query sources
+        with open(self.img_path, "wb") as f:
+            f.write(image_data)
+        upload_file(self.project_name, self.img_path, image_data)
+
+    async def get_ai_txt(self, manifest_key: str | None = None):
+        """
+        The page text from the content-addressed store, converting the page only
+        when nothing in the project has been converted from the same content.
+        Pages whose native text passes the job's text gate skip the vision model.
+        """
         prompt, ai_txt = "", ""
 
         try:
-            if self.pdf_vision_option == config.generate_data_vision:
-                prompt, ai_txt = self.gpt_vision_txt()
-
-            if self.pdf_vision_option == config.generate_data_vision_txt:
-                prompt, ai_txt = self.gpt_vision_txt_by_txt()
-
-            if self.pdf_vision_option == config.generate_data_vision_image:
-                prompt, ai_txt = self.gpt_vision_txt_by_image()
-
-            if self.pdf_vision_option == config.generate_data_vision_azure:
-                prompt, ai_txt = self.gpt_vision_txt_azure()
-
-            if self.pdf_vision_option == config.generate_data_vision_di:
-                ai_txt = di_analyze_read(self.img_path, self.project_name)
-
-            # set cache
+            # an unchanged PDF already knows its keys, so the page is not even rendered
+            entry = self.job.store.get(manifest_key) if manifest_key else None
+            if entry is not None and os.path.exists(self.img_path):
+                self.key = manifest_key
+                self.job.pages["cached"] += 1
+            else:
+                image_data, page_txt, layout = await self.render()
+                await asyncio.to_thread(self.save_image, image_data)
+                native = self.job.text_gate is not None and self.job.text_gate.accepts(layout)
+                if native:
+                    model = self.job.text_gate.model
+                else:
+                    model, prompt = self.job.model, self.job.vision_prompt(page_txt)
+                self.key = page_key(image_data, page_txt, prompt, model)
+                entry = self.job.store.get(self.key)
+
+                if entry is not None:
+                    self.job.pages["cached"] += 1
+                elif native:
+                    entry = {"text": page_txt.strip(), "model": model, "completion": None, "layout": layout}
+                    self.job.store.put(self.key, entry)
+                    self.job.pages["native"] += 1
+                else:
+                    completion = None
+                    if self.pdf_vision_option == config.generate_data_vision_di:
+                        ai_txt = await self.job.scheduler.call(
+                            lambda: asyncio.to_thread(
+                                di_analyze_read, self.img_path, self.project_name, self.job.di_client(), image_data
+                            )
+                        )
+                    else:
+                        ai_txt, completion = await self.gpt_vision(image_data, prompt, page_txt)
+                    entry = {"text": ai_txt, "model": model, "completion": completion, "layout": layout}
+                    self.job.store.put(self.key, entry)
+                    self.job.pages["vision"] += 1
+                    st.write(f"[{self.page_num}/{self.page_count}] {self.ai_txt_path}")
+
+            ai_txt = entry["text"]
+            # the page named copy is what the source index and query sources read
             with open(self.ai_txt_path, "w") as txt_file:
                 txt_file.write(ai_txt)
-                st.write(f"[{self.page_num}/{self.doc.page_count}] {self.ai_txt_path}")
+            self.done = True
         except Exception as e:
             st.warning(
-                f"[{self.page_num}/{self.doc.page_count}] `{self.pdf_name}` generated an exception: {e}"
+                f"[{self.page_num}/{self.page_count}] `{self.pdf_name}` generated an exception: {e}"
             )
 
         return prompt, ai_txt
 
-    def gpt_vision_txt_azure(self):
-        base64_string = image_to_base64(self.img_path)
-
-        prompt = config.pdf_gpt_vision_prompt_azure.format(page_txt=self.page_to_txt())
-
-        completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{base64_string}",
-                            },
-                        },
-                    ],
-                }
-            ],
-            model=self.graphrag_config.llm.model,
-        )
-        ai_txt = completion.choices[0].message.content
-        self.write_cache(completion.to_json())
-        return prompt, ai_txt
-
-    def gpt_vision_txt(self):
-        base64_string = image_to_base64(self.img_path)
-        settings_file = (
-            f"/app/projects/{self.project_name}/prompts/pdf_gpt_vision_prompt.txt"
-        )
-        prompt = get_setting_file(settings_file, config.pdf_gpt_vision_prompt).format(
-            page_txt=self.page_to_txt()
-        )
-
-        completion = self.client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{base64_string}",
-                            },
-                        },
-                    ],
-                }
-            ],
-            model=self.graphrag_config.llm.model,
-        )
-        ai_txt = completion.choices[0].message.content
-        self.write_cache(completion.to_json())
-        return prompt, ai_txt
-
-    def write_cache(self, data):
-        with open(self.cache_path, "w") as file:
-            json.dump(data, file, ensure_ascii=False, indent=4)
-
-
-    def gpt_vision_txt_by_txt(self):
-        base64_string = image_to_base64(self.img_path)
-        settings_file = f"/app/projects/{self.project_name}/prompts/pdf_gpt_vision_prompt_by_text.txt"
-        prompt = get_setting_file(
-            settings_file, config.pdf_gpt_vision_prompt_by_text
-        ).format(page_txt=self.page_to_txt())
-
-        completion = self.client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{base64_string}",
+    async def gpt_vision(self, image_data: bytes, prompt: str, page_txt: str):
+        base64_string = bytes_to_base64(image_data)
+
+        completion = await self.job.scheduler.call(
+            lambda: self.job.client.chat.completions.create(
+                messages=[
+                    {
+                        "role": "user",
+                        "content": [
+                            {"type": "text", "text": prompt},
+                            {
+                                "type": "image_url",
+                                "image_url": {
+                                    "url": f"data:image/png;base64,{base64_string}",
+                                },
                             },
-                        },
-                    ],
-                }
-            ],
-            model=self.graphrag_config.llm.model,
+                        ],
+                    }
+                ],
+                model=self.graphrag_config.llm.model,
+            ),
+            estimated_tokens=estimate_tokens(prompt, page_txt),
         )
-        ai_txt = completion.choices[0].message.content
-        self.write_cache(completion.to_json())
-        return prompt, ai_txt
-
-    def gpt_vision_txt_by_image(self):
-        base64_string = image_to_base64(self.img_path)
-
-        settings_file = f"/app/projects/{self.project_name}/prompts/pdf_gpt_vision_prompt_by_image.txt"
-        prompt = get_setting_file(
-            settings_file, config.pdf_gpt_vision_prompt_by_image
-        ).format(page_txt=self.page_to_txt())
-
-        completion = self.client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{base64_string}",
-                            },
-                        },
-                    ],
-                }
-            ],
-            model=self.graphrag_config.llm.model,
-        )
-        ai_txt = completion.choices[0].message.content
-        self.write_cache(completion.to_json())
-        return prompt, ai_txt
+        ai_txt = completion.choices[0].message.content or ""
+        return ai_txt, json.loads(completion.to_json())
 
 
-def save_pdf_pages_as_images(pdf_path: str, project_name: str, pdf_vision_option: str):
+async def convert_pdf(job: PdfJob, pdf_path: str, pages: asyncio.Semaphore):
     pdf_file_name = os.path.basename(pdf_path)
-    pdf_ai_txt_path = f"{pdf_path}.{pdf_vision_option.replace(" ", "")}.txt"
-    base_dir = f"/app/projects/{project_name}/pdf_cache"
-    os.makedirs(base_dir, exist_ok=True)
+    pdf_ai_txt_path = f"{pdf_path}.{job.pdf_vision_option.replace(' ', '')}.txt"
+
+    loop = asyncio.get_running_loop()
+    count = await loop.run_in_executor(job.render_pool, page_count, pdf_path)
+    pdf_fingerprint = await asyncio.to_thread(file_fingerprint, pdf_path)
+
+    manifest_path = job.manifest_path(pdf_path)
+    manifest = read_manifest(manifest_path)
+    manifest_keys = [None] * count
+    if (
+        manifest is not None
+        and manifest["pdf_fingerprint"] == pdf_fingerprint
+        and manifest["model"] == job.model
+        and manifest["prompt_fingerprint"] == job.prompt_fingerprint
+        and manifest.get("text_gate") == job.text_gate_model
+        and len(manifest["pages"]) == count
+    ):
+        manifest_keys = manifest["pages"]
+    else:
+        await asyncio.to_thread(upload_file, job.project_name, pdf_path)
+
+    tasks = [PageTask(job, pdf_path, page_num, count) for page_num in range(count)]
+
+    async def run(task: PageTask):
+        async with pages:
+            result = await task.get_ai_txt(manifest_keys[task.page_num])
+        st.write(f"[{task.page_num}/{count}] `{pdf_file_name}` done")
+        return result
+
+    results = await asyncio.gather(*(run(task) for task in tasks))
+
+    # retry the failed pages once, then write full txt by order
+    for task in tasks:
+        if not task.done:
+            results[task.page_num] = await run(task)
+
+    write_manifest(manifest_path, {
+        "pdf": pdf_file_name,
+        "pdf_fingerprint": pdf_fingerprint,
+        "model": job.model,
+        "prompt_fingerprint": job.prompt_fingerprint,
+        "text_gate": job.text_gate_model,
+        "pages": [task.key if task.done else None for task in tasks],
+    })
 
-    doc = fitz.open(pdf_path)
-
-    upload_file(project_name, pdf_path)
-
-    def process_page(page_num):
-        pt = PageTask(doc, pdf_path, project_name, pdf_vision_option, page_num)
-        return pt.get_ai_txt()
-
-    # get txt by parallel
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        future_to_page = {
-            executor.submit(process_page, page_num): page_num
-            for page_num in range(doc.page_count)
-        }
-        for future in concurrent.futures.as_completed(future_to_page):
-            page_num = future_to_page[future]
-            try:
-                future.result()
-                st.write(f"[{page_num}/{doc.page_count}] `{pdf_file_name}` done")
-            except Exception as exc:
-                st.warning(
-                    f"[{page_num}/{doc.page_count}] `{pdf_file_name}` generated an exception: {exc}"
-                )
-
-    # write full txt by order
     with open(pdf_ai_txt_path, "w") as f:
         f.write("\n")
-
-    for page_num in range(doc.page_count):
-        pt = PageTask(doc, pdf_path, project_name, pdf_vision_option, page_num)
-        with open(pdf_ai_txt_path, "a") as f:
+        for prompt, ai_txt in results:
             f.write("\n\n")
-            prompt, ai_txt = pt.get_ai_txt()
             if ai_txt:
                 f.write(ai_txt)
 
 
+def save_pdfs_pages_as_images(pdf_paths: list[str], project_name: str, pdf_vision_option: str, job: PdfJob | None = None):
+    job = job or PdfJob(project_name, pdf_vision_option)
+    os.makedirs(job.pdf_cache_dir, exist_ok=True)
+    job.run(pdf_paths)
+
+
+def save_pdf_pages_as_images(pdf_path: str, project_name: str, pdf_vision_option: str, job: PdfJob | None = None):
+    save_pdfs_pages_as_images([pdf_path], project_name, pdf_vision_option, job)
+
+
 def format_bounding_box(bounding_box):
     if not bounding_box:
         return "N/A"
     return ", ".join(["[{}, {}]".format(p.x, p.y) for p in bounding_box])
 
 
-def di_analyze_read(img_path: str, project_name: str):
-    load_project_env(project_name)
-    endpoint = os.getenv("DOCUMENT_INTELLIGENCE_URL", "")
-    key = os.getenv("DOCUMENT_INTELLIGENCE_KEY", "")
-
-    if not endpoint or not key:
-        st.error(
-            "Your need to set DOCUMENT_INTELLIGENCE_URL and DOCUMENT_INTELLIGENCE_KEY in .env file."
-        )
-        return ""
+def di_analyze_read(img_path: str, project_name: str, document_analysis_client=None, image_data: bytes | None = None):
+    if document_analysis_client is None:
+        load_project_env(project_name)
+        endpoint = os.getenv("DOCUMENT_INTELLIGENCE_URL", "")
+        key = os.getenv("DOCUMENT_INTELLIGENCE_KEY", "")
 
-    # open the file
-    with open(img_path, "rb") as file:
-        file_data = file.read()
-
-        # print(file_data)
+        if not endpoint or not key:
+            st.error(
+                "Your need to set DOCUMENT_INTELLIGENCE_URL and DOCUMENT_INTELLIGENCE_KEY in .env file."
+            )
+            return ""
 
         document_analysis_client = DocumentAnalysisClient(
             endpoint=endpoint, credential=AzureKeyCredential(key)
         )
 
-        poller = document_analysis_client.begin_analyze_document(
-            "prebuilt-read", document=file_data
+    # open the file, unless the rendered image is passed in
+    file_data = image_data
+    if file_data is None:
+        with open(img_path, "rb") as file:
+            file_data = file.read()
+
+    poller = document_analysis_client.begin_analyze_document(
+        "prebuilt-read", document=file_data
+    )
+    result = poller.result()
+
+    for idx, style in enumerate(result.styles):
+        print(
+            "Document contains {} content".format(
+                "handwritten" if style.is_handwritten else "no handwritten"
+            )
         )
-        result = poller.result()
 
-        for idx, style in enumerate(result.styles):
-            print(
-                "Document contains {} content".format(
-                    "handwritten" if style.is_handwritten else "no handwritten"
-                )
+    for page in result.pages:
+        print("----Analyzing Read from page #{}----".format(page.page_number))
+        print(
+            "Page has width: {} and height: {}, measured with unit: {}".format(
+                page.width, page.height, page.unit
             )
+        )
 
-        for page in result.pages:
-            print("----Analyzing Read from page #{}----".format(page.page_number))
+        for line_idx, line in enumerate(page.lines):
             print(
-                "Page has width: {} and height: {}, measured with unit: {}".format(
-                    page.width, page.height, page.unit
+                "...Line # {} has text content '{}' within bounding box '{}'".format(
+                    line_idx,
+                    line.content,
+                    format_bounding_box(line.polygon),
                 )
             )
 
-            for line_idx, line in enumerate(page.lines):
-                print(
-                    "...Line # {} has text content '{}' within bounding box '{}'".format(
-                        line_idx,
-                        line.content,
-                        format_bounding_box(line.polygon),
-                    )
-                )
-
-            for word in page.words:
-                print(
-                    "...Word '{}' has a confidence of {}".format(
-                        word.content, word.confidence
-                    )
+        for word in page.words:
+            print(
+                "...Word '{}' has a confidence of {}".format(
+                    word.content, word.confidence
                 )
+            )
 
-        print("====================================")
-        return result.content
+    print("====================================")
+    return result.content
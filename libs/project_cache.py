@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+def project_fingerprint(root: Path) -> tuple:
+    """
+    Cheap change detector for a project's index.
+
+    Returns the (name, mtime, inode, size) of settings.yaml, .env, the prompt
+    files and every parquet file in output/, so a rebuilt index, an edited
+    settings.yaml or prompt, or rotated credentials yield a new value without
+    reading any file content.
+    """
+    paths = [Path(root) / "settings.yaml", Path(root) / ".env"]
+    prompts_dir = Path(root) / "prompts"
+    if prompts_dir.exists():
+        paths.extend(sorted(prompts_dir.glob("*.txt")))
+    output_dir = Path(root) / "output"
+    if output_dir.exists():
+        paths.extend(sorted(output_dir.glob("*.parquet")))
+
+    entries = []
+    for path in paths:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((path.name, stat.st_mtime_ns, stat.st_ino, stat.st_size))
+    return tuple(entries)
+
+
+def dataframes_size(data: dict) -> int:
+    """Approximate resident size in bytes of a dict of DataFrames."""
+    total = 0
+    for df in data.values():
+        if df is None or not hasattr(df, "memory_usage"):
+            continue
+        total += int(df.memory_usage(deep=True).sum())
+    return total
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    project_name: str
+    fingerprint: tuple
+    size: int
+    build_seconds: float
+    hits: int = 0
+
+
+class ProjectCache:
+    """
+    Long-lived registry of objects built from a project's index (snapshots, engines).
+
+    Entries are evicted least-recently-used first once the summed size exceeds
+    max_bytes or there are more than max_entries of them, and are rebuilt when
+    the project's fingerprint changes. on_evict(project_name) is called for every
+    entry that leaves the cache.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_bytes: int,
+        max_entries: int | None = None,
+        on_evict: Callable[[str], None] | None = None,
+    ):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.on_evict = on_evict
+        self._entries: OrderedDict[Hashable, CacheEntry] = OrderedDict()
+        # build locks live as long as someone holds or waits on them, independent of the entries
+        self._locks: dict[Hashable, asyncio.Lock] = {}
+        self._lock_users: dict[Hashable, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.build_seconds_total = 0.0
+
+    @property
+    def total_size(self) -> int:
+        return sum(entry.size for entry in self._entries.values())
+
+    async def get_or_build(
+        self,
+        key: Hashable,
+        project_name: str,
+        root: Path,
+        builder: Callable[[], Awaitable[tuple[Any, int]]],
+    ):
+        """
+        Return the cached value for key, building it with builder() on a miss.
+
+        builder must return (value, size_in_bytes).
+        """
+        fingerprint = project_fingerprint(root)
+        value = self._lookup(key, fingerprint)
+        if value is not None:
+            return value
+
+        async with self._build_lock(key):
+            # another request may have built it while we were waiting
+            value = self._lookup(key, fingerprint)
+            if value is not None:
+                return value
+
+            self.misses += 1
+            started = time.perf_counter()
+            value, size = await builder()
+            elapsed = time.perf_counter() - started
+            self.build_seconds_total += elapsed
+            logger.info(f"built {self.name} {key} in {elapsed:.2f}s ({size} bytes)")
+
+            self._entries[key] = CacheEntry(
+                value=value,
+                project_name=project_name,
+                fingerprint=fingerprint,
+                size=size,
+                build_seconds=elapsed,
+            )
+            self._evict()
+            return value
+
+    @asynccontextmanager
+    async def _build_lock(self, key: Hashable):
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._lock_users[key] = self._lock_users.get(key, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._lock_users[key] -= 1
+            if not self._lock_users[key]:
+                del self._lock_users[key]
+                del self._locks[key]
+
+    def _lookup(self, key: Hashable, fingerprint: tuple):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.fingerprint != fingerprint:
+            self._remove(key)
+            self.invalidations += 1
+            return None
+        self._entries.move_to_end(key)
+        entry.hits += 1
+        self.hits += 1
+        return entry.value
+
+    def _over_budget(self) -> bool:
+        if self.max_entries is not None and len(self._entries) > self.max_entries:
+            return True
+        return self.total_size > self.max_bytes
+
+    def _evict(self):
+        # always keep the most recent entry, even if it alone exceeds the budget
+        while len(self._entries) > 1 and self._over_budget():
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+            logger.info(f"evicted {self.name} {key}")
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        if self.on_evict:
+            self.on_evict(entry.project_name)
+
+    def update_size(self, key: Hashable, size: int):
+        """Record a new size for an entry that grew after it was built."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        entry.size = size
+        self._evict()
+
+    def invalidate(self, project_name: str | None = None):
+        """Drop every entry, or only the entries of project_name."""
+        for key in list(self._entries.keys()):
+            if key not in self._entries:
+                continue
+            if project_name is None or self._entries[key].project_name == project_name:
+                self._remove(key)
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "build_seconds_total": round(self.build_seconds_total, 3),
+            "size_bytes": self.total_size,
+            "max_bytes": self.max_bytes,
+            "max_entries": self.max_entries,
+            "entries": [
+                {
+                    "key": list(key) if isinstance(key, tuple) else key,
+                    "size_bytes": entry.size,
+                    "build_seconds": round(entry.build_seconds, 3),
+                    "hits": entry.hits,
+                }
+                for key, entry in self._entries.items()
+            ],
+        }
@@ -0,0 +1,111 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Callable, Mapping
+
+from graphrag.config.models.graph_rag_config import GraphRagConfig
+
+logger = logging.getLogger(__name__)
+
+# the query prompts a config can point at, as section.field of GraphRagConfig
+search_prompts = (
+    "local_search.prompt",
+    "global_search.map_prompt",
+    "global_search.reduce_prompt",
+    "global_search.knowledge_prompt",
+    "drift_search.prompt",
+    "drift_search.reduce_prompt",
+    "basic_search.prompt",
+)
+
+
+def file_stat(path: Path) -> tuple | None:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+@dataclass(frozen=True)
+class ProjectConfig:
+    """
+    A loaded settings.yaml and the text of every query prompt it points at.
+    It is shared by every request, so treat config as read-only.
+    """
+    config: GraphRagConfig
+    prompts: Mapping[str, str | None]
+    files: tuple[tuple[str, tuple | None], ...]  # (path, stat) of every file it was read from
+    loaded_at: float
+
+    def prompt(self, name: str) -> str | None:
+        return self.prompts.get(name)
+
+    def changed(self) -> bool:
+        return any(file_stat(Path(path)) != stat for path, stat in self.files)
+
+
+def read_prompts(config: GraphRagConfig) -> tuple[dict[str, str | None], list[tuple[str, tuple | None]]]:
+    """
+    Prompt text by name, None where the config sets no prompt or the file is
+    missing, and the (path, stat) of every prompt file, taken before it was read.
+    """
+    prompts = {}
+    files = []
+    for name in search_prompts:
+        section, field = name.split(".")
+        prompt_config = getattr(getattr(config, section), field, None)
+        prompts[name] = None
+        if prompt_config:
+            prompt_file = Path(config.root_dir) / prompt_config
+            stat = file_stat(prompt_file)
+            files.append((str(prompt_file), stat))
+            if stat is not None:
+                prompts[name] = prompt_file.read_bytes().decode(encoding="utf-8")
+    return prompts, files
+
+
+class ProjectConfigCache:
+    """
+    Loaded configs by project root. A config is loaded once and handed out
+    until settings.yaml, .env or one of its prompt files changes, which a
+    lookup notices from their mtime and size alone.
+    """
+
+    def __init__(self):
+        self._entries: dict[tuple, ProjectConfig] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+
+    def get(self, root: Path, key: tuple, loader: Callable[[], GraphRagConfig]) -> ProjectConfig:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not entry.changed():
+                self.hits += 1
+                return entry
+
+            watched = [Path(root) / "settings.yaml", Path(root) / ".env"]
+            # stat before reading, so an edit made while loading is picked up by the next lookup
+            stats = [file_stat(path) for path in watched]
+            started = time.perf_counter()
+            config = loader()
+            prompts, prompt_files = read_prompts(config)
+            files = list(zip(map(str, watched), stats)) + prompt_files
+            entry = ProjectConfig(config, MappingProxyType(prompts), tuple(files), time.time())
+            self._entries[key] = entry
+            self.loads += 1
+            logger.info(f"loaded config of {root} in {time.perf_counter() - started:.2f}s")
+            return entry
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "loads": self.loads, "entries": len(self._entries)}
+
+    def invalidate(self, root: Path | None = None):
+        with self._lock:
+            for key in list(self._entries):
+                if root is None or key[0] == str(root):
+                    del self._entries[key]
@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from dataclasses import dataclass
+from typing import Iterator
+
+from libs.common import write_json_atomic
+from libs.file_copy import clear_dir
+
+sample_version = 1
+sample_dir_name = "prompt_tuning_sample"
+
+
+@dataclass
+class SampleResult:
+    sample_dir: str
+    documents: int
+    chunks: int
+    input_bytes: int
+    seconds: float
+    cached: bool
+
+
+def iter_chunks(file_path: str, chunk_chars: int, encoding: str = "utf-8") -> Iterator[str]:
+    """Paragraph-aligned chunks of about chunk_chars characters, read line by line."""
+    parts = []
+    size = 0
+    with open(file_path, "r", encoding=encoding, errors="replace") as f:
+        for line in f:
+            parts.append(line)
+            size += len(line)
+            if size >= chunk_chars and (not line.strip() or size >= chunk_chars * 2):
+                chunk = "".join(parts).strip()
+                if chunk:
+                    yield chunk
+                parts, size = [], 0
+    chunk = "".join(parts).strip()
+    if chunk:
+        yield chunk
+
+
+def reservoir(items: Iterator[str], size: int, rng: random.Random) -> list[str]:
+    """A uniform sample of size items from a stream of unknown length, in stream order."""
+    kept: list[tuple[int, str]] = []
+    for i, item in enumerate(items):
+        if i < size:
+            kept.append((i, item))
+        else:
+            j = rng.randint(0, i)
+            if j < size:
+                kept[j] = (i, item)
+    return [item for _, item in sorted(kept)]
+
+
+def allocate(sizes: dict[str, int], budget: int) -> dict[str, int]:
+    """Chunks to sample per document, proportional to its size and at least one each."""
+    total = sum(sizes.values()) or 1
+    return {name: max(1, round(budget * size / total)) for name, size in sizes.items()}
+
+
+class PromptSample:
+    """
+    A stratified sample of a project's input for prompt tuning. Every input
+    file is streamed once and reservoir sampled down to its share of the
+    chunk budget, so memory stays bounded by the budget rather than the
+    corpus. The sample is written as one file per source document under
+    prompt_tuning_sample/ and reused while the input files, the budget and
+    the seed stay the same.
+    """
+
+    def __init__(
+        self,
+        project_dir: str,
+        input_dir: str,
+        file_pattern: str = r".*\.txt$",
+        encoding: str = "utf-8",
+        budget: int = 300,
+        chunk_chars: int = 1200,
+        seed: int = 0,
+    ):
+        self.project_dir = str(project_dir)
+        self.input_dir = str(input_dir)
+        self.file_pattern = re.compile(file_pattern)
+        self.encoding = encoding
+        self.budget = max(1, budget)
+        self.chunk_chars = max(1, chunk_chars)
+        self.seed = seed
+        self.sample_dir = os.path.join(self.project_dir, sample_dir_name)
+        self.manifest_path = os.path.join(self.sample_dir, "sample.json")
+
+    def input_files(self) -> dict[str, int]:
+        files = {}
+        for root, dirs, names in os.walk(self.input_dir):
+            for name in names:
+                file_path = os.path.join(root, name)
+                rel_path = os.path.relpath(file_path, self.input_dir)
+                if self.file_pattern.match(rel_path) or self.file_pattern.match(name):
+                    files[rel_path] = os.path.getsize(file_path)
+        return dict(sorted(files.items()))
+
+    def sample_key(self, files: dict[str, int]) -> str:
+        hash_object = hashlib.sha256()
+        hash_object.update(f"{sample_version}:{self.budget}:{self.chunk_chars}:{self.seed}\n".encode())
+        for rel_path, size in files.items():
+            mtime_ns = os.stat(os.path.join(self.input_dir, rel_path)).st_mtime_ns
+            hash_object.update(f"{rel_path}\0{size}\0{mtime_ns}\n".encode("utf-8"))
+        return hash_object.hexdigest()
+
+    def build(self, files: dict[str, int] | None = None) -> SampleResult:
+        started = time.perf_counter()
+        files = self.input_files() if files is None else files
+        input_bytes = sum(files.values())
+        key = self.sample_key(files)
+
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("key") == key:
+                return SampleResult(
+                    self.sample_dir, manifest["documents"], manifest["chunks"],
+                    input_bytes, time.perf_counter() - started, True,
+                )
+        except (OSError, json.JSONDecodeError, KeyError):
+            pass
+
+        rng = random.Random(self.seed)
+        if len(files) > self.budget:
+            # more documents than chunks to spend: one chunk from each of budget documents
+            picked = set(reservoir(iter(files), self.budget, rng))
+            files = {rel_path: size for rel_path, size in files.items() if rel_path in picked}
+        quotas = allocate(files, self.budget)
+
+        os.makedirs(self.sample_dir, exist_ok=True)
+        clear_dir(self.sample_dir)
+        chunks = 0
+        for i, rel_path in enumerate(files):
+            sampled = reservoir(
+                iter_chunks(os.path.join(self.input_dir, rel_path), self.chunk_chars, self.encoding),
+                quotas[rel_path],
+                rng,
+            )
+            if not sampled:
+                continue
+            with open(os.path.join(self.sample_dir, f"{i:06d}.txt"), "w", encoding="utf-8") as f:
+                f.write("\n\n".join(sampled))
+            chunks += len(sampled)
+
+        write_json_atomic(self.manifest_path, {
+            "key": key,
+            "documents": len(files),
+            "chunks": chunks,
+            "budget": self.budget,
+            "chunk_chars": self.chunk_chars,
+            "seed": self.seed,
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+        return SampleResult(self.sample_dir, len(files), chunks, input_bytes, time.perf_counter() - started, False)
+
+
+def sample_input_for_tuning(
+    config, project_dir: str, budget: int, chunk_chars: int, seed: int, min_bytes: int = 0
+) -> SampleResult | None:
+    """
+    Sample the text input of a loaded graphrag config and point config.input
+    at the sample. Inputs smaller than min_bytes, and csv or json inputs, are
+    left as they are and None is returned.
+    """
+    input_config = config.input
+    if input_config.file_type != "text":
+        return None
+    sample = PromptSample(
+        project_dir,
+        os.path.join(str(project_dir), input_config.base_dir or ""),
+        file_pattern=input_config.file_pattern,
+        encoding=input_config.encoding or "utf-8",
+        budget=budget,
+        chunk_chars=chunk_chars,
+        seed=seed,
+    )
+    files = sample.input_files()
+    if sum(files.values()) < min_bytes:
+        return None
+    result = sample.build(files)
+    input_config.base_dir = sample_dir_name
+    input_config.file_pattern = r".*\.txt$"
+    input_config.encoding = "utf-8"
+    return result
@@ -1,22 +1,45 @@
 
 
 import asyncio
+import time
 from pathlib import Path
 import streamlit as st
 import graphrag.api as api
 from graphrag.config.load_config import load_config
+from libs.config import settings
+from libs.prompt_sample import sample_input_for_tuning
 
 
 async def start(base_path:str):
 
+    config = load_config(root_dir=Path(base_path))
+
+    # large inputs are tuned on a stratified sample instead of being loaded whole
+    if settings.prompt_tuning_sample_chunks > 0:
+        sample = sample_input_for_tuning(
+            config,
+            base_path,
+            budget=settings.prompt_tuning_sample_chunks,
+            chunk_chars=settings.prompt_tuning_sample_chunk_chars,
+            seed=settings.prompt_tuning_sample_seed,
+            min_bytes=settings.prompt_tuning_sample_min_mb * 1024 * 1024,
+        )
+        if sample is not None:
+            st.write(
+                f"{'Reused' if sample.cached else 'Sampled'} {sample.chunks} chunks from {sample.documents} documents "
+                f"of {sample.input_bytes / 1024 / 1024:.1f} MB input in {sample.seconds:.1f}s"
+            )
+
+    started = time.perf_counter()
     (
         entity_extraction_prompt,
         entity_summarization_prompt,
         community_summarization_prompt,
     ) = await api.generate_indexing_prompts(
-            config=load_config(root_dir=Path(base_path)),
+            config=config,
             root=base_path,
         )
+    st.write(f"Generated prompts in {time.perf_counter() - started:.1f}s")
 
     tab1, tab2, tab3 = st.tabs([
         "🔍 entity_extraction_prompt",
@@ -0,0 +1,177 @@
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, TypeVar
+
+import openai
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously at rate_per_minute; a rate <= 0 means unlimited."""
+
+    def __init__(self, rate_per_minute: int):
+        self.capacity = float(rate_per_minute or 0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    async def acquire(self, amount: float):
+        if self.capacity <= 0:
+            return
+        amount = min(amount, self.capacity)
+        # waiters queue on the lock, so the bucket is served in arrival order
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) * 60 / self.capacity)
+
+    def refund(self, amount: float):
+        """Give back (or, when negative, charge) the difference between an estimate and actual usage."""
+        if self.capacity <= 0:
+            return
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency limit: grows by about one slot per window of successful
+    calls and halves on throttling, at most once per cooldown seconds.
+    """
+
+    def __init__(self, initial: int, maximum: int, minimum: int = 1, cooldown: float = 5.0):
+        self.limit = float(initial)
+        self.maximum = maximum
+        self.minimum = minimum
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    async def on_success(self):
+        async with self._condition:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    async def on_throttle(self):
+        now = time.monotonic()
+        if now - self.last_decrease < self.cooldown:
+            return
+        self.last_decrease = now
+        self.limit = max(self.minimum, self.limit / 2)
+
+
+def status_code(e: Exception) -> int | None:
+    # openai.APIStatusError and azure HttpResponseError both carry status_code
+    code = getattr(e, "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def retry_after(e: Exception) -> float | None:
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        return None
+    return None
+
+
+def is_transient(e: Exception) -> bool:
+    code = status_code(e)
+    if code is not None:
+        return code == 408 or code >= 500
+    return isinstance(e, (openai.APIConnectionError, asyncio.TimeoutError, ConnectionError))
+
+
+class VisionScheduler:
+    """
+    Runs model calls under the deployment's RPM and TPM limits with adaptive
+    concurrency, retrying throttled and transient failures with backoff.
+    """
+
+    def __init__(
+        self,
+        tokens_per_minute: int,
+        requests_per_minute: int,
+        initial_concurrency: int = 8,
+        max_concurrency: int = 32,
+        max_attempts: int = 6,
+        max_backoff: float = 60.0,
+    ):
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.requests = TokenBucket(requests_per_minute)
+        self.concurrency = AdaptiveConcurrency(initial_concurrency, max_concurrency)
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+        self.calls = 0
+        self.throttled = 0
+        self.retried = 0
+
+    def backoff(self, attempt: int) -> float:
+        return min(self.max_backoff, 2 ** attempt) * (0.5 + random.random() / 2)
+
+    async def call(self, request: Callable[[], Awaitable[T]], estimated_tokens: int = 0) -> T:
+        for attempt in range(self.max_attempts):
+            await self.requests.acquire(1)
+            await self.tokens.acquire(estimated_tokens)
+            await self.concurrency.acquire()
+            try:
+                self.calls += 1
+                result = await request()
+            except Exception as e:
+                # a failed or throttled call used none of the estimate
+                self.tokens.refund(estimated_tokens)
+                if attempt == self.max_attempts - 1:
+                    raise
+                if status_code(e) == 429:
+                    self.throttled += 1
+                    await self.concurrency.on_throttle()
+                    delay = retry_after(e) or self.backoff(attempt)
+                elif is_transient(e):
+                    delay = self.backoff(attempt)
+                else:
+                    raise
+                self.retried += 1
+            else:
+                await self.concurrency.on_success()
+                usage = getattr(result, "usage", None)
+                if usage is not None and estimated_tokens:
+                    self.tokens.refund(estimated_tokens - usage.total_tokens)
+                return result
+            finally:
+                await self.concurrency.release()
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "throttled": self.throttled,
+            "retried": self.retried,
+            "concurrency": round(self.concurrency.limit, 1),
+        }
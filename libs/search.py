@@ -1,10 +1,16 @@
 from graphrag.query.llm.base import BaseLLMCallback
 import streamlit as st
 from graphrag.query.structured_search.base import SearchResult
+from graphrag.query.structured_search.drift_search.search import DRIFTSearch
+import asyncio
+import copy
 import logging
+import threading
 from pathlib import Path
+from typing import Mapping
 
 import pandas as pd
+import pyarrow.parquet as pq
 from graphrag.api.query import _get_embedding_store, _load_search_prompt
 from graphrag.config.load_config import load_config
 from graphrag.config.models.graph_rag_config import GraphRagConfig
@@ -18,10 +24,15 @@ from graphrag.query.indexer_adapters import read_indexer_entities, read_indexer_
     read_indexer_text_units, read_indexer_relationships, read_indexer_covariates, read_indexer_report_embeddings
 from graphrag.storage.factory import StorageFactory
 from graphrag.utils.storage import load_table_from_storage, storage_has_table
+from libs import consts
 from libs.config import settings
+from libs.numpy_vector_store import open_numpy_store
+from libs.project_config import ProjectConfig, ProjectConfigCache
 
 logger = logging.getLogger(__name__)
 
+config_cache = ProjectConfigCache()
+
 
 def reformat_context_data(context_data: dict) -> dict:
     """
@@ -54,35 +65,123 @@ def reformat_context_data(context_data: dict) -> dict:
     return final_format
 
 
-async def load_context(root: Path, data_dir: Path | None = None):
-    print("root in search.py: ", root)
+# Columns the graphrag indexer adapters read from each output table, None meaning every column.
+# Reports skip findings/full_content_json/rank_explanation, nodes skip the layout coordinates.
+TABLE_COLUMNS: dict[str, list[str] | None] = {
+    "create_final_nodes": ["id", "human_readable_id", "title", "community", "level", "degree"],
+    "create_final_entities": None,
+    "create_final_community_reports": [
+        "id", "human_readable_id", "community", "parent", "level", "title", "summary",
+        "full_content", "rank", "full_content_embedding", "period", "size",
+    ],
+    "create_final_text_units": None,
+    "create_final_relationships": None,
+    "create_final_communities": None,
+    "create_final_covariates": None,
+}
+
+OPTIONAL_TABLES = ["create_final_covariates"]
+
+# Output tables each search mode needs.
+MODE_TABLES: dict[str, list[str]] = {
+    consts.INDEX_LOCAL: [
+        "create_final_nodes",
+        "create_final_entities",
+        "create_final_community_reports",
+        "create_final_text_units",
+        "create_final_relationships",
+        "create_final_covariates",
+    ],
+    consts.INDEX_GLOBAL: [
+        "create_final_nodes",
+        "create_final_entities",
+        "create_final_community_reports",
+        "create_final_communities",
+    ],
+    consts.INDEX_DRIFT: [
+        "create_final_nodes",
+        "create_final_entities",
+        "create_final_community_reports",
+        "create_final_text_units",
+        "create_final_relationships",
+    ],
+    consts.INDEX_BASIC: [
+        "create_final_text_units",
+    ],
+}
+
+
+def load_search_config(root: Path, data_dir: Path | None = None) -> GraphRagConfig:
+    logger.info(f"loading search config of {root}")
     config = load_config(root, None)
-    data_dir = None
     config.storage.base_dir = str(data_dir) if data_dir else config.storage.base_dir
     resolve_paths(config)
+    return config
+
+
+def load_project_config(root: Path, data_dir: Path | None = None) -> ProjectConfig:
+    """The search config and query prompts of a project, loaded again only when one of their files changed."""
+    return config_cache.get(
+        root, (str(root), str(data_dir) if data_dir else None), lambda: load_search_config(root, data_dir)
+    )
+
 
-    print(config)
+async def load_context(root: Path, data_dir: Path | None = None, tables: list[str] | None = None):
+    config = load_project_config(root, data_dir).config
+    tables = tables or [name for name in TABLE_COLUMNS]
     dataframe_dict = await resolve_output_files(
         config=config,
-        output_list=[
-            "create_final_nodes",
-            "create_final_community_reports",
-            "create_final_text_units",
-            "create_final_relationships",
-            "create_final_entities",
-            "create_final_communities",
-        ],
-        optional_list=[
-            "create_final_covariates",
-        ],
+        output_list=[name for name in tables if name not in OPTIONAL_TABLES],
+        optional_list=[name for name in tables if name in OPTIONAL_TABLES],
     )
     return config, dataframe_dict
 
 
+def local_storage_dir(config: GraphRagConfig) -> Path | None:
+    """The output directory when the index lives on local disk, otherwise None."""
+    if config.storage.type != "file":
+        return None
+    base_dir = Path(config.storage.base_dir)
+    if not base_dir.is_absolute():
+        base_dir = Path(config.root_dir) / base_dir
+    return base_dir
+
+
+def read_parquet_table(path: Path, columns: list[str] | None = None) -> pd.DataFrame:
+    """
+    Read a parquet file through a memory map, keeping only the requested columns
+    that exist in the file. The id column is kept Arrow-backed rather than as
+    Python objects.
+    """
+    if columns is not None:
+        available = set(pq.read_schema(path).names)
+        columns = [column for column in columns if column in available]
+    table = pq.read_table(path, columns=columns, memory_map=True)
+    df = table.to_pandas(split_blocks=True, self_destruct=True)
+    if "id" in df.columns:
+        # not categorical: the adapters group by id, which would expand unobserved categories
+        df["id"] = df["id"].astype(pd.StringDtype("pyarrow"))
+    return df
+
+
 async def resolve_output_files(config: GraphRagConfig, output_list: list[str], optional_list: list[str] | None = None,
                                ) -> dict[str, pd.DataFrame]:
     """Read indexing output files to a dataframe dict."""
     dataframe_dict = {}
+    base_dir = local_storage_dir(config) if settings.parquet_projection else None
+    if base_dir is not None:
+        # parquet decoding is blocking, keep it off the event loop
+        for name in output_list:
+            dataframe_dict[name] = await asyncio.to_thread(
+                read_parquet_table, base_dir / f"{name}.parquet", TABLE_COLUMNS.get(name)
+            )
+        for optional_file in optional_list or []:
+            path = base_dir / f"{optional_file}.parquet"
+            dataframe_dict[optional_file] = await asyncio.to_thread(
+                read_parquet_table, path, TABLE_COLUMNS.get(optional_file)
+            ) if path.exists() else None
+        return dataframe_dict
+
     pipeline_config = create_pipeline_config(config)
     storage_config = pipeline_config.storage.model_dump()  # type: ignore
     storage_obj = StorageFactory().create_storage(
@@ -105,34 +204,162 @@ async def resolve_output_files(config: GraphRagConfig, output_list: list[str], o
     return dataframe_dict
 
 
-async def load_local_search_engine(config: GraphRagConfig, data: dict[str, pd.DataFrame], system_prompt: str):
-    vector_store_args = config.embeddings.vector_store
-    logger.info(f"Vector Store Args: {vector_store_args}")  # type: ignore # noqa
+class KnowledgeSnapshot:
+    """
+    The indexer models of one project, shared read-only by every engine factory.
 
-    description_embedding_store = _get_embedding_store(
+    Output tables are loaded the first time a search mode needs them, and each
+    model list is materialised from them the first time a factory asks for it
+    (per community level where that matters) and reused by every later engine,
+    so serving several search modes for one project keeps a single copy of the
+    entities, reports, text units and relationships.
+
+    Tables are read and models built in worker threads, the model accessors
+    are safe to call from several threads at once.
+    """
+
+    def __init__(
+        self,
+        config: GraphRagConfig,
+        data: dict[str, pd.DataFrame] | None = None,
+        prompts: Mapping[str, str | None] | None = None,
+    ):
+        self.config = config
+        self.prompts = prompts if prompts is not None else {}
+        self.data = data if data is not None else {}
+        self._models: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+        self._load_lock = asyncio.Lock()
+
+    def prompt(self, name: str) -> str | None:
+        """A query prompt by section.field, from the cached project config or else read from disk."""
+        if name in self.prompts:
+            return self.prompts[name]
+        section, field = name.split(".")
+        return _load_search_prompt(self.config.root_dir, getattr(getattr(self.config, section), field))
+
+    async def load_tables(self, names: list[str]):
+        async with self._load_lock:
+            missing = [name for name in names if name not in self.data]
+            if not missing:
+                return
+            self.data.update(await resolve_output_files(
+                config=self.config,
+                output_list=[name for name in missing if name not in OPTIONAL_TABLES],
+                optional_list=[name for name in missing if name in OPTIONAL_TABLES],
+            ))
+
+    def _memo(self, key: tuple, factory):
+        with self._lock:
+            if key not in self._models:
+                self._models[key] = factory()
+            return self._models[key]
+
+    def entities(self, community_level: int):
+        return self._memo(
+            ("entities", community_level),
+            lambda: read_indexer_entities(
+                self.data["create_final_nodes"], self.data["create_final_entities"], community_level
+            ),
+        )
+
+    def reports(self, community_level: int, dynamic_community_selection: bool = False):
+        return self._memo(
+            ("reports", community_level, dynamic_community_selection),
+            lambda: read_indexer_reports(
+                self.data["create_final_community_reports"],
+                self.data["create_final_nodes"],
+                community_level=community_level,
+                dynamic_community_selection=dynamic_community_selection,
+            ),
+        )
+
+    def reports_with_embeddings(self, community_level: int, full_content_embedding_store):
+        """
+        Reports of community_level with their full content embeddings attached (used by drift).
+
+        The embeddings go on copies, the reports local and global search share stay untouched.
+        """
+        shared_reports = self.reports(community_level)
+
+        def attach_embeddings():
+            reports = [copy.copy(report) for report in shared_reports]
+            read_indexer_report_embeddings(reports, full_content_embedding_store)
+            return reports
+
+        return self._memo(("report_embeddings", community_level), attach_embeddings)
+
+    def communities(self):
+        return self._memo(
+            ("communities",),
+            lambda: read_indexer_communities(
+                self.data["create_final_communities"],
+                self.data["create_final_nodes"],
+                self.data["create_final_community_reports"],
+            ),
+        )
+
+    def text_units(self):
+        return self._memo(("text_units",), lambda: read_indexer_text_units(self.data["create_final_text_units"]))
+
+    def relationships(self):
+        return self._memo(
+            ("relationships",), lambda: read_indexer_relationships(self.data["create_final_relationships"])
+        )
+
+    def covariates(self):
+        final_covariates = self.data.get("create_final_covariates")
+        if final_covariates is None:
+            return []
+        return self._memo(("covariates",), lambda: read_indexer_covariates(final_covariates))
+
+
+def get_embedding_store(config: GraphRagConfig, embedding_name: str):
+    """
+    The vector store queries read an embedding from. With query_store: numpy
+    under embeddings.vector_store in settings.yaml, vectors are served from
+    the in-process NumPy store built from the index output; otherwise from
+    the store the index was written to.
+    """
+    vector_store_args = config.embeddings.vector_store
+    if vector_store_args.get("query_store") == "numpy":
+        output_dir = local_storage_dir(config)
+        if output_dir is not None:
+            return open_numpy_store(output_dir, vector_store_args, embedding_name)
+        logger.warning("query_store numpy needs file storage, using the index vector store")
+    return _get_embedding_store(
         config_args=vector_store_args,  # type: ignore
-        embedding_name=entity_description_embedding,
+        embedding_name=embedding_name,
     )
 
-    final_nodes = data["create_final_nodes"]
-    final_entities = data['create_final_entities']
-    community_level = settings.community_level
-    final_covariates = data['create_final_covariates'] if data.get('create_final_covariates') is not None else []
-    final_text_units: pd.DataFrame = data["create_final_text_units"]
-    final_relationships: pd.DataFrame = data["create_final_relationships"]
-    final_community_reports: pd.DataFrame = data["create_final_community_reports"]
 
-    entities_ = read_indexer_entities(final_nodes, final_entities, community_level)
-    covariates_ = read_indexer_covariates(final_covariates) if final_covariates else []
-    prompt = system_prompt if system_prompt else _load_search_prompt(config.root_dir, config.local_search.prompt)
+async def load_snapshot(root: Path, data_dir: Path | None = None) -> KnowledgeSnapshot:
+    project_config = load_project_config(root, data_dir)
+    return KnowledgeSnapshot(project_config.config, prompts=project_config.prompts)
+
+
+async def load_local_search_engine(snapshot: KnowledgeSnapshot, system_prompt: str,
+                                   community_level: int = settings.community_level):
+    await snapshot.load_tables(MODE_TABLES[consts.INDEX_LOCAL])
+    return await asyncio.to_thread(build_local_search_engine, snapshot, system_prompt, community_level)
+
+
+def build_local_search_engine(snapshot: KnowledgeSnapshot, system_prompt: str, community_level: int):
+    config = snapshot.config
+    vector_store_args = config.embeddings.vector_store
+    logger.info(f"Vector Store Args: {vector_store_args}")  # type: ignore # noqa
+
+    description_embedding_store = get_embedding_store(config, entity_description_embedding)
+
+    prompt = system_prompt if system_prompt else snapshot.prompt("local_search.prompt")
 
     search_engine = get_local_search_engine(
         config=config,
-        reports=read_indexer_reports(final_community_reports, final_nodes, community_level),
-        text_units=read_indexer_text_units(final_text_units),
-        entities=entities_,
-        relationships=read_indexer_relationships(final_relationships),
-        covariates={"claims": covariates_},
+        reports=snapshot.reports(community_level),
+        text_units=snapshot.text_units(),
+        entities=snapshot.entities(community_level),
+        relationships=snapshot.relationships(),
+        covariates={"claims": snapshot.covariates()},
         description_embedding_store=description_embedding_store,  # type: ignore
         response_type=settings.response_type,
         system_prompt=prompt,
@@ -140,36 +367,27 @@ async def load_local_search_engine(config: GraphRagConfig, data: dict[str, pd.Da
     return search_engine
 
 
-async def load_global_search_engine(config: GraphRagConfig, data: dict[str, pd.DataFrame]):
-    final_nodes = data["create_final_nodes"]
-    final_entities = data['create_final_entities']
-    community_level = settings.community_level
-    final_community_reports: pd.DataFrame = data["create_final_community_reports"]
-    final_communities: pd.DataFrame = data["create_final_communities"]
-
-    communities_ = read_indexer_communities(final_communities, final_nodes, final_community_reports)
-    reports = read_indexer_reports(
-        final_community_reports,
-        final_nodes,
-        community_level=community_level,
-        dynamic_community_selection=settings.dynamic_community_selection,
-    )
-    entities_ = read_indexer_entities(final_nodes, final_entities, community_level=community_level)
-    map_prompt = _load_search_prompt(config.root_dir, config.global_search.map_prompt)
-    reduce_prompt = _load_search_prompt(
-        config.root_dir, config.global_search.reduce_prompt
-    )
-    knowledge_prompt = _load_search_prompt(
-        config.root_dir, config.global_search.knowledge_prompt
+async def load_global_search_engine(snapshot: KnowledgeSnapshot, community_level: int = settings.community_level,
+                                    dynamic_community_selection: bool = settings.dynamic_community_selection):
+    await snapshot.load_tables(MODE_TABLES[consts.INDEX_GLOBAL])
+    return await asyncio.to_thread(
+        build_global_search_engine, snapshot, community_level, dynamic_community_selection
     )
 
+
+def build_global_search_engine(snapshot: KnowledgeSnapshot, community_level: int, dynamic_community_selection: bool):
+    config = snapshot.config
+    map_prompt = snapshot.prompt("global_search.map_prompt")
+    reduce_prompt = snapshot.prompt("global_search.reduce_prompt")
+    knowledge_prompt = snapshot.prompt("global_search.knowledge_prompt")
+
     search_engine = get_global_search_engine(
         config,
-        reports=reports,
-        entities=entities_,
-        communities=communities_,
+        reports=snapshot.reports(community_level, dynamic_community_selection),
+        entities=snapshot.entities(community_level),
+        communities=snapshot.communities(),
         response_type="Multiple Paragraphs",
-        dynamic_community_selection=settings.dynamic_community_selection,
+        dynamic_community_selection=dynamic_community_selection,
         map_system_prompt=map_prompt,
         reduce_system_prompt=reduce_prompt,
         general_knowledge_inclusion_prompt=knowledge_prompt,
@@ -177,60 +395,78 @@ async def load_global_search_engine(config: GraphRagConfig, data: dict[str, pd.D
     return search_engine
 
 
-async def load_drift_search_engine(config: GraphRagConfig, data: dict[str, pd.DataFrame]):
+class DriftSearchParts:
+    """
+    What a DRIFT search is built from: the llm, context builder, config and
+    token encoder, none of which change between questions. DRIFTSearch itself
+    keeps the query state of the question it answered and only primes when
+    that state is empty, so every question needs a new_search().
+    """
+
+    def __init__(self, search_engine: DRIFTSearch):
+        self.llm = search_engine.llm
+        self.context_builder = search_engine.context_builder
+        self.config = search_engine.config
+        self.token_encoder = search_engine.token_encoder
+
+    def new_search(self) -> DRIFTSearch:
+        return DRIFTSearch(
+            llm=self.llm,
+            context_builder=self.context_builder,
+            config=self.config,
+            token_encoder=self.token_encoder,
+        )
+
+
+async def load_drift_search_engine(snapshot: KnowledgeSnapshot, community_level: int = settings.community_level):
+    return (await load_drift_search_parts(snapshot, community_level)).new_search()
+
+
+async def load_drift_search_parts(snapshot: KnowledgeSnapshot, community_level: int = settings.community_level):
+    await snapshot.load_tables(MODE_TABLES[consts.INDEX_DRIFT])
+    return await asyncio.to_thread(build_drift_search_parts, snapshot, community_level)
+
+
+def build_drift_search_parts(snapshot: KnowledgeSnapshot, community_level: int):
+    config = snapshot.config
     vector_store_args = config.embeddings.vector_store
     logger.info(f"Vector Store Args: {vector_store_args}")  # type: ignore # noqa
 
-    description_embedding_store = _get_embedding_store(
-        config_args=vector_store_args,  # type: ignore
-        embedding_name=entity_description_embedding,
-    )
+    description_embedding_store = get_embedding_store(config, entity_description_embedding)
 
-    full_content_embedding_store = _get_embedding_store(
-        config_args=vector_store_args,  # type: ignore
-        embedding_name=community_full_content_embedding,
-    )
+    full_content_embedding_store = get_embedding_store(config, community_full_content_embedding)
 
-    final_nodes = data["create_final_nodes"]
-    final_entities = data['create_final_entities']
-    community_level = settings.community_level
-    final_text_units: pd.DataFrame = data["create_final_text_units"]
-    final_relationships: pd.DataFrame = data["create_final_relationships"]
-    final_community_reports: pd.DataFrame = data["create_final_community_reports"]
-
-    entities_ = read_indexer_entities(final_nodes, final_entities, community_level)
-    reports = read_indexer_reports(final_community_reports, final_nodes, community_level)
-    read_indexer_report_embeddings(reports, full_content_embedding_store)
-    prompt = _load_search_prompt(config.root_dir, config.drift_search.prompt)
+    prompt = snapshot.prompt("drift_search.prompt")
     search_engine = get_drift_search_engine(
         config=config,
-        reports=reports,
-        text_units=read_indexer_text_units(final_text_units),
-        entities=entities_,
-        relationships=read_indexer_relationships(final_relationships),
+        reports=snapshot.reports_with_embeddings(community_level, full_content_embedding_store),
+        text_units=snapshot.text_units(),
+        entities=snapshot.entities(community_level),
+        relationships=snapshot.relationships(),
         description_embedding_store=description_embedding_store,  # type: ignore
         local_system_prompt=prompt,
     )
 
-    return search_engine
+    return DriftSearchParts(search_engine)
+
 
+async def load_basic_search_engine(snapshot: KnowledgeSnapshot):
+    await snapshot.load_tables(MODE_TABLES[consts.INDEX_BASIC])
+    return await asyncio.to_thread(build_basic_search_engine, snapshot)
 
-async def load_basic_search_engine(config: GraphRagConfig, data: dict[str, pd.DataFrame]):
+
+def build_basic_search_engine(snapshot: KnowledgeSnapshot):
+    config = snapshot.config
     vector_store_args = config.embeddings.vector_store
     logger.info(f"Vector Store Args: {vector_store_args}")  # type: ignore # noqa
 
-    description_embedding_store = _get_embedding_store(
-        config_args=vector_store_args,  # type: ignore
-        embedding_name=text_unit_text_embedding,
-    )
-
-    final_text_units: pd.DataFrame = data["create_final_text_units"]
+    description_embedding_store = get_embedding_store(config, text_unit_text_embedding)
 
-    prompt = _load_search_prompt(config.root_dir, config.basic_search.prompt)
+    prompt = snapshot.prompt("basic_search.prompt")
 
     search_engine = get_basic_search_engine(
         config=config,
-        text_units=read_indexer_text_units(final_text_units),
+        text_units=snapshot.text_units(),
         text_unit_embeddings=description_embedding_store,
         system_prompt=prompt,
     )
@@ -0,0 +1,193 @@
+import json
+import logging
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator
+
+from libs.rate_limit import retry_after, status_code
+
+logger = logging.getLogger(__name__)
+
+# Azure AI Search takes at most 1000 documents and 16 MB per indexing request
+max_batch_docs = 1000
+max_batch_bytes = 16 * 1024 * 1024
+
+throttle_codes = {429, 503}
+
+
+def is_retryable(e: Exception) -> bool:
+    code = status_code(e)
+    if code is not None:
+        return code in throttle_codes or code == 408 or code >= 500
+    # azure.core raises ServiceRequestError when the request never reached the service
+    return isinstance(e, (ConnectionError, TimeoutError)) or type(e).__name__ == "ServiceRequestError"
+
+
+@dataclass
+class Batch:
+    number: int
+    documents: list[dict]
+    size: int  # JSON payload bytes
+
+
+@dataclass
+class BatchReport:
+    number: int
+    documents: int
+    size: int
+    seconds: float
+    attempts: int
+    failed: int = 0
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.documents / self.seconds if self.seconds else 0.0
+
+
+@dataclass
+class UploadStats:
+    batches: int = 0
+    documents: int = 0
+    failed: int = 0
+    size: int = 0
+    seconds: float = 0.0
+    errors: list[str] = field(default_factory=list)
+
+
+def iter_batches(documents: Iterable[dict], batch_bytes: int = 4 * 1024 * 1024, batch_docs: int = max_batch_docs) -> Iterator[Batch]:
+    """Group documents into batches of at most batch_bytes of JSON and batch_docs documents."""
+    batch_bytes = min(batch_bytes, max_batch_bytes)
+    batch_docs = min(batch_docs, max_batch_docs)
+    current: list[dict] = []
+    size = 0
+    number = 0
+    for document in documents:
+        document_size = len(json.dumps(document, ensure_ascii=False).encode("utf-8")) + 1
+        if current and (size + document_size > batch_bytes or len(current) >= batch_docs):
+            number += 1
+            yield Batch(number, current, size)
+            current, size = [], 0
+        current.append(document)
+        size += document_size
+    if current:
+        yield Batch(number + 1, current, size)
+
+
+class BulkUploader:
+    """
+    Uploads batches through any client with upload_documents(documents)
+    returning per-document results with key, succeeded and status_code, as
+    the Azure SearchClient does.
+
+    Up to max_workers batches are in flight and at most twice as many are
+    read ahead, so a document generator is consumed as uploads finish rather
+    than all at once. Throttled or transient requests are retried with
+    backoff, honouring Retry-After; documents the service throttled inside
+    an otherwise accepted batch are retried on their own, and a batch the
+    service finds too large is split in two.
+    """
+
+    def __init__(
+        self,
+        client,
+        max_workers: int = 4,
+        max_attempts: int = 6,
+        max_backoff: float = 60.0,
+        on_batch: Callable[[BatchReport], None] | None = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.client = client
+        self.max_workers = max(1, max_workers)
+        self.max_attempts = max(1, max_attempts)
+        self.max_backoff = max_backoff
+        self.on_batch = on_batch
+        self.sleep = sleep
+
+    def backoff(self, attempt: int, error: Exception | None = None) -> float:
+        delay = retry_after(error) if error is not None else None
+        if delay is None:
+            delay = min(self.max_backoff, 2 ** attempt) * (0.5 + random.random() / 2)
+        return delay
+
+    def send(self, documents: list[dict]) -> tuple[int, int, list[str]]:
+        """Upload documents until they are accepted or out of attempts; returns (attempts, failed, errors)."""
+        pending = documents
+        errors: list[str] = []
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                results = self.client.upload_documents(documents=pending)
+            except Exception as e:
+                code = status_code(e)
+                if code == 413 and len(pending) > 1:
+                    # the payload was too large after all: send each half on its own
+                    middle = len(pending) // 2
+                    first = self.send(pending[:middle])
+                    second = self.send(pending[middle:])
+                    return attempt + first[0] + second[0], first[1] + second[1], errors + first[2] + second[2]
+                if not is_retryable(e) or attempt == self.max_attempts:
+                    return attempt, len(errors) + len(pending), errors + [f"{type(e).__name__}: {e}"]
+                self.sleep(self.backoff(attempt, e))
+                continue
+
+            by_key = {document["id"]: document for document in pending}
+            throttled = []
+            for result in results or []:
+                if getattr(result, "succeeded", True):
+                    continue
+                if getattr(result, "status_code", None) in throttle_codes and result.key in by_key:
+                    throttled.append(by_key[result.key])
+                else:
+                    errors.append(f"{result.key}: {getattr(result, 'error_message', '')}")
+            if not throttled:
+                return attempt, len(errors), errors
+            if attempt == self.max_attempts:
+                errors.extend(f"{document['id']}: throttled" for document in throttled)
+                return attempt, len(errors), errors
+            pending = throttled
+            self.sleep(self.backoff(attempt))
+        return self.max_attempts, len(pending), errors
+
+    def upload_batch(self, batch: Batch) -> tuple[BatchReport, list[str]]:
+        started = time.perf_counter()
+        attempts, failed, errors = self.send(batch.documents)
+        report = BatchReport(batch.number, len(batch.documents), batch.size, time.perf_counter() - started, attempts, failed)
+        logger.info(
+            f"batch {report.number}: {report.documents} docs, {report.size / 1024:.0f} KB "
+            f"in {report.seconds:.2f}s ({report.docs_per_second:.0f} docs/s), "
+            f"{report.attempts} attempts, {report.failed} failed"
+        )
+        return report, errors
+
+    def upload(self, batches: Iterable[Batch]) -> UploadStats:
+        stats = UploadStats()
+        started = time.perf_counter()
+        in_flight: set[Future] = set()
+
+        def collect(done: set[Future]):
+            for future in done:
+                report, errors = future.result()
+                stats.batches += 1
+                stats.documents += report.documents
+                stats.failed += report.failed
+                stats.size += report.size
+                stats.errors.extend(errors)
+                if self.on_batch is not None:
+                    self.on_batch(report)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for batch in batches:
+                if len(in_flight) >= self.max_workers * 2:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+                in_flight.add(executor.submit(self.upload_batch, batch))
+            if in_flight:
+                collect(wait(in_flight)[0])
+
+        stats.seconds = time.perf_counter() - started
+        logger.info(
+            f"uploaded {stats.documents - stats.failed} of {stats.documents} docs in {stats.batches} batches, "
+            f"{stats.size / 1024 / 1024:.1f} MB in {stats.seconds:.1f}s"
+        )
+        return stats
@@ -0,0 +1,214 @@
+import pickle
+import tempfile
+from itertools import chain
+from typing import Callable, Iterator
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from pandas.core.dtypes.cast import find_common_type
+
+chunk_rows = 50_000
+write_buffer_size = 1024 * 1024
+
+# html.escape, applied after braces were turned into &#123; / &#125;, in a single pass
+escape_table = str.maketrans({
+    "&": "&amp;",
+    "<": "&lt;",
+    ">": "&gt;",
+    '"': "&quot;",
+    "'": "&#x27;",
+    "{": "&amp;#123;",
+    "}": "&amp;#125;",
+})
+
+
+def escape_text(text) -> str:
+    if isinstance(text, (int, float)):
+        return str(text)
+    return str(text).translate(escape_table)
+
+
+def column_labels(header: list) -> list[str]:
+    """Column names as pandas would make them: Unnamed: i for blanks, a.1 for repeats."""
+    labels = []
+    seen = {}
+    for i, value in enumerate(header):
+        label = f"Unnamed: {i}" if value is None or value == "" else str(value)
+        if label in seen:
+            seen[label] += 1
+            label = f"{label}.{seen[label]}"
+        else:
+            seen[label] = 0
+        labels.append(label)
+    return labels
+
+
+def format_rows(df: pd.DataFrame, labels: list[str], escape: bool = False) -> np.ndarray:
+    """`【column】: value ` for every non-empty cell, concatenated per row one column at a time."""
+    rows = np.full(len(df), "", dtype=object)
+    for i, label in enumerate(labels):
+        values = df.iloc[:, i]
+        mask = values.notna().to_numpy()
+        if not mask.any():
+            continue
+        text = values[mask].astype(str)
+        if escape:
+            text = text.str.translate(escape_table)
+        prefix = f"【{escape_text(label) if escape else label}】: "
+        rows[mask] += prefix + text.to_numpy(dtype=object) + " "
+    return rows
+
+
+def iter_xlsx_sheets(file_path: str) -> Iterator[tuple[str, list[str], Iterator[pd.DataFrame]]]:
+    """
+    (sheet name, column labels, typed row chunks) per sheet, read with
+    openpyxl in read-only mode. Each sheet's chunks must be used up before
+    the next sheet is read.
+    """
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for worksheet in workbook.worksheets:
+            rows = worksheet.iter_rows(values_only=True)
+            header = list(next(rows, ()))
+            while header and header[-1] is None:
+                header.pop()
+            labels = column_labels(header)
+            yield worksheet.title, labels, typed_chunks(xlsx_chunks(rows, labels))
+    finally:
+        workbook.close()
+
+
+def xlsx_chunks(rows: Iterator[tuple], labels: list[str]) -> Iterator[pd.DataFrame]:
+    chunk = []
+    empty_rows = 0
+    for row in rows:
+        row = list(row)
+        while row and row[-1] is None:
+            row.pop()
+        if not row:
+            # blank rows only count when data follows them, like pandas drops trailing ones
+            empty_rows += 1
+            continue
+        chunk.extend([[]] * empty_rows)
+        empty_rows = 0
+        if len(row) > len(labels):
+            labels.extend(column_labels([None] * len(row))[len(labels):])
+        chunk.append(row)
+        if len(chunk) >= chunk_rows:
+            yield pd.DataFrame([r + [None] * (len(labels) - len(r)) for r in chunk], dtype=object)
+            chunk = []
+    if chunk:
+        yield pd.DataFrame([r + [None] * (len(labels) - len(r)) for r in chunk], dtype=object)
+
+
+def row_typed(df: pd.DataFrame) -> pd.DataFrame:
+    # iterrows hands out each row cast to the dtype all columns share, so 7 next to a float is 7.0
+    return pd.DataFrame(df.to_numpy(), columns=df.columns)
+
+
+def typed_chunks(chunks: Iterator[pd.DataFrame], reread: Callable[[], Iterator[pd.DataFrame]] | None = None) -> Iterator[pd.DataFrame]:
+    """
+    Row chunks with values typed as the old converter wrote them: columns as
+    pandas infers them for the whole sheet, so an integer column with blank
+    cells is float, and rows as iterrows gave them. A sheet of more than one
+    chunk is read to the end first to find its dtypes, then read again with
+    reread or, without it, from a temporary spill file.
+    """
+    head = [df.infer_objects() for _, df in zip(range(2), chunks)]
+    if len(head) < 2:
+        yield from map(row_typed, head)
+        return
+
+    dtypes = {}
+    partial = set()
+    with tempfile.TemporaryFile() as spill:
+        count = 0
+        for df in chain(head, (df.infer_objects() for df in chunks)):
+            partial.update(column for column in dtypes if column not in df.columns)
+            if count:
+                partial.update(column for column in df.columns if column not in dtypes)
+            for column, dtype in df.dtypes.items():
+                dtypes[column] = find_common_type([dtypes[column], dtype]) if column in dtypes else dtype
+            if reread is None:
+                pickle.dump(df, spill, protocol=pickle.HIGHEST_PROTOCOL)
+            count += 1
+        del head
+        # an xlsx row longer than the header adds columns, blank in the chunks before it
+        for column in partial:
+            dtypes[column] = find_common_type([dtypes[column], np.dtype(float)])
+        if reread is None:
+            spill.seek(0)
+            again = (pickle.load(spill) for _ in range(count))
+        else:
+            again = (df.infer_objects() for df in reread())
+        for df in again:
+            yield row_typed(df.reindex(columns=list(dtypes)).astype(dtypes))
+
+
+def csv_chunks(file_path: str) -> Iterator[pd.DataFrame]:
+    def read():
+        return pd.read_csv(file_path, encoding="utf-8", chunksize=chunk_rows)
+
+    return typed_chunks(iter(read()), read)
+
+
+def sheet_to_txt(file_path: str, txt_path: str, escape: bool = False):
+    """
+    Convert an xlsx or csv file to `【column】: value` text, one blank line
+    separated paragraph per row. xlsx files start every sheet with its name,
+    csv files with their column names.
+    """
+    with open(txt_path, "w", encoding="utf-8", buffering=write_buffer_size) as f:
+        if file_path.endswith(".csv"):
+            labels = None
+            for df in csv_chunks(file_path):
+                if labels is None:
+                    labels = [str(column) for column in df.columns]
+                    f.write("".join(f"{escape_text(label) if escape else label}\n\n" for label in labels))
+                f.write("".join(row + "\n\n" for row in format_rows(df, labels, escape)))
+            if labels is None:
+                # no data rows, only the header
+                f.write("".join(f"{escape_text(label) if escape else label}\n\n" for label in sheet_columns(file_path)))
+            return
+
+        for sheet_name, labels, chunks in iter_xlsx_sheets(file_path):
+            f.write(f"{escape_text(sheet_name) if escape else sheet_name}\n\n")
+            for df in chunks:
+                f.write("".join(row + "\n\n" for row in format_rows(df, labels, escape)))
+
+
+def sheet_columns(file_path: str) -> list[str]:
+    """Column names of a csv file or of the first sheet of an xlsx file, reading only the header."""
+    if file_path.endswith(".csv"):
+        return [str(column) for column in pd.read_csv(file_path, encoding="utf-8", nrows=0).columns]
+
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        header = next(workbook.worksheets[0].iter_rows(max_row=1, values_only=True), ())
+        return column_labels(list(header))
+    finally:
+        workbook.close()
+
+
+def column_values(file_path: str, column: str) -> Iterator[tuple[int, object]]:
+    """(row index, value) of one column of a csv file or of the first sheet of an xlsx file."""
+    if file_path.endswith(".csv"):
+        offset = 0
+        for df in pd.read_csv(file_path, encoding="utf-8", usecols=[column], chunksize=chunk_rows):
+            for index, value in enumerate(df[column].tolist(), start=offset):
+                yield index, value
+            offset += len(df)
+        return
+
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        labels = column_labels(list(next(rows, ())))
+        if column not in labels:
+            return
+        position = labels.index(column)
+        for index, row in enumerate(rows):
+            yield index, row[position] if position < len(row) else None
+    finally:
+        workbook.close()
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Awaitable, Callable, Hashable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Broadcast:
+    """
+    Runs one async iterator and lets any number of subscribers read it. Each
+    subscriber gets every item from the first, so one that joins late
+    catches up on what was already produced. The source is cancelled once
+    every subscriber has left before it finished.
+    """
+
+    def __init__(self, source: AsyncIterator):
+        self.items: list = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+        self.task = asyncio.create_task(self._run(source))
+
+    async def _run(self, source: AsyncIterator):
+        try:
+            async for item in source:
+                self.items.append(item)
+                self._notify()
+        except asyncio.CancelledError:
+            self.error = ConnectionAbortedError("every subscriber left")
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def subscribe(self) -> AsyncIterator:
+        position = 0
+        try:
+            while True:
+                while position < len(self.items):
+                    yield self.items[position]
+                    position += 1
+                if self.done:
+                    break
+                await self._changed.wait()
+            if self.error is not None:
+                raise self.error
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done:
+                self.task.cancel()
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent identical work. The first caller of a key starts
+    it, callers arriving while it runs share its result or, for streams, its
+    items; the key is forgotten as soon as the work ends, so later callers
+    start afresh.
+
+    Awaited work runs as its own task, so a caller that goes away does not
+    cancel it for the callers still waiting.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: dict[Hashable, asyncio.Task] = {}
+        self._streams: dict[Hashable, Broadcast] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """The result of fn() for key, and whether it was shared with an earlier caller."""
+        task = self._calls.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(self._calls, key, done))
+            self.leaders += 1
+        else:
+            self.followers += 1
+            logger.info(f"{self.name}: joined in-flight {key}")
+        return await asyncio.shield(task), shared
+
+    def stream(self, key: Hashable, source: Callable[[], AsyncIterator[T]]) -> tuple[AsyncIterator[T], bool]:
+        """A subscription to the items of source() for key, and whether it was shared with an earlier caller."""
+        broadcast = self._streams.get(key)
+        shared = broadcast is not None
+        if broadcast is None:
+            broadcast = Broadcast(source())
+            self._streams[key] = broadcast
+            broadcast.task.add_done_callback(lambda done: self._forget(self._streams, key, broadcast))
+            self.leaders += 1
+        else:
+            self.followers += 1
+            logger.info(f"{self.name}: joined in-flight stream {key}")
+        broadcast.subscribers += 1
+        return broadcast.subscribe(), shared
+
+    @staticmethod
+    def _forget(flights: dict, key: Hashable, flight):
+        if flights.get(key) is flight:
+            del flights[key]
+        task = flight.task if isinstance(flight, Broadcast) else flight
+        # every waiter may have gone; read the exception so it is not reported as never retrieved
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "in_flight": len(self._calls) + len(self._streams),
+        }
@@ -0,0 +1,191 @@
+import asyncio
+import time
+from json.encoder import encode_basestring
+from typing import AsyncIterator
+
+from openai.types.chat import ChatCompletionChunk
+from openai.types.chat.chat_completion_chunk import Choice, ChoiceDelta
+
+reference_open = "[Data: "
+
+# stand-ins rendered into the chunk template and cut out again; they must not occur elsewhere in it
+_content_marker = "sse-content-marker-7f3a"
+_index_marker = 918273645
+
+
+class ChunkWriter:
+    """
+    Renders the chat.completion.chunk SSE events of one answer. The chunk is
+    serialized once with marker content and index, and every event after
+    that is the template with the JSON-escaped token and the chunk number
+    spliced in, byte for byte what model_dump_json would produce.
+    """
+
+    def __init__(self, chat_id: str, model: str, created: int | None = None):
+        self.chat_id = chat_id
+        self.model = model
+        self.created = int(time.time()) if created is None else created
+        self.count = 0
+        template = self.chunk_model(_content_marker, _index_marker).model_dump_json()
+        content_text = encode_basestring(_content_marker)
+        index_text = str(_index_marker)
+        assert template.count(content_text) == 1 and template.count(index_text) == 1
+        content_at = template.index(content_text)
+        index_at = template.index(index_text)
+        self.content_first = content_at < index_at
+        first, second = sorted([(content_at, len(content_text)), (index_at, len(index_text))])
+        self.head = "data: " + template[:first[0]]
+        self.middle = template[first[0] + first[1]:second[0]]
+        self.tail = template[second[0] + second[1]:] + "\n\n"
+
+    def chunk_model(self, content: str, index: int) -> ChatCompletionChunk:
+        return ChatCompletionChunk(
+            id=self.chat_id,
+            created=self.created,
+            model=self.model,
+            object="chat.completion.chunk",
+            choices=[Choice(index=index, finish_reason=None, delta=ChoiceDelta(role="assistant", content=content))],
+        )
+
+    def chunk(self, content: str) -> str:
+        index = self.count
+        self.count += 1
+        if self.content_first:
+            return f"{self.head}{encode_basestring(content)}{self.middle}{index}{self.tail}"
+        return f"{self.head}{index}{self.middle}{encode_basestring(content)}{self.tail}"
+
+    def final(self, content: str) -> dict:
+        """The closing chunk, carrying the whole answer and finish_reason stop."""
+        chunk = self.chunk_model(content, self.count)
+        chunk.choices[0].finish_reason = "stop"
+        return chunk.to_dict()
+
+
+class ReferenceStripper:
+    """
+    Removes [Data: ...] references from text that arrives in pieces, with
+    the same result as re.sub(r'\\[Data: [^\\]]+\\]', '', whole_text). Text
+    that may still turn out to be a reference is held back until it is
+    closed or proven not to be one.
+    """
+
+    def __init__(self):
+        self.pending = ""
+        self.emitted: list[str] = []
+
+    def feed(self, text: str) -> str:
+        buffer = self.pending + text
+        self.pending = ""
+        out = []
+        position = 0
+        while True:
+            start = buffer.find("[", position)
+            if start == -1:
+                out.append(buffer[position:])
+                break
+            out.append(buffer[position:start])
+            rest = buffer[start:start + len(reference_open)]
+            if len(rest) < len(reference_open) and reference_open.startswith(rest):
+                self.pending = buffer[start:]
+                break
+            if rest != reference_open:
+                out.append("[")
+                position = start + 1
+                continue
+            end = buffer.find("]", start + len(reference_open))
+            if end == -1:
+                self.pending = buffer[start:]
+                break
+            if end == start + len(reference_open):
+                # "[Data: ]" holds no reference
+                out.append("[")
+                position = start + 1
+                continue
+            position = end + 1
+        text = "".join(out)
+        if text:
+            self.emitted.append(text)
+        return text
+
+    def flush(self) -> str:
+        """
+        Whatever is held back at the end of the stream. Held text never
+        contains "]", so it cannot hold a reference and is returned as it is.
+        """
+        text, self.pending = self.pending, ""
+        if text:
+            self.emitted.append(text)
+        return text
+
+    def text(self) -> str:
+        return "".join(self.emitted)
+
+
+async def frames(pieces: AsyncIterator[str], interval: float) -> AsyncIterator[str]:
+    """
+    Join pieces into frames: the first piece of a frame is held for at most
+    interval seconds while later pieces are added to it.
+    """
+    loop = asyncio.get_running_loop()
+    iterator = pieces.__aiter__()
+    frame: list[str] = []
+    deadline = 0.0
+    next_piece = asyncio.ensure_future(iterator.__anext__())
+    try:
+        while True:
+            timeout = max(0.0, deadline - loop.time()) if frame else None
+            done, _ = await asyncio.wait({next_piece}, timeout=timeout)
+            if not done:
+                yield "".join(frame)
+                frame = []
+                continue
+            try:
+                piece = next_piece.result()
+            except StopAsyncIteration:
+                break
+            if not frame:
+                deadline = loop.time() + interval
+            frame.append(piece)
+            next_piece = asyncio.ensure_future(iterator.__anext__())
+        if frame:
+            yield "".join(frame)
+    finally:
+        if not next_piece.done():
+            next_piece.cancel()
+
+
+class AnswerStream:
+    """
+    The SSE events of one streamed answer: pieces are optionally framed,
+    stripped of references unless they are to be shown, and written as
+    chunks. raw keeps the answer as the model produced it.
+    """
+
+    def __init__(self, chat_id: str, model: str, strip_references: bool = True, frame_seconds: float = 0.0):
+        self.writer = ChunkWriter(chat_id, model)
+        self.stripper = ReferenceStripper() if strip_references else None
+        self.frame_seconds = frame_seconds
+        self.raw: list[str] = []
+
+    async def events(self, pieces: AsyncIterator[str]) -> AsyncIterator[str]:
+        source = frames(pieces, self.frame_seconds) if self.frame_seconds > 0 else pieces
+        async for text in source:
+            self.raw.append(text)
+            if self.stripper is not None:
+                text = self.stripper.feed(text)
+            if text:
+                yield self.writer.chunk(text)
+        if self.stripper is not None:
+            text = self.stripper.flush()
+            if text:
+                yield self.writer.chunk(text)
+
+    @property
+    def raw_text(self) -> str:
+        return "".join(self.raw)
+
+    def final(self) -> dict:
+        """The closing chunk; it carries the whole answer, stripped and trimmed as handle_reference does."""
+        if self.stripper is None:
+            return self.writer.final(self.raw_text)
+        return self.writer.final(self.stripper.text().strip())
@@ -9,7 +9,8 @@ import base64
 from dotenv import load_dotenv
 from streamlit.runtime.uploaded_file_manager import UploadedFile
 import uuid
-from libs.common import get_original_dir, list_files_and_sizes, run_command
+from libs.common import get_original_dir, list_files_and_sizes
+from libs.file_copy import clear_dir
 from pathlib import Path
 
 tracemalloc.start()
@@ -58,7 +59,7 @@ def upload_file(project_name: str):
     )
 
     if st.button("Delete all files", key=f"delete_all_files_{project_name}", icon="🗑️"):
-        run_command(f"rm -rf /app/projects/{project_name}/original/*")
+        clear_dir(f"/app/projects/{project_name}/original")
         time.sleep(3)
         st.success("All files deleted.")
         list_uploaded_files(file_list_container, project_name)
@@ -0,0 +1,93 @@
+import base64
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from libs.blob_pool import BlobClientPool
+
+account_key = base64.b64encode(b"a test account key").decode()
+
+
+class FakeContainerClient:
+    def __init__(self):
+        self.created = 0
+        self.policies = 0
+
+    def exists(self):
+        return self.created > 0
+
+    def create_container(self):
+        self.created += 1
+
+    def set_container_access_policy(self, signed_identifiers, public_access):
+        self.policies += 1
+
+
+class FakeServiceClient:
+    def __init__(self, connection_string: str):
+        self.account_name = connection_string
+        self.url = f"https://{connection_string}.blob.core.windows.net/"
+        self.credential = SimpleNamespace(account_key=account_key)
+        self.containers = {}
+
+    def get_container_client(self, container_name: str):
+        return self.containers.setdefault(container_name, FakeContainerClient())
+
+
+class Clock:
+    def __init__(self):
+        self.now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    def __call__(self):
+        return self.now
+
+
+def make_pool(connection_strings: dict, clients: list, clock) -> BlobClientPool:
+    def client_factory(connection_string):
+        clients.append(FakeServiceClient(connection_string))
+        return clients[-1]
+
+    return BlobClientPool(connection_strings.get, client_factory=client_factory, clock=clock)
+
+
+def test_sas_urls_are_reused_until_close_to_expiry():
+    clients, clock = [], Clock()
+    pool = make_pool({"project": "account"}, clients, clock)
+
+    first = pool.sas_url("project", "docs", "report.pdf")
+    assert first.startswith("https://account.blob.core.windows.net/docs/report.pdf?")
+    clock.now += timedelta(minutes=49)
+    assert pool.sas_url("project", "docs", "report.pdf") == first
+    assert pool.sas_url("project", "docs", "other.pdf") != first
+
+    # inside the 10 minute refresh margin of the one hour lifetime
+    clock.now += timedelta(minutes=2)
+    refreshed = pool.sas_url("project", "docs", "report.pdf")
+    assert refreshed != first
+    assert pool.sas_url("project", "docs", "report.pdf") == refreshed
+    assert len(clients) == 1
+
+
+def test_a_new_connection_string_drops_the_old_account():
+    clients, clock = [], Clock()
+    connection_strings = {"project": "account"}
+    pool = make_pool(connection_strings, clients, clock)
+    pool.container_client("project", "docs")
+    pool.container_client("project", "docs")
+    first = pool.sas_url("project", "docs", "report.pdf")
+    assert clients[0].containers["docs"].created == 1
+    assert clients[0].containers["docs"].policies == 1
+
+    connection_strings["project"] = "rotated"
+    pool.container_client("project", "docs")
+    second = pool.sas_url("project", "docs", "report.pdf")
+
+    assert len(clients) == 2
+    assert clients[1].containers["docs"].created == 1
+    assert second.startswith("https://rotated.blob.core.windows.net/docs/report.pdf?")
+    assert second != first
+
+
+def test_projects_without_a_connection_string_have_no_client():
+    pool = make_pool({}, [], Clock())
+    assert pool.service_client("project") is None
+    assert pool.container_client("project", "docs") is None
@@ -0,0 +1,64 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+import cli.build_index
+import cli.stage_cache
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def cli_main(monkeypatch, tmp_path):
+    """cli.py loaded as a module, with every stage but the fingerprinting faked around a project in tmp_path."""
+    spec = importlib.util.spec_from_file_location("cli_main", os.path.join(root_dir, "cli.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    project_dir = tmp_path / "project"
+    (project_dir / "input").mkdir(parents=True)
+    (project_dir / "input" / "doc.txt").write_text("some text", encoding="utf-8")
+    (project_dir / "settings.yaml").write_text("storage:\n  base_dir: output\n", encoding="utf-8")
+
+    async def prompt_tuning(project_name):
+        (project_dir / "prompts").mkdir(exist_ok=True)
+        for name in cli.stage_cache.prompt_files:
+            (project_dir / "prompts" / name).write_text(name, encoding="utf-8")
+
+    builds = []
+
+    def index_cli(root_dir, **kwargs):
+        # graphrag's index command writes the index and always exits
+        builds.append(root_dir)
+        (project_dir / "output" / "entities.parquet").write_bytes(b"index")
+        sys.exit(0)
+
+    monkeypatch.setattr(module, "upload_files", lambda project_name, input_dir: None)
+    monkeypatch.setattr(module, "generate_data", lambda project_name, pdf_vision_option: None)
+    monkeypatch.setattr(module, "prompt_tuning", prompt_tuning)
+    monkeypatch.setattr(cli.stage_cache, "project_path", lambda project_name: project_dir)
+    monkeypatch.setattr(cli.build_index, "project_path", lambda project_name: project_dir)
+    monkeypatch.setattr(cli.build_index, "index_cli", index_cli)
+    module.builds = builds
+    return module
+
+
+def process(cli_main) -> bool:
+    config = cli_main.ArgConfig(project="project", input_dir="unused", pdf_vision_option="none")
+    return cli_main.process_a_project(config)
+
+
+def test_second_process_run_skips_build_index(cli_main):
+    assert process(cli_main)
+    assert len(cli_main.builds) == 1
+
+    assert process(cli_main)
+    assert len(cli_main.builds) == 1
+
+
+def test_failed_build_is_not_recorded(cli_main, monkeypatch):
+    monkeypatch.setattr(cli.build_index, "index_cli", lambda root_dir, **kwargs: sys.exit(1))
+    assert not process(cli_main)
+    assert "build_index" not in cli.stage_cache.StageFingerprints("project").stages
@@ -0,0 +1,94 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from libs.downloader import DocDownloader
+
+
+class FileServer(ThreadingHTTPServer):
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FileHandler)
+        self.files: dict[str, bytes] = {}
+        self.requests: list[tuple[str, int]] = []
+
+    def url(self, name: str) -> str:
+        return f"http://127.0.0.1:{self.server_port}/{name}"
+
+
+class FileHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        content = self.server.files.get(self.path.lstrip("/"))
+        if content is None:
+            status, etag = 404, None
+        else:
+            etag = f'"{hashlib.sha1(content).hexdigest()}"'
+            status = 304 if self.headers.get("If-None-Match") == etag else 200
+        self.server.requests.append((self.path, status))
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+        body = content if status == 200 else b""
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = FileServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def downloader(tmp_path) -> DocDownloader:
+    return DocDownloader(
+        str(tmp_path / "docs"),
+        str(tmp_path / "download_manifest.json"),
+        lambda url: url.rsplit("/", 1)[-1],
+        max_workers=4,
+        per_host=2,
+    )
+
+
+def test_rerun_fetches_only_missing_and_changed_files(server, tmp_path):
+    server.files = {"a.pdf": b"first a", "b.pdf": b"first b"}
+    urls = [server.url("a.pdf"), server.url("b.pdf"), server.url("c.pdf"), server.url("a.pdf")]
+
+    counts = downloader(tmp_path).download_all(urls)
+    assert counts == {"downloaded": 2, "not_modified": 0, "skipped": 0, "error": 1}
+    assert (tmp_path / "docs" / "a.pdf").read_bytes() == b"first a"
+    assert not (tmp_path / "docs" / "c.pdf").exists()
+
+    # c.pdf failed last time and b.pdf changed on the server since
+    server.files.update({"b.pdf": b"second b", "c.pdf": b"first c"})
+    server.requests.clear()
+    results = []
+    counts = downloader(tmp_path).download_all(urls, on_result=lambda done, total, result: results.append(result))
+
+    assert counts == {"downloaded": 2, "not_modified": 1, "skipped": 0, "error": 0}
+    assert sorted(server.requests) == [("/a.pdf", 304), ("/b.pdf", 200), ("/c.pdf", 200)]
+    assert {result.file_name: result.status for result in results} == {
+        "a.pdf": "not_modified", "b.pdf": "downloaded", "c.pdf": "downloaded",
+    }
+    assert (tmp_path / "docs" / "b.pdf").read_bytes() == b"second b"
+    assert sorted(path.name for path in (tmp_path / "docs").iterdir()) == ["a.pdf", "b.pdf", "c.pdf"]
+
+
+def test_files_from_before_the_manifest_are_kept(server, tmp_path):
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "docs" / "a.pdf").write_bytes(b"already here")
+    server.files = {"a.pdf": b"first a"}
+
+    counts = downloader(tmp_path).download_all([server.url("a.pdf")])
+
+    assert counts["skipped"] == 1
+    assert server.requests == []
+    assert downloader(tmp_path).manifest[server.url("a.pdf")]["size"] == len(b"already here")
@@ -0,0 +1,73 @@
+import asyncio
+from types import SimpleNamespace
+
+from graphrag.config.models.drift_search_config import DRIFTSearchConfig
+from graphrag.query.structured_search.base import SearchResult
+from graphrag.query.structured_search.drift_search.primer import DRIFTPrimer
+from graphrag.query.structured_search.drift_search.search import DRIFTSearch
+
+import app_api
+from libs import consts, search
+
+
+class RecordingContextBuilder:
+    """Stands in for DRIFTSearchContextBuilder and records the questions it primes."""
+
+    local_system_prompt = None
+    local_mixed_context = None
+
+    def __init__(self):
+        self.queries = []
+
+    def build_context(self, query, **kwargs):
+        self.queries.append(query)
+        return [], {"llm_calls": 0, "prompt_tokens": 0}
+
+
+async def primer_answer(self, query, top_k_reports):
+    return SearchResult(
+        response=[{"intermediate_answer": f"answer to {query}", "follow_up_queries": [f"more on {query}"], "score": 1}],
+        context_data={},
+        context_text="",
+        completion_time=0,
+        llm_calls=0,
+        prompt_tokens=0,
+        output_tokens=0,
+    )
+
+
+async def unreduced(self, responses, query, **kwargs):
+    # search_once then answers with the first node of the query state, the primer's answer
+    return responses
+
+
+def test_drift_engines_are_primed_on_their_own_question(monkeypatch, tmp_path):
+    monkeypatch.setattr(DRIFTPrimer, "asearch", primer_answer)
+    monkeypatch.setattr(DRIFTSearch, "_reduce_response", unreduced)
+    context_builder = RecordingContextBuilder()
+    engine = DRIFTSearch(llm=None, context_builder=context_builder, config=DRIFTSearchConfig(n=0))
+    parts = search.DriftSearchParts(engine)
+    builds = []
+
+    async def get_snapshot(project_name):
+        return SimpleNamespace(data={})
+
+    async def load_drift_search_parts(snapshot, community_level):
+        builds.append(community_level)
+        return parts
+
+    monkeypatch.setattr(app_api, "project_path", lambda project_name: tmp_path)
+    monkeypatch.setattr(app_api, "get_snapshot", get_snapshot)
+    monkeypatch.setattr(search, "load_drift_search_parts", load_drift_search_parts)
+
+    async def run():
+        first = app_api.Item(query="Who founded the company?", project_name="drift-test")
+        second = app_api.Item(query="Where is it based?", project_name="drift-test")
+        return await app_api.search_once(first, consts.INDEX_DRIFT), await app_api.search_once(second, consts.INDEX_DRIFT)
+
+    (first_answer, _), (second_answer, _) = asyncio.run(run())
+
+    assert builds == [2]
+    assert context_builder.queries == ["Who founded the company?", "Where is it based?"]
+    assert first_answer == "answer to Who founded the company?"
+    assert second_answer == "answer to Where is it based?"
@@ -0,0 +1,54 @@
+import json
+import os
+import shutil
+
+from libs import ingest_manifest
+from libs.ingest_manifest import IngestManifest, IngestSteps, generate_from_plan
+
+
+def make_steps(project_dir, messages: list[str]) -> IngestSteps:
+    input_dir = os.path.join(project_dir, "input")
+
+    def prepare_file(file_path, file, project_name, copies):
+        target = os.path.join(input_dir, file)
+        copies.append((file_path, target))
+        return [target]
+
+    def convert_file(file_path, file, project_name, pdf_vision_option):
+        if "broken" in file:
+            return False
+        shutil.copyfile(file_path, f"{input_dir}/{file}.txt")
+        return True
+
+    return IngestSteps(
+        prepare_file=prepare_file,
+        convert_file=convert_file,
+        convert_pdfs=lambda pdf_paths, project_name, pdf_vision_option: None,
+        info=messages.append,
+        warning=messages.append,
+    )
+
+
+def test_failed_conversions_are_retried(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest_manifest, "build_source_index", lambda pdf_cache_dir: None)
+    project_dir = str(tmp_path)
+    os.makedirs(tmp_path / "original")
+    os.makedirs(tmp_path / "input")
+    (tmp_path / "original" / "good.csv").write_text("a\n1\n", encoding="utf-8")
+    (tmp_path / "original" / "broken.csv").write_text("a\n1\n", encoding="utf-8")
+    messages = []
+    steps = make_steps(project_dir, messages)
+
+    manifest = IngestManifest(project_dir)
+    plan = manifest.plan("none")
+    generate_from_plan("project", "none", manifest, plan, steps)
+
+    with open(tmp_path / "ingest_manifest.json", encoding="utf-8") as f:
+        saved = json.load(f)["files"]
+    assert sorted(saved) == ["good.csv"]
+    assert saved["good.csv"]["outputs"] == ["input/good.csv", "input/good.csv.txt"]
+    assert any("could not be converted" in message for message in messages)
+
+    plan = IngestManifest(project_dir).plan("none")
+    assert plan.new == ["broken.csv"]
+    assert plan.unchanged == ["good.csv"]
@@ -0,0 +1,40 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pandas as pd
+
+from libs import search
+
+
+def test_tables_and_models_load_off_the_event_loop(monkeypatch, tmp_path):
+    pd.DataFrame({"id": ["1"], "text": ["some text"]}).to_parquet(tmp_path / "create_final_text_units.parquet")
+    monkeypatch.setattr(search.settings, "parquet_projection", True)
+    config = SimpleNamespace(
+        root_dir=str(tmp_path),
+        storage=SimpleNamespace(type="file", base_dir=str(tmp_path)),
+        embeddings=SimpleNamespace(vector_store={}),
+    )
+    snapshot = search.KnowledgeSnapshot(config=config)
+    threads = []
+
+    def read_parquet_table(path, columns=None):
+        threads.append(threading.current_thread())
+        return pd.read_parquet(path)
+
+    def get_basic_search_engine(config, text_units, text_unit_embeddings, system_prompt):
+        threads.append(threading.current_thread())
+        return text_units
+
+    monkeypatch.setattr(search, "MODE_TABLES", {search.consts.INDEX_BASIC: ["create_final_text_units"]})
+    monkeypatch.setattr(search, "read_parquet_table", read_parquet_table)
+    monkeypatch.setattr(search, "read_indexer_text_units", lambda df: list(df["text"]))
+    monkeypatch.setattr(search, "get_embedding_store", lambda config, embedding_name: None)
+    monkeypatch.setattr(search, "get_basic_search_engine", get_basic_search_engine)
+    monkeypatch.setattr(snapshot, "prompt", lambda name: None)
+
+    text_units = asyncio.run(search.load_basic_search_engine(snapshot))
+
+    assert text_units == ["some text"]
+    assert len(threads) == 2
+    assert threading.main_thread() not in threads
@@ -0,0 +1,59 @@
+import asyncio
+from types import SimpleNamespace
+
+from graphrag.model.community_report import CommunityReport
+
+from libs import project_cache, search
+from libs.project_cache import ProjectCache
+
+
+def test_one_build_at_a_time_after_a_stale_entry_is_dropped(monkeypatch, tmp_path):
+    fingerprint = ["before"]
+    monkeypatch.setattr(project_cache, "project_fingerprint", lambda root: fingerprint[0])
+    cache = ProjectCache("test", max_bytes=1 << 20)
+    running = []
+    most_running = []
+
+    async def builder():
+        running.append(1)
+        most_running.append(len(running))
+        await asyncio.sleep(0.01)
+        running.pop()
+        return fingerprint[0], 1
+
+    async def get():
+        return await cache.get_or_build("key", "project", tmp_path, builder)
+
+    async def run():
+        first = asyncio.create_task(get())
+        await asyncio.sleep(0)
+        # the index changes while first builds, second waits for the lock with the new fingerprint
+        fingerprint[0] = "after"
+        second = asyncio.create_task(get())
+        await asyncio.sleep(0)
+        await first
+        # second now drops first's stale entry and rebuilds while holding the lock, third has to wait for it
+        third = asyncio.create_task(get())
+        return await asyncio.gather(second, third)
+
+    assert asyncio.run(run()) == ["after", "after"]
+    assert max(most_running) == 1
+    assert cache.misses == 2
+    assert cache._locks == {}
+
+
+class EmbeddingStore:
+    def search_by_id(self, id):
+        return SimpleNamespace(vector=[float(id)])
+
+
+def test_report_embeddings_leave_shared_reports_untouched(monkeypatch):
+    reports = [CommunityReport(id=str(i), short_id=str(i), title=f"report {i}", community_id=str(i)) for i in range(3)]
+    monkeypatch.setattr(search, "read_indexer_reports", lambda *args, **kwargs: reports)
+    snapshot = search.KnowledgeSnapshot(config=None, data={"create_final_community_reports": None, "create_final_nodes": None})
+
+    with_embeddings = snapshot.reports_with_embeddings(2, EmbeddingStore())
+
+    assert [report.full_content_embedding for report in with_embeddings] == [[0.0], [1.0], [2.0]]
+    assert all(report.full_content_embedding is None for report in snapshot.reports(2))
+    assert snapshot.reports_with_embeddings(2, EmbeddingStore()) is with_embeddings
@@ -0,0 +1,29 @@
+import os
+
+from libs.common import get_project_env, project_environ
+
+
+def test_project_env_is_read_per_projects_dir(tmp_path, monkeypatch):
+    for name, key in (("one", "first key"), ("two", "second key")):
+        (tmp_path / name / "demo").mkdir(parents=True)
+        (tmp_path / name / "demo" / ".env").write_text(f"API_KEY={key}\n", encoding="utf-8")
+    monkeypatch.setenv("OTHER", "from process")
+
+    assert get_project_env("demo", "API_KEY", projects_dir=str(tmp_path / "one")) == "first key"
+    assert get_project_env("demo", "API_KEY", projects_dir=str(tmp_path / "two")) == "second key"
+    assert get_project_env("demo", "OTHER", projects_dir=str(tmp_path / "one")) == "from process"
+    assert get_project_env("missing", "UNSET", "fallback", projects_dir=str(tmp_path)) == "fallback"
+    assert "API_KEY" not in os.environ
+
+
+def test_project_environ_restores_the_process_environment(tmp_path, monkeypatch):
+    monkeypatch.setattr("libs.common.project_env_values", lambda project_name: {"API_KEY": "project key", "OTHER": "project"})
+    monkeypatch.setenv("OTHER", "process")
+    monkeypatch.delenv("API_KEY", raising=False)
+
+    with project_environ("demo"):
+        assert os.environ["API_KEY"] == "project key"
+        assert os.environ["OTHER"] == "project"
+
+    assert "API_KEY" not in os.environ
+    assert os.environ["OTHER"] == "process"
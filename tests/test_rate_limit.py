@@ -0,0 +1,40 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from libs.rate_limit import VisionScheduler
+
+
+class Throttled(Exception):
+    status_code = 429
+    response = SimpleNamespace(headers={"retry-after-ms": "1"})
+
+
+def test_throttled_attempts_do_not_keep_their_estimate():
+    scheduler = VisionScheduler(tokens_per_minute=1000, requests_per_minute=0)
+    attempts = []
+
+    async def request():
+        attempts.append(scheduler.tokens.tokens)
+        if len(attempts) < 3:
+            raise Throttled()
+        return SimpleNamespace(usage=SimpleNamespace(total_tokens=100))
+
+    asyncio.run(scheduler.call(request, estimated_tokens=400))
+
+    # every attempt found the bucket full again, only the actual usage stays charged
+    assert attempts == [pytest.approx(600, abs=1)] * 3
+    assert scheduler.tokens.tokens == pytest.approx(900, abs=1)
+    assert scheduler.throttled == 2
+
+
+def test_failed_calls_give_the_estimate_back():
+    scheduler = VisionScheduler(tokens_per_minute=1000, requests_per_minute=0)
+
+    async def request():
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        asyncio.run(scheduler.call(request, estimated_tokens=400))
+    assert scheduler.tokens.tokens == pytest.approx(1000)
@@ -0,0 +1,120 @@
+import json
+import threading
+from types import SimpleNamespace
+
+from libs.search_upload import BulkUploader, iter_batches
+
+
+class ServiceError(Exception):
+    def __init__(self, status_code: int, headers: dict | None = None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+class FakeSearchClient:
+    """Stores documents like SearchClient.upload_documents, failing the ways the service does."""
+
+    def __init__(self, max_docs: int = 1000, busy_calls: int = 0, throttle_once: set[str] = frozenset(), bad: set[str] = frozenset()):
+        self.max_docs = max_docs
+        self.busy_calls = busy_calls
+        self.throttle_once = set(throttle_once)
+        self.bad = bad
+        self.stored: dict[str, dict] = {}
+        self.calls: list[int] = []
+        self._lock = threading.Lock()
+
+    def upload_documents(self, documents: list[dict]):
+        with self._lock:
+            self.calls.append(len(documents))
+            if self.busy_calls:
+                self.busy_calls -= 1
+                raise ServiceError(503, {"retry-after": "0"})
+            if len(documents) > self.max_docs:
+                raise ServiceError(413)
+            results = []
+            for document in documents:
+                key = document["id"]
+                if key in self.throttle_once:
+                    self.throttle_once.discard(key)
+                    results.append(SimpleNamespace(key=key, succeeded=False, status_code=429, error_message="throttled"))
+                elif key in self.bad:
+                    results.append(SimpleNamespace(key=key, succeeded=False, status_code=400, error_message="bad vector"))
+                else:
+                    self.stored[key] = document
+                    results.append(SimpleNamespace(key=key, succeeded=True, status_code=201, error_message=None))
+            return results
+
+
+def documents(count: int) -> list[dict]:
+    return [{"id": f"{i:03d}", "vector": [0.5] * 8, "text": f"text {i:03d}"} for i in range(count)]
+
+
+def uploader(client, **kwargs) -> BulkUploader:
+    return BulkUploader(client, sleep=lambda seconds: None, **kwargs)
+
+
+def test_batches_are_cut_by_payload_size_and_count():
+    docs = documents(25)
+    document_size = len(json.dumps(docs[0]).encode("utf-8")) + 1
+
+    by_size = list(iter_batches(docs, batch_bytes=document_size * 10))
+    by_count = list(iter_batches(docs, batch_docs=7))
+
+    assert [len(batch.documents) for batch in by_size] == [10, 10, 5]
+    assert [batch.number for batch in by_size] == [1, 2, 3]
+    assert all(batch.size <= document_size * 10 for batch in by_size)
+    assert [len(batch.documents) for batch in by_count] == [7, 7, 7, 4]
+    assert [document for batch in by_size for document in batch.documents] == docs
+
+
+def test_batches_are_consumed_as_uploads_finish():
+    client = FakeSearchClient()
+    reports = []
+    finished_when_read = []
+
+    def generate():
+        for document in documents(100):
+            finished_when_read.append(len(reports))
+            yield document
+
+    stats = uploader(client, max_workers=2, on_batch=reports.append).upload(iter_batches(generate(), batch_docs=10))
+
+    assert len(client.stored) == 100
+    assert (stats.batches, stats.documents, stats.failed, stats.errors) == (10, 100, 0, [])
+    assert sorted(report.number for report in reports) == list(range(1, 11))
+    # 2 workers keep at most 4 batches in flight, so the 5th is submitted (and the
+    # 7th started, iter_batches reads one document ahead) only once an upload finished
+    assert finished_when_read[60] >= 1
+
+
+def test_throttled_requests_and_documents_are_retried():
+    client = FakeSearchClient(busy_calls=2, throttle_once={"003", "007"}, bad={"005"})
+
+    stats = uploader(client, max_workers=1).upload(iter_batches(documents(10), batch_docs=10))
+
+    assert sorted(client.stored) == [f"{i:03d}" for i in range(10) if i != 5]
+    # two 503s, the accepted batch, then only the two throttled documents again
+    assert client.calls == [10, 10, 10, 2]
+    assert stats.failed == 1
+    assert stats.errors == ["005: bad vector"]
+
+
+def test_too_large_batches_are_split():
+    client = FakeSearchClient(max_docs=3)
+
+    stats = uploader(client).upload(iter_batches(documents(10), batch_docs=10))
+
+    assert len(client.stored) == 10
+    assert stats.failed == 0
+    assert max(size for size in client.calls if size <= 3) == 3
+
+
+def test_gives_up_after_max_attempts():
+    client = FakeSearchClient(busy_calls=10)
+
+    stats = uploader(client, max_attempts=3).upload(iter_batches(documents(4)))
+
+    assert client.calls == [4, 4, 4]
+    assert stats.failed == 4
+    assert stats.errors == ["ServiceError: status 503"]
@@ -0,0 +1,106 @@
+import openpyxl
+import pandas as pd
+import pytest
+
+from libs import sheet_txt
+
+
+def legacy_excel_to_txt(file_path: str, txt_path: str):
+    """The iterrows converter generate_data used."""
+    with open(txt_path, "w", encoding="utf-8") as f:
+        if file_path.endswith(".csv"):
+            df = pd.read_csv(file_path, encoding="utf-8")
+            f.write("".join(f"{column}\n\n" for column in df.columns))
+            write_rows(f, df)
+            return
+        excel_data = pd.ExcelFile(file_path, engine="openpyxl")
+        for sheet_name in excel_data.sheet_names:
+            f.write(f"{sheet_name}\n\n")
+            write_rows(f, excel_data.parse(sheet_name))
+
+
+def write_rows(f, df: pd.DataFrame):
+    for index, row in df.iterrows():
+        for column in df.columns:
+            if pd.notna(row[column]):
+                f.write(f"【{column}】: {row[column]} ")
+        f.write(f"\n\n")
+
+
+mixed_csv = """a,b,c,d,e
+1.50,007,x,true,
+2,3,y,false,5
+,12,,TRUE,6
+"""
+
+numeric_csv = """a,b
+1.50,007
+2.25,3
+"""
+
+
+def converted(tmp_path, text: str) -> tuple[str, str]:
+    csv_path = tmp_path / "sheet.csv"
+    csv_path.write_text(text, encoding="utf-8")
+    return convert_both(tmp_path, csv_path)
+
+
+def convert_both(tmp_path, sheet_path) -> tuple[str, str]:
+    legacy_path, txt_path = tmp_path / "legacy.txt", tmp_path / "sheet.txt"
+    legacy_excel_to_txt(str(sheet_path), str(legacy_path))
+    sheet_txt.sheet_to_txt(str(sheet_path), str(txt_path))
+    return legacy_path.read_text(encoding="utf-8"), txt_path.read_text(encoding="utf-8")
+
+
+def write_xlsx(path, sheets: dict[str, list[list]]):
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    for title, rows in sheets.items():
+        worksheet = workbook.create_sheet(title)
+        for row in rows:
+            worksheet.append(row)
+    workbook.save(path)
+
+
+@pytest.mark.parametrize("text", [mixed_csv, numeric_csv], ids=["mixed", "numeric"])
+def test_csv_matches_legacy_converter(tmp_path, text):
+    legacy, streamed = converted(tmp_path, text)
+    assert streamed == legacy
+
+
+def test_csv_types_are_inferred_for_the_whole_file(tmp_path, monkeypatch):
+    # b only turns float in the last chunk, a stays int; the old converter saw them in one frame
+    monkeypatch.setattr(sheet_txt, "chunk_rows", 2)
+    text = "a,b,c\n" + "".join(f"{i},{i},name {i}\n" for i in range(5)) + "5,,last\n"
+    legacy, streamed = converted(tmp_path, text)
+    assert "【b】: 0.0 " in legacy
+    assert streamed == legacy
+
+
+def test_xlsx_matches_legacy_converter(tmp_path):
+    xlsx_path = tmp_path / "sheet.xlsx"
+    write_xlsx(xlsx_path, {
+        "mixed": [["a", "b", "c", "d"], [1.5, 7, "x", True], [2, None, "y", False], [None, 12, None, True]],
+        "numeric": [["a", "b"], [1.5, 7], [2.25, 3]],
+    })
+    legacy, streamed = convert_both(tmp_path, xlsx_path)
+    assert "【b】: 7.0 " in legacy
+    assert streamed == legacy
+
+
+def test_xlsx_types_are_inferred_for_the_whole_sheet(tmp_path, monkeypatch):
+    monkeypatch.setattr(sheet_txt, "chunk_rows", 2)
+    xlsx_path = tmp_path / "sheet.xlsx"
+    write_xlsx(xlsx_path, {"sheet": [["a", "b", "c"], *[[i, i, f"name {i}"] for i in range(5)], [5, None, "last"]]})
+    legacy, streamed = convert_both(tmp_path, xlsx_path)
+    assert "【b】: 0.0 " in legacy
+    assert streamed == legacy
+
+
+def test_xlsx_rows_longer_than_the_header(tmp_path, monkeypatch):
+    monkeypatch.setattr(sheet_txt, "chunk_rows", 2)
+    xlsx_path = tmp_path / "sheet.xlsx"
+    write_xlsx(xlsx_path, {"sheet": [["a", "b"], [1, "x"], [2, "y"], [3, "z"], [4, "w", 7]]})
+    legacy, streamed = convert_both(tmp_path, xlsx_path)
+    assert "【Unnamed: 2】: 7.0 " in legacy
+    assert streamed == legacy
@@ -0,0 +1,38 @@
+import os
+
+from libs import source_index
+
+
+def write_page(pdf_cache_dir, text: str):
+    with open(os.path.join(pdf_cache_dir, "report.pdf_page_1.png.none.txt"), "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def test_locator_follows_pages_rewritten_in_place(tmp_path):
+    pdf_cache_dir = str(tmp_path / "pdf_cache")
+    os.makedirs(pdf_cache_dir)
+    first, second = "the first version of this page", "the second version of this page"
+    write_page(pdf_cache_dir, first)
+    source_index.build_source_index(pdf_cache_dir)
+    assert source_index.get_source_locator(pdf_cache_dir).locate([first]) == {first: [("report.pdf", 1)]}
+
+    # rewriting an existing page leaves the directory mtime alone, the ingest run rebuilds the index
+    dir_stat = os.stat(pdf_cache_dir)
+    write_page(pdf_cache_dir, second)
+    os.utime(pdf_cache_dir, ns=(dir_stat.st_atime_ns, dir_stat.st_mtime_ns))
+    source_index.build_source_index(pdf_cache_dir)
+
+    locator = source_index.get_source_locator(pdf_cache_dir)
+    assert source_index.line_fingerprint(second) in locator.lines
+    assert source_index.line_fingerprint(first) not in locator.lines
+    assert locator.locate([first, second]) == {second: [("report.pdf", 1)]}
+
+
+def test_short_texts_are_found_by_the_page_scan(tmp_path):
+    pdf_cache_dir = str(tmp_path / "pdf_cache")
+    os.makedirs(pdf_cache_dir)
+    write_page(pdf_cache_dir, "a line long enough to be indexed\nshort\n")
+
+    located = source_index.get_source_locator(pdf_cache_dir).locate(["short", "missing"])
+
+    assert located == {"short": [("report.pdf", 1)]}